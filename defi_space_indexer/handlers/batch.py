@@ -1,11 +1,40 @@
 from collections.abc import Iterable
 from dipdup.context import HandlerContext
 from dipdup.index import MatchedHandler
+from defi_space_indexer.models import cache
+from defi_space_indexer.models.buffer import event_buffer
+from defi_space_indexer.hooks.metrics_scheduler import metrics_scheduler
+from defi_space_indexer.hooks.price_oracle import price_oracle
 
 
 async def batch(
     ctx: HandlerContext,
     handlers: Iterable[MatchedHandler],
 ) -> None:
-    for handler in handlers:
-        await ctx.fire_matched_handler(handler)
\ No newline at end of file
+    """Process all matched handlers of a single level.
+
+    Runs inside the level transaction. Handlers are fired in level order since
+    they depend on each other (e.g. Deposit before Withdraw of the same user).
+    Token prices are recomputed from reserves changed by the level, then
+    rows they stage are written once here, at the level boundary:
+    - Pair/Factory rows from the write-behind caches
+    - New event rows from the event buffer, bulk inserted per table
+
+    Pairs and reactors touched by the level are handed to the metrics
+    scheduler only after their rows are written.
+    """
+    try:
+        for handler in handlers:
+            await ctx.fire_matched_handler(handler)
+        await price_oracle.commit(ctx)
+        await cache.flush_level(ctx)
+        await event_buffer.flush(ctx)
+        metrics_scheduler.commit(ctx)
+    except BaseException:
+        # NOTE: Level transaction is rolled back; drop everything staged in memory
+        index = cache.index_name(ctx)
+        cache.invalidate(index)
+        event_buffer.discard(index)
+        metrics_scheduler.discard(index)
+        price_oracle.discard(index)
+        raise
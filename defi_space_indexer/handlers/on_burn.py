@@ -1,6 +1,11 @@
 from dipdup.context import HandlerContext
 from dipdup.models.starknet import StarknetEvent
-from defi_space_indexer.models.amm_models import Pair, LiquidityEvent, LiquidityPosition
+from defi_space_indexer.models.amm_models import LiquidityEvent, LiquidityPosition
+from defi_space_indexer.models.cache import pair_cache
+from defi_space_indexer.hooks.price_oracle import price_oracle
+from defi_space_indexer.models.buffer import event_buffer
+from defi_space_indexer.models.upsert import update
+from defi_space_indexer.models.felt import felt
 from defi_space_indexer.types.amm_pair.starknet_events.burn import BurnPayload
 from decimal import Decimal
 
@@ -10,7 +15,7 @@ async def on_burn(
 ) -> None:
     """Handle Burn event from Pair contract."""
     # Update pair
-    pair = await Pair.get_or_none(address=event.data.from_address)
+    pair = await pair_cache.get(event.data.from_address)
     if pair is None:
         raise ValueError(f"Pair not found: {event.data.from_address}")
 
@@ -20,31 +25,38 @@ async def on_burn(
     pair.reserve1 = Decimal(event.payload.reserve1)
     pair.block_timestamp_last = event.payload.block_timestamp
     pair.klast = Decimal(event.payload.reserve0) * Decimal(event.payload.reserve1)
-    await pair.save()
+    pair_cache.stage(ctx, pair)
+    price_oracle.touch(ctx, pair)
     
-    # Update or create position
-    position = await LiquidityPosition.get_or_none(
-        pair_address=(event.data.from_address),
-        user_address=hex(event.payload.sender),
+    # Update position in a single statement
+    position_id = await update(
+        LiquidityPosition,
+        keys={
+            'pair_address': felt(event.data.from_address),
+            'user_address': felt(event.payload.sender),
+        },
+        values={
+            'liquidity': Decimal(event.payload.user_liquidity),
+            'updated_at': event.payload.block_timestamp,
+        },
+        increments={
+            'withdrawals_token0': Decimal(event.payload.amount0),
+            'withdrawals_token1': Decimal(event.payload.amount1),
+        },
     )
-    if position is None:
-        ctx.logger.info(f"Liquidity position not found: {event.data.from_address} {hex(event.payload.sender)}")
+    if position_id is None:
+        ctx.logger.info(f"Liquidity position not found: {event.data.from_address} {felt(event.payload.sender)}")
         return
-    position.liquidity = Decimal(event.payload.user_liquidity)
-    position.withdrawals_token0 += Decimal(event.payload.amount0)
-    position.withdrawals_token1 += Decimal(event.payload.amount1)
-    position.updated_at = event.payload.block_timestamp
-    await position.save()
     
     burn_event = LiquidityEvent(
         transaction_hash=event.data.transaction_hash,
         created_at=event.payload.block_timestamp,
         event_type='BURN',
-        sender=hex(event.payload.sender),
+        sender=felt(event.payload.sender),
         amount0=Decimal(event.payload.amount0),
         amount1=Decimal(event.payload.amount1),
         liquidity=Decimal(event.payload.total_liquidity),
         pair=pair,
-        position=position,
+        position_id=position_id,
     )
-    await burn_event.save()
\ No newline at end of file
+    event_buffer.add(ctx, burn_event)
\ No newline at end of file
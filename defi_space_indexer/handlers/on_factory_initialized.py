@@ -1,4 +1,6 @@
 from defi_space_indexer.models.amm_models import Factory
+from defi_space_indexer.models.cache import factory_cache
+from defi_space_indexer.models.felt import felt
 from defi_space_indexer.types.amm_factory.starknet_events.factory_initialized import FactoryInitializedPayload
 from dipdup.context import HandlerContext
 from dipdup.models.starknet import StarknetEvent
@@ -9,15 +11,15 @@ async def on_factory_initialized(
 ) -> None:
     """Handle FactoryInitialized event from Factory contract."""
     factory = Factory (
-        address=hex(event.payload.factory_address),
+        address=felt(event.payload.factory_address),
         num_of_pairs=0,
         total_value_locked_usd=0,
-        owner=hex(event.payload.owner),
-        fee_to=hex(event.payload.fee_to),
-        pair_contract_class_hash=hex(event.payload.pair_contract_class_hash),
-        config_history=[],
+        owner=felt(event.payload.owner),
+        fee_to=felt(event.payload.fee_to),
+        pair_contract_class_hash=felt(event.payload.pair_contract_class_hash),
         created_at=event.payload.block_timestamp,
         updated_at=event.payload.block_timestamp,
     )
     await factory.save()
+    factory_cache.add(factory)
     
\ No newline at end of file
@@ -1,6 +1,9 @@
 from dipdup.context import HandlerContext
 from dipdup.models.starknet import StarknetEvent
-from defi_space_indexer.models.amm_models import Factory
+from defi_space_indexer.models.cache import factory_cache
+from defi_space_indexer.models.felt import felt
+from defi_space_indexer.models.config_models import ConfigChange, ConfigEntityType
+from defi_space_indexer.models.buffer import event_buffer
 from defi_space_indexer.types.amm_factory.starknet_events.fees_receiver_updated import FeesReceiverUpdatedPayload
 
 async def on_fees_receiver_updated(
@@ -8,17 +11,22 @@ async def on_fees_receiver_updated(
     event: StarknetEvent[FeesReceiverUpdatedPayload],
 ) -> None:
     """Handle FeesReceiverUpdated event from Factory contract."""
-    factory = await Factory.get_or_none(address=event.data.from_address)
+    factory = await factory_cache.get(event.data.from_address)
     if factory is None:
         ctx.logger.info(f"Factory not found: {event.data.from_address}")
         return
-    factory.fee_to = hex(event.payload.new_fee_to)
+    factory.fee_to = felt(event.payload.new_fee_to)
     factory.updated_at = event.payload.block_timestamp
     
-    factory.config_history.append({
-        'field': 'fee_to',
-        'old_value': hex(event.payload.previous_fee_to),
-        'new_value': hex(event.payload.new_fee_to),
-        'timestamp': event.payload.block_timestamp
-    })
-    await factory.save()
\ No newline at end of file
+    config_change = ConfigChange(
+        transaction_hash=event.data.transaction_hash,
+        level=event.data.level,
+        created_at=event.payload.block_timestamp,
+        entity_type=ConfigEntityType.FACTORY,
+        entity_address=factory.address,
+        field='fee_to',
+        old_value=felt(event.payload.previous_fee_to),
+        new_value=felt(event.payload.new_fee_to),
+    )
+    event_buffer.add(ctx, config_change)
+    factory_cache.stage(ctx, factory)
\ No newline at end of file
@@ -1,6 +1,9 @@
 from dipdup.context import HandlerContext
 from dipdup.models.starknet import StarknetEvent
-from defi_space_indexer.models.farming_models import UserStake, RewardEvent, Reactor
+from defi_space_indexer.models.farming_models import UserStake, RewardEvent, Reactor, RewardSchedule, UserRewardState
+from defi_space_indexer.models.upsert import update, upsert
+from defi_space_indexer.models.buffer import event_buffer
+from defi_space_indexer.models.felt import felt
 from defi_space_indexer.types.farming_reactor.starknet_events.harvest import HarvestPayload
 from decimal import Decimal
 
@@ -21,11 +24,11 @@ async def on_harvest(
     - Creates harvest event record
     """
     stake = await UserStake.get_or_none(
-        reactor_address=event.data.from_address,
-        user_address=hex(event.payload.user_address),
+        reactor_address=felt(event.data.from_address),
+        user_address=felt(event.payload.user_address),
     )
     if stake is None:
-        ctx.logger.info(f"Stake not found: {event.data.from_address} {hex(event.payload.user_address)}")
+        ctx.logger.info(f"Stake not found: {event.data.from_address} {felt(event.payload.user_address)}")
         return
     
     reactor = await Reactor.get_or_none(address=event.data.from_address)
@@ -33,24 +36,51 @@ async def on_harvest(
         ctx.logger.info(f"Reactor not found: {event.data.from_address}")
         return
     
-    reward_token_hex = hex(event.payload.reward_token)
-    stake.reward_per_token_paid[reward_token_hex] = Decimal(event.payload.reward_per_token_stored)
+    reward_token_hex = felt(event.payload.reward_token)
     
-    if reward_token_hex in stake.rewards:
-        stake.rewards[reward_token_hex] = 0
-    
-    stake.updated_at = event.payload.block_timestamp
-    await stake.save()
+    # Checkpoint the user's accrual: everything earned so far has been paid out
+    await upsert(
+        UserRewardState,
+        keys={
+            'stake_id': stake.id,
+            'reward_token': reward_token_hex,
+        },
+        values={
+            'reward_per_token_paid': Decimal(event.payload.reward_per_token_stored),
+            'rewards': Decimal(0),
+            'earned': Decimal(0),
+            'updated_at': event.payload.block_timestamp,
+        },
+        defaults={
+            'reactor_address': stake.reactor_address,
+            'user_address': stake.user_address,
+        },
+    )
     
+    # The harvest also reports the token's current reward per token
+    await update(
+        RewardSchedule,
+        keys={
+            'reactor_address': reactor.address,
+            'reward_token': reward_token_hex,
+        },
+        values={
+            'reward_per_token_stored': Decimal(event.payload.reward_per_token_stored),
+            'last_update_time': event.payload.block_timestamp,
+            'updated_at': event.payload.block_timestamp,
+        },
+    )
     
+    stake.updated_at = event.payload.block_timestamp
+    await stake.save(update_fields=['updated_at'])
     
     reward_event = RewardEvent(
         transaction_hash=event.data.transaction_hash,
         event_type='HARVEST',
-        user_address=hex(event.payload.user_address),
+        user_address=felt(event.payload.user_address),
         reward_token=reward_token_hex,
         reward_amount=Decimal(event.payload.reward_amount),
         created_at=event.payload.block_timestamp,
         reactor=reactor,
     )
-    await reward_event.save()
\ No newline at end of file
+    event_buffer.add(ctx, reward_event)
\ No newline at end of file
@@ -1,6 +1,11 @@
 from dipdup.context import HandlerContext
 from dipdup.models.starknet import StarknetEvent
-from defi_space_indexer.models.amm_models import Pair, LiquidityEvent, LiquidityPosition
+from defi_space_indexer.models.amm_models import LiquidityEvent, LiquidityPosition
+from defi_space_indexer.models.cache import pair_cache
+from defi_space_indexer.hooks.price_oracle import price_oracle
+from defi_space_indexer.models.buffer import event_buffer
+from defi_space_indexer.models.upsert import upsert
+from defi_space_indexer.models.felt import felt
 from defi_space_indexer.types.amm_pair.starknet_events.mint import MintPayload
 from decimal import Decimal
 
@@ -21,7 +26,7 @@ async def on_mint(
     - liquidity: LP tokens minted
     """
     # Update pair
-    pair = await Pair.get_or_none(address=event.data.from_address)
+    pair = await pair_cache.get(event.data.from_address)
     if pair is None:
         ctx.logger.info(f"Pair not found: {event.data.from_address}")
         return
@@ -32,44 +37,42 @@ async def on_mint(
     pair.reserve1 = Decimal(event.payload.reserve1)
     pair.block_timestamp_last = event.payload.block_timestamp
     pair.klast = Decimal(event.payload.reserve0) * Decimal(event.payload.reserve1)
-    await pair.save()
+    pair_cache.stage(ctx, pair)
+    price_oracle.touch(ctx, pair)
     
-    # Update or create position
-    position = await LiquidityPosition.get_or_none(
-        pair_address=event.data.from_address,
-        user_address=hex(event.payload.sender),
+    # Update or create position in a single statement
+    position_id = await upsert(
+        LiquidityPosition,
+        keys={
+            'pair_address': felt(event.data.from_address),
+            'user_address': felt(event.payload.sender),
+        },
+        values={
+            'liquidity': Decimal(event.payload.user_liquidity),
+            'updated_at': event.payload.block_timestamp,
+        },
+        increments={
+            'deposits_token0': Decimal(event.payload.amount0),
+            'deposits_token1': Decimal(event.payload.amount1),
+        },
+        defaults={
+            'withdrawals_token0': Decimal(0),
+            'withdrawals_token1': Decimal(0),
+            'created_at': event.payload.block_timestamp,
+            'pair_id': pair.address,
+        },
     )
-    if position is None:
-        position = LiquidityPosition(
-            pair_address=event.data.from_address,
-            user_address=hex(event.payload.sender),
-            liquidity=Decimal(event.payload.user_liquidity),
-            deposits_token0=Decimal(event.payload.amount0),
-            deposits_token1=Decimal(event.payload.amount1),
-            withdrawals_token0=Decimal(0),
-            withdrawals_token1=Decimal(0),
-            created_at=event.payload.block_timestamp,
-            updated_at=event.payload.block_timestamp,
-            pair=pair,
-        )
-    else:
-        position.liquidity = Decimal(event.payload.user_liquidity)
-        position.deposits_token0 += Decimal(event.payload.amount0)
-        position.deposits_token1 += Decimal(event.payload.amount1)
-        position.updated_at = event.payload.block_timestamp
-
-    await position.save()
     
     # Create event record
     mint_event = LiquidityEvent(
         transaction_hash=event.data.transaction_hash,
         event_type='MINT',
-        sender=hex(event.payload.sender),
+        sender=felt(event.payload.sender),
         amount0=Decimal(event.payload.amount0),
         amount1=Decimal(event.payload.amount1),
         liquidity=Decimal(event.payload.total_liquidity),
         created_at=event.payload.block_timestamp,
         pair=pair,
-        position=position,
+        position_id=position_id,
     )
-    await mint_event.save()
\ No newline at end of file
+    event_buffer.add(ctx, mint_event)
\ No newline at end of file
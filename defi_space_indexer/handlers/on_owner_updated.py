@@ -1,6 +1,9 @@
 from dipdup.context import HandlerContext
 from dipdup.models.starknet import StarknetEvent
-from defi_space_indexer.models.amm_models import Factory
+from defi_space_indexer.models.cache import factory_cache
+from defi_space_indexer.models.felt import felt
+from defi_space_indexer.models.config_models import ConfigChange, ConfigEntityType
+from defi_space_indexer.models.buffer import event_buffer
 from defi_space_indexer.types.amm_factory.starknet_events.owner_updated import OwnerUpdatedPayload
 
 async def on_owner_updated(
@@ -8,17 +11,22 @@ async def on_owner_updated(
     event: StarknetEvent[OwnerUpdatedPayload],
 ) -> None:
     """Handle OwnerUpdated event from Factory contract."""
-    factory = await Factory.get_or_none(address=event.data.from_address)
+    factory = await factory_cache.get(event.data.from_address)
     if factory is None:
         ctx.logger.info(f"Factory not found: {event.data.from_address}")
         return
-    factory.owner = hex(event.payload.new_owner)
+    factory.owner = felt(event.payload.new_owner)
     factory.updated_at = event.payload.block_timestamp
     
-    factory.config_history.append({
-        'field': 'owner',
-        'old_value': hex(event.payload.previous_owner),
-        'new_value': hex(event.payload.new_owner),
-        'timestamp': event.payload.block_timestamp
-    })
-    await factory.save()
\ No newline at end of file
+    config_change = ConfigChange(
+        transaction_hash=event.data.transaction_hash,
+        level=event.data.level,
+        created_at=event.payload.block_timestamp,
+        entity_type=ConfigEntityType.FACTORY,
+        entity_address=factory.address,
+        field='owner',
+        old_value=felt(event.payload.previous_owner),
+        new_value=felt(event.payload.new_owner),
+    )
+    event_buffer.add(ctx, config_change)
+    factory_cache.stage(ctx, factory)
\ No newline at end of file
@@ -1,6 +1,9 @@
 from dipdup.context import HandlerContext
 from dipdup.models.starknet import StarknetEvent
-from defi_space_indexer.models.amm_models import Pair, Factory
+from defi_space_indexer.models.amm_models import Pair
+from defi_space_indexer.models.cache import factory_cache, pair_cache
+from defi_space_indexer.models.felt import felt
+from defi_space_indexer.hooks.contract_indexes import contract_indexes
 from defi_space_indexer.types.amm_factory.starknet_events.pair_created import PairCreatedPayload
 
 async def on_pair_created(
@@ -8,35 +11,21 @@ async def on_pair_created(
     event: StarknetEvent[PairCreatedPayload],
 ) -> None:
     """Handle PairCreated event from Factory contract."""
-    factory = await Factory.get_or_none(address=event.data.from_address)
+    factory = await factory_cache.get(event.data.from_address)
     if factory is None:
         ctx.logger.info(f"Factory not found: {event.data.from_address}")
         return
     
-    # Create contract and index for the new pair
-    pair_address = hex(event.payload.pair)
-    contract_name = f'pair_{pair_address[-8:]}'
-    
-    await ctx.add_contract(
-        name=contract_name,
-        kind='starknet',
-        address=pair_address,
-        typename='amm_pair'
-    )
-    
-    index_name = f'{contract_name}_events'
-    await ctx.add_index(
-        name=index_name,
-        template='pair_events',
-        values={'contract': contract_name}
-    )
+    # Start indexing the new pair
+    pair_address = felt(event.payload.pair)
+    await contract_indexes.add(ctx, 'pair_events', pair_address)
     
     # Create new pair record
     pair = Pair(
         address=pair_address,
-        factory_address=event.data.from_address,
-        token0_address=hex(event.payload.token0),
-        token1_address=hex(event.payload.token1),
+        factory_address=felt(event.data.from_address),
+        token0_address=felt(event.payload.token0),
+        token1_address=felt(event.payload.token1),
         reserve0=0,
         reserve1=0,
         total_supply=0,
@@ -53,11 +42,13 @@ async def on_pair_created(
         apy_24h=0,
         accumulated_fees_token0=0,
         accumulated_fees_token1=0,
+        volume_buckets=[],
         factory=factory,
     )
     await pair.save()
+    pair_cache.add(pair)
     
     # Update factory
     factory.num_of_pairs = event.payload.total_pairs
     factory.updated_at = event.payload.block_timestamp
-    await factory.save()
\ No newline at end of file
+    factory_cache.stage(ctx, factory)
\ No newline at end of file
@@ -1,6 +1,9 @@
 from dipdup.context import HandlerContext
 from dipdup.models.starknet import StarknetEvent
 from defi_space_indexer.models.farming_models import Reactor
+from defi_space_indexer.models.felt import felt
+from defi_space_indexer.models.config_models import ConfigChange, ConfigEntityType
+from defi_space_indexer.models.buffer import event_buffer
 from defi_space_indexer.types.farming_reactor.starknet_events.penalty_receiver_updated import PenaltyReceiverUpdatedPayload
 
 async def on_penalty_receiver_updated(
@@ -12,12 +15,17 @@ async def on_penalty_receiver_updated(
     if reactor is None:
         ctx.logger.info(f"Reactor not found: {event.data.from_address}")
         return
-    reactor.penalty_receiver = hex(event.payload.new_receiver)
+    reactor.penalty_receiver = felt(event.payload.new_receiver)
     reactor.updated_at = event.payload.block_timestamp
-    reactor.config_history.append({
-        'field': 'penalty_receiver',
-        'old_value': hex(event.payload.previous_receiver),
-        'new_value': hex(event.payload.new_receiver),
-        'timestamp': event.payload.block_timestamp,
-    })
+    config_change = ConfigChange(
+        transaction_hash=event.data.transaction_hash,
+        level=event.data.level,
+        created_at=event.payload.block_timestamp,
+        entity_type=ConfigEntityType.REACTOR,
+        entity_address=reactor.address,
+        field='penalty_receiver',
+        old_value=felt(event.payload.previous_receiver),
+        new_value=felt(event.payload.new_receiver),
+    )
+    event_buffer.add(ctx, config_change)
     await reactor.save()
\ No newline at end of file
@@ -1,6 +1,9 @@
 from dipdup.context import HandlerContext
 from dipdup.models.starknet import StarknetEvent
 from defi_space_indexer.models.farming_models import Powerplant
+from defi_space_indexer.models.felt import felt
+from defi_space_indexer.models.config_models import ConfigChange, ConfigEntityType
+from defi_space_indexer.models.buffer import event_buffer
 from defi_space_indexer.types.farming_factory.starknet_events.reactor_class_hash_updated import ReactorClassHashUpdatedPayload
 
 async def on_reactor_class_hash_updated(
@@ -12,13 +15,18 @@ async def on_reactor_class_hash_updated(
     if powerplant is None:
         ctx.logger.info(f"Powerplant not found: {event.data.from_address}")
         return
-    powerplant.reactor_class_hash = hex(event.payload.new_hash)
+    powerplant.reactor_class_hash = felt(event.payload.new_hash)
     powerplant.updated_at = event.payload.block_timestamp
     
-    powerplant.config_history.append({
-        'field': 'reactor_class_hash',
-        'old_value': hex(event.payload.old_hash),
-        'new_value': hex(event.payload.new_hash),
-        'timestamp': event.payload.block_timestamp,
-    })
+    config_change = ConfigChange(
+        transaction_hash=event.data.transaction_hash,
+        level=event.data.level,
+        created_at=event.payload.block_timestamp,
+        entity_type=ConfigEntityType.POWERPLANT,
+        entity_address=powerplant.address,
+        field='reactor_class_hash',
+        old_value=felt(event.payload.old_hash),
+        new_value=felt(event.payload.new_hash),
+    )
+    event_buffer.add(ctx, config_change)
     await powerplant.save()
\ No newline at end of file
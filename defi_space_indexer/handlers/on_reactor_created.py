@@ -2,6 +2,8 @@ from dipdup.context import HandlerContext
 from dipdup.models.starknet import StarknetEvent
 from defi_space_indexer.models.farming_models import Powerplant, Reactor
 from defi_space_indexer.models.amm_models import Pair
+from defi_space_indexer.models.felt import felt
+from defi_space_indexer.hooks.contract_indexes import contract_indexes
 from defi_space_indexer.types.farming_factory.starknet_events.reactor_created import ReactorCreatedPayload
 
 async def on_reactor_created(
@@ -25,29 +27,15 @@ async def on_reactor_created(
         ctx.logger.info(f"Powerplant not found: {event.data.from_address}")
         return
     
-    # Create contract and index for the new reactor
-    reactor_address = hex(event.payload.reactor)
-    contract_name = f'reactor_{reactor_address[-8:]}'
-    
-    await ctx.add_contract(
-        name=contract_name,
-        kind='starknet',
-        address=reactor_address,
-        typename='farming_reactor'
-    )
-    
-    index_name = f'{contract_name}_events'
-    await ctx.add_index(
-        name=index_name,
-        template='reactor_events',
-        values={'contract': contract_name}
-    )
+    # Start indexing the new reactor
+    reactor_address = felt(event.payload.reactor)
+    await contract_indexes.add(ctx, 'reactor_events', reactor_address)
     
     # Create new reactor record
     reactor = Reactor(
         address=reactor_address,
-        powerplant_address=event.data.from_address,
-        lp_token_address=hex(event.payload.lp_token),
+        powerplant_address=felt(event.data.from_address),
+        lp_token_address=felt(event.payload.lp_token),
         reactor_index=event.payload.reactor_index,
         created_at=event.payload.block_timestamp,
         updated_at=event.payload.block_timestamp,
@@ -57,10 +45,8 @@ async def on_reactor_created(
         locked=False,
         penalty_duration=event.payload.penalty_duration,
         withdraw_penalty=event.payload.withdraw_penalty,
-        penalty_receiver=hex(event.payload.penalty_receiver),
+        penalty_receiver=felt(event.payload.penalty_receiver),
         authorized_rewarders=[],
-        config_history=[],
-        active_rewards={},
         powerplant=powerplant,
     )
     await reactor.save()
@@ -1,6 +1,9 @@
 from dipdup.context import HandlerContext
 from dipdup.models.starknet import StarknetEvent
 from defi_space_indexer.models.farming_models import Reactor
+from defi_space_indexer.models.felt import felt
+from defi_space_indexer.models.config_models import ConfigChange, ConfigEntityType
+from defi_space_indexer.models.buffer import event_buffer
 from defi_space_indexer.types.farming_reactor.starknet_events.ownership_transferred import OwnershipTransferredPayload
 
 async def on_reactor_ownership_transferred(
@@ -12,12 +15,17 @@ async def on_reactor_ownership_transferred(
     if reactor is None:
         ctx.logger.info(f"Reactor not found: {event.data.from_address}")
         return
-    reactor.owner = hex(event.payload.new_owner)
+    reactor.owner = felt(event.payload.new_owner)
     reactor.updated_at = event.payload.block_timestamp
-    reactor.config_history.append({
-        'field': 'owner',
-        'old_value': hex(event.payload.previous_owner),
-        'new_value': hex(event.payload.new_owner),
-        'timestamp': event.payload.block_timestamp,
-    })
+    config_change = ConfigChange(
+        transaction_hash=event.data.transaction_hash,
+        level=event.data.level,
+        created_at=event.payload.block_timestamp,
+        entity_type=ConfigEntityType.REACTOR,
+        entity_address=reactor.address,
+        field='owner',
+        old_value=felt(event.payload.previous_owner),
+        new_value=felt(event.payload.new_owner),
+    )
+    event_buffer.add(ctx, config_change)
     await reactor.save()
\ No newline at end of file
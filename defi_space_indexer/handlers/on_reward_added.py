@@ -1,6 +1,9 @@
 from dipdup.context import HandlerContext
 from dipdup.models.starknet import StarknetEvent
-from defi_space_indexer.models.farming_models import Reactor, RewardEvent
+from defi_space_indexer.models.farming_models import Reactor, RewardEvent, RewardSchedule
+from defi_space_indexer.models.buffer import event_buffer
+from defi_space_indexer.models.upsert import upsert
+from defi_space_indexer.models.felt import felt
 from defi_space_indexer.types.farming_reactor.starknet_events.reward_added import RewardAddedPayload
 from decimal import Decimal
 
@@ -14,27 +17,41 @@ async def on_reward_added(
         ctx.logger.info(f"Reactor not found: {event.data.from_address}")
         return
     
-    # Update active rewards properly
-    reactor.active_rewards[hex(event.payload.reward_token)] = {
-        'rate': Decimal(event.payload.reward_rate),
-        'reward_amount': Decimal(event.payload.reward_amount),
-        'duration': event.payload.reward_duration,
-        'finish': event.payload.period_finish,
-        'stored': event.payload.reward_per_token_stored,
-    }
+    # Start a new reward period for the token
+    await upsert(
+        RewardSchedule,
+        keys={
+            'reactor_address': reactor.address,
+            'reward_token': felt(event.payload.reward_token),
+        },
+        values={
+            'reward_rate': Decimal(event.payload.reward_rate),
+            'reward_amount': Decimal(event.payload.reward_amount),
+            'reward_duration': event.payload.reward_duration,
+            'period_finish': event.payload.period_finish,
+            'reward_per_token_stored': Decimal(event.payload.reward_per_token_stored),
+            'last_update_time': event.payload.block_timestamp,
+            'unallocated_rewards': Decimal(event.payload.unallocated_rewards),
+            'updated_at': event.payload.block_timestamp,
+        },
+        defaults={
+            'created_at': event.payload.block_timestamp,
+            'reactor_id': reactor.address,
+        },
+    )
     reactor.updated_at = event.payload.block_timestamp
     await reactor.save()
     
     reward_event = RewardEvent(
         transaction_hash=event.data.transaction_hash,
         event_type='REWARD_ADDED',
-        reward_token=hex(event.payload.reward_token),
+        reward_token=felt(event.payload.reward_token),
         reward_amount=Decimal(event.payload.reward_amount),
         reward_rate=Decimal(event.payload.reward_rate),
         reward_duration=event.payload.reward_duration,
         period_finish=event.payload.period_finish,
-        user_address=hex(event.payload.rewarder),
+        user_address=felt(event.payload.rewarder),
         created_at=event.payload.block_timestamp,
         reactor=reactor,
     )
-    await reward_event.save()
\ No newline at end of file
+    event_buffer.add(ctx, reward_event)
\ No newline at end of file
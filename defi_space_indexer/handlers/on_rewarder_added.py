@@ -1,6 +1,7 @@
 from dipdup.context import HandlerContext
 from dipdup.models.starknet import StarknetEvent
 from defi_space_indexer.models.farming_models import Reactor
+from defi_space_indexer.models.felt import felt
 from defi_space_indexer.types.farming_reactor.starknet_events.rewarder_added import RewarderAddedPayload
 
 async def on_rewarder_added(
@@ -12,7 +13,7 @@ async def on_rewarder_added(
     if reactor is None:
         ctx.logger.info(f"Reactor not found: {event.data.from_address}")
         return
-    if hex(event.payload.rewarder) not in reactor.authorized_rewarders:
-        reactor.authorized_rewarders.append(hex(event.payload.rewarder))
+    if felt(event.payload.rewarder) not in reactor.authorized_rewarders:
+        reactor.authorized_rewarders.append(felt(event.payload.rewarder))
     reactor.updated_at = event.payload.block_timestamp
     await reactor.save()
\ No newline at end of file
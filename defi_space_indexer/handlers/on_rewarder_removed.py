@@ -1,6 +1,7 @@
 from dipdup.context import HandlerContext
 from dipdup.models.starknet import StarknetEvent
 from defi_space_indexer.models.farming_models import Reactor
+from defi_space_indexer.models.felt import felt
 from defi_space_indexer.types.farming_reactor.starknet_events.rewarder_removed import RewarderRemovedPayload
 
 async def on_rewarder_removed(
@@ -12,7 +13,7 @@ async def on_rewarder_removed(
     if reactor is None:
         ctx.logger.info(f"Reactor not found: {event.data.from_address}")
         return
-    if hex(event.payload.rewarder) in reactor.authorized_rewarders:
-        reactor.authorized_rewarders.remove(hex(event.payload.rewarder))
+    if felt(event.payload.rewarder) in reactor.authorized_rewarders:
+        reactor.authorized_rewarders.remove(felt(event.payload.rewarder))
     reactor.updated_at = event.payload.block_timestamp
     await reactor.save()
\ No newline at end of file
@@ -1,6 +1,13 @@
 from dipdup.context import HandlerContext
 from dipdup.models.starknet import StarknetEvent
-from defi_space_indexer.models.amm_models import SwapEvent, Pair
+from defi_space_indexer.models.amm_models import SwapEvent
+from defi_space_indexer.models.cache import pair_cache
+from defi_space_indexer.hooks.price_oracle import price_oracle
+from defi_space_indexer.hooks.volume_window import VolumeWindow
+from defi_space_indexer.hooks import candles
+from defi_space_indexer.models.buffer import event_buffer
+from defi_space_indexer.models.felt import felt
+from defi_space_indexer.hooks.metrics_scheduler import metrics_scheduler
 from defi_space_indexer.types.amm_pair.starknet_events.swap import SwapPayload
 from decimal import Decimal
 
@@ -21,23 +28,46 @@ async def on_swap(
     - recipient: Address receiving output tokens
     """
      # Update pair
-    pair = await Pair.get_or_none(address=event.data.from_address)
+    pair = await pair_cache.get(event.data.from_address)
     if pair is None:
         ctx.logger.info(f"Pair not found: {event.data.from_address}")
         return
 
+    previous_price = candles.pair_price(pair)
     pair.reserve0 = Decimal(event.payload.reserve0)
     pair.reserve1 = Decimal(event.payload.reserve1)
     pair.block_timestamp_last = event.payload.block_timestamp
     pair.klast = Decimal(event.payload.reserve0) * Decimal(event.payload.reserve1)
     pair.updated_at = event.payload.block_timestamp
 
-    await pair.save()
+    # Account volume and fees in the rolling 24h window
+    window = VolumeWindow(pair.volume_buckets)
+    fees0, fees1 = window.add(
+        event.payload.block_timestamp,
+        event.payload.amount0_in,
+        event.payload.amount1_in,
+        event.payload.amount0_out,
+        event.payload.amount1_out,
+    )
+    pair.volume_buckets = window.dump()
+    pair.accumulated_fees_token0 = Decimal(pair.accumulated_fees_token0 or 0) + fees0
+    pair.accumulated_fees_token1 = Decimal(pair.accumulated_fees_token1 or 0) + fees1
+    pair_cache.stage(ctx, pair)
+    price_oracle.touch(ctx, pair)
+    await candles.record(
+        ctx,
+        pair,
+        event.payload.block_timestamp,
+        previous_price,
+        volume0=event.payload.amount0_in + event.payload.amount0_out,
+        volume1=event.payload.amount1_in + event.payload.amount1_out,
+        trades=1,
+    )
 
     # Create swap event record
     swap_event = SwapEvent(
         transaction_hash=event.data.transaction_hash,
-        sender=hex(event.payload.sender),
+        sender=felt(event.payload.sender),
         amount0_in=Decimal(event.payload.amount0_in),
         amount1_in=Decimal(event.payload.amount1_in),
         amount0_out=Decimal(event.payload.amount0_out),
@@ -45,11 +75,7 @@ async def on_swap(
         created_at=event.payload.block_timestamp,
         pair=pair,
     )
-    await swap_event.save()
+    event_buffer.add(ctx, swap_event)
     
-    # Update metrics after significant events
-    await ctx.fire_hook(
-        'calculate_amm_metrics',
-        pair_address=event.data.from_address,
-        wait=False
-    )
\ No newline at end of file
+    # Schedule metrics update; coalesced with other events of this pair
+    metrics_scheduler.touch_pair(ctx, event.data.from_address)
\ No newline at end of file
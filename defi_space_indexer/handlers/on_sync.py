@@ -1,6 +1,9 @@
 from dipdup.context import HandlerContext
 from dipdup.models.starknet import StarknetEvent
-from defi_space_indexer.models.amm_models import Pair
+from defi_space_indexer.models.cache import pair_cache
+from defi_space_indexer.hooks.price_oracle import price_oracle
+from defi_space_indexer.hooks import candles
+from defi_space_indexer.hooks.metrics_scheduler import metrics_scheduler
 from defi_space_indexer.types.amm_pair.starknet_events.sync import SyncPayload
 from decimal import Decimal
 
@@ -9,8 +12,8 @@ async def on_sync(
     event: StarknetEvent[SyncPayload],
 ) -> None:
     """Handle Sync event from Pair contract."""
-    # Get the pair from database first
-    pair = await Pair.get_or_none(address=event.data.from_address)
+    # Get the pair from the level cache first
+    pair = await pair_cache.get(event.data.from_address)
     
     # If pair doesn't exist yet, skip processing
     if not pair:
@@ -18,6 +21,7 @@ async def on_sync(
         return
 
     # Update pair
+    previous_price = candles.pair_price(pair)
     pair.reserve0 = Decimal(event.payload.reserve0)
     pair.reserve1 = Decimal(event.payload.reserve1)
     pair.price_0_cumulative_last = event.payload.price_0_cumulative_last
@@ -25,12 +29,9 @@ async def on_sync(
     pair.block_timestamp_last = event.payload.block_timestamp
     pair.klast = Decimal(event.payload.reserve0) * Decimal(event.payload.reserve1)
     pair.updated_at = event.payload.block_timestamp
-
-    await pair.save()
+    pair_cache.stage(ctx, pair)
+    price_oracle.touch(ctx, pair)
+    await candles.record(ctx, pair, event.payload.block_timestamp, previous_price)
     
-    # Trigger metrics calculation
-    await ctx.fire_hook(
-        'calculate_amm_metrics',
-        pair_address=event.data.from_address,
-        wait=False  # Don't block the handler
-    )
\ No newline at end of file
+    # Schedule metrics calculation; coalesced with other events of this pair
+    metrics_scheduler.touch_pair(ctx, event.data.from_address)
\ No newline at end of file
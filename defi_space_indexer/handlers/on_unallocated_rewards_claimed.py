@@ -1,6 +1,8 @@
 from dipdup.context import HandlerContext
 from dipdup.models.starknet import StarknetEvent
-from defi_space_indexer.models.farming_models import Reactor
+from defi_space_indexer.models.farming_models import Reactor, RewardSchedule
+from defi_space_indexer.models.upsert import update
+from defi_space_indexer.models.felt import felt
 from defi_space_indexer.types.farming_reactor.starknet_events.unallocated_rewards_claimed import UnallocatedRewardsClaimedPayload
 from decimal import Decimal
 
@@ -13,8 +15,17 @@ async def on_unallocated_rewards_claimed(
     if reactor is None:
         ctx.logger.info(f"Reactor not found: {event.data.from_address}")
         return
-    # Update unallocated rewards in active_rewards
-    if event.payload.reward_token in reactor.active_rewards:
-        reactor.active_rewards[hex(event.payload.reward_token)]['unallocated'] = Decimal(event.payload.unallocated_rewards)
+    # Update unallocated rewards of the token's schedule
+    await update(
+        RewardSchedule,
+        keys={
+            'reactor_address': reactor.address,
+            'reward_token': felt(event.payload.reward_token),
+        },
+        values={
+            'unallocated_rewards': Decimal(event.payload.unallocated_rewards),
+            'updated_at': event.payload.block_timestamp,
+        },
+    )
     reactor.updated_at = event.payload.block_timestamp
     await reactor.save() 
\ No newline at end of file
@@ -1,6 +1,11 @@
 from dipdup.context import HandlerContext
 from dipdup.models.starknet import StarknetEvent
 from defi_space_indexer.models.farming_models import Reactor, UserStake, StakeEvent
+from defi_space_indexer.models.buffer import event_buffer
+from defi_space_indexer.models.upsert import update
+from defi_space_indexer.models.felt import felt
+from defi_space_indexer.hooks.metrics_scheduler import metrics_scheduler
+from defi_space_indexer.hooks.reward_engine import update_reward
 from defi_space_indexer.types.farming_reactor.starknet_events.withdraw import WithdrawPayload
 from decimal import Decimal
 
@@ -16,32 +21,45 @@ async def on_withdraw(
     reactor.updated_at = event.payload.block_timestamp
     await reactor.save()
     
-    stake = await UserStake.get_or_none(
-        reactor_address=event.data.from_address,
-        user_address=hex(event.payload.user_address),
+    # Update stake in a single statement
+    stake_id = await update(
+        UserStake,
+        keys={
+            'reactor_address': felt(event.data.from_address),
+            'user_address': felt(event.payload.user_address),
+        },
+        values={
+            'penalty_end_time': event.payload.penalty_end_time,
+            'updated_at': event.payload.block_timestamp,
+        },
+        increments={
+            'staked_amount': -Decimal(event.payload.staked_amount),
+        },
     )
-    if stake is None:
-       ctx.logger.info(f"Stake not found: {event.data.from_address} {hex(event.payload.user_address)}")
+    if stake_id is None:
+       ctx.logger.info(f"Stake not found: {event.data.from_address} {felt(event.payload.user_address)}")
        return
-    stake.staked_amount -= Decimal(event.payload.staked_amount)
-    stake.penalty_end_time = event.payload.penalty_end_time
-    stake.updated_at = event.payload.block_timestamp
-    await stake.save()
+    
+    # Settle rewards accrued at the stakes from before the withdrawal
+    await update_reward(
+        reactor_address=reactor.address,
+        stake_id=stake_id,
+        user_address=felt(event.payload.user_address),
+        staked_amount=event.payload.user_staked + event.payload.staked_amount,
+        total_staked=event.payload.total_staked + event.payload.staked_amount,
+        timestamp=event.payload.block_timestamp,
+    )
     
     stake_event = StakeEvent(
         transaction_hash=event.data.transaction_hash,
         event_type='WITHDRAW',
-        user_address=hex(event.payload.user_address),
+        user_address=felt(event.payload.user_address),
         staked_amount=Decimal(event.payload.staked_amount),
         penalty_amount=Decimal(event.payload.penalty_amount),
         created_at=event.payload.block_timestamp,
         reactor=reactor,
-        stake=stake,
+        stake_id=stake_id,
     )
-    await stake_event.save()
+    event_buffer.add(ctx, stake_event)
     
-    await ctx.fire_hook(
-        'calculate_farming_metrics',
-        reactor_address=event.data.from_address,
-        wait=False
-    )
\ No newline at end of file
+    metrics_scheduler.touch_reactor(ctx, event.data.from_address)
\ No newline at end of file
@@ -0,0 +1,39 @@
+import asyncio
+import logging
+import time
+
+from dipdup.context import DipDupContext
+from dipdup.database import get_connection
+from dipdup.prometheus import Histogram
+
+ANALYTICS_VIEWS = ('top_pairs', 'user_portfolio', 'reactor_stakers')
+
+EXISTING_VIEWS_SQL = 'SELECT matviewname::TEXT FROM pg_matviews WHERE matviewname = ANY($1)'
+
+_logger = logging.getLogger(__name__)
+
+_duration = Histogram('defi_space_analytics_view_refresh_seconds', 'Duration of analytics view refreshes', ['view'])
+
+_lock = asyncio.Lock()
+
+
+async def refresh_analytics_views(ctx: DipDupContext) -> None:
+    """Refresh materialized views created by `sql/migrations` (PostgreSQL only).
+
+    Views are refreshed concurrently, so GraphQL reads are never blocked. A refresh
+    requested while the previous one is running is skipped.
+    """
+    if ctx.config.database.kind != 'postgres':
+        return
+    if _lock.locked():
+        _logger.info('Analytics views are being refreshed; skipping')
+        return
+
+    async with _lock:
+        conn = get_connection()
+        # NOTE: Views are created on restart; skip ones dropped by hand since then
+        _, rows = await conn.execute_query(EXISTING_VIEWS_SQL, [list(ANALYTICS_VIEWS)])
+        for (view,) in rows:
+            started_at = time.perf_counter()
+            await conn.execute_script(f'REFRESH MATERIALIZED VIEW CONCURRENTLY {view}')
+            _duration[view] += time.perf_counter() - started_at
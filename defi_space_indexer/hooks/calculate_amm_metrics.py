@@ -1,7 +1,97 @@
+from collections import defaultdict
+from collections.abc import Sequence
 from decimal import Decimal
+from functools import partial
+from typing import NamedTuple
 from dipdup.context import HookContext
 from defi_space_indexer.models.amm_models import Factory, Pair
-from defi_space_indexer.hooks.dexscreener import get_token_pairs
+from defi_space_indexer.models.upsert import update
+from defi_space_indexer.hooks.dexscreener import get_client
+from defi_space_indexer.hooks.metrics_runner import metrics_runner
+from defi_space_indexer.hooks.price_oracle import price_oracle
+from defi_space_indexer.hooks.volume_window import VolumeWindow
+
+METRIC_FIELDS = ['token0_price', 'token1_price', 'tvl_usd', 'volume_24h', 'apy_24h']
+
+
+class PairsSnapshot(NamedTuple):
+    """Inputs shared by every batch of a metrics run."""
+
+    prices: dict[str, Decimal]
+    timestamp: int  # Latest block timestamp of any pair; windows of pairs without recent swaps end at it
+
+
+async def get_prices(ctx: HookContext, tokens: set[str]) -> dict[str, Decimal]:
+    """Resolve USD prices from the on-chain oracle and DexScreener, in order set by oracle mode."""
+    price_oracle.configure(ctx)
+    if price_oracle.mode == 'primary':
+        prices = await price_oracle.get_prices(ctx, tokens)
+        missing = tokens - prices.keys()
+        if missing:
+            prices.update(await get_client(ctx).get_token_prices("starknet", missing))
+        return prices
+
+    prices = await get_client(ctx).get_token_prices("starknet", tokens)
+    missing = tokens - prices.keys()
+    if missing and price_oracle.mode == 'fallback':
+        prices.update(await price_oracle.get_prices(ctx, missing))
+    return prices
+
+
+def update_pair_metrics(pair: Pair, prices: dict[str, Decimal], timestamp: int) -> None:
+    """Set pair prices, TVL, 24h volume and APY."""
+    # Get USD prices
+    token0_price = prices.get(pair.token0_address, Decimal(0))
+    token1_price = prices.get(pair.token1_address, Decimal(0))
+    if token0_price <= 0 or token1_price <= 0:
+        return
+
+    # NOTE: Reserves and volumes are raw amounts; prices are per whole token
+    scale0 = Decimal(10) ** price_oracle.decimals(pair.token0_address)
+    scale1 = Decimal(10) ** price_oracle.decimals(pair.token1_address)
+
+    # Set token prices
+    pair.token0_price = token0_price
+    pair.token1_price = token1_price
+
+    # Calculate TVL in USD
+    tvl_token0 = Decimal(pair.reserve0) / scale0 * token0_price
+    tvl_token1 = Decimal(pair.reserve1) / scale1 * token1_price
+    tvl = tvl_token0 + tvl_token1
+    pair.tvl_usd = int(tvl)
+
+    # Calculate 24h volume and APY from the rolling window maintained by `on_swap`
+    window = VolumeWindow(pair.volume_buckets)
+    window.expire(max(timestamp, pair.block_timestamp_last))
+    totals = window.totals()
+    # NOTE: Both sides of every swap are counted; halve to get traded value
+    volume_24h = (totals.volume0 / scale0 * token0_price + totals.volume1 / scale1 * token1_price) / 2
+    fees_24h = totals.fees0 / scale0 * token0_price + totals.fees1 / scale1 * token1_price
+    pair.volume_24h = int(volume_24h)
+    pair.apy_24h = (fees_24h * 365) / tvl if tvl > 0 else Decimal(0)
+
+
+async def get_snapshot(ctx: HookContext, pairs: Sequence[Pair]) -> PairsSnapshot:
+    """Prices of tokens of all pairs and the chain time; once per run, as pairs of different batches share tokens."""
+    tokens = {pair.token0_address for pair in pairs} | {pair.token1_address for pair in pairs}
+    # NOTE: Read from pairs rather than tracked in memory, so it survives restarts and follows rollbacks
+    latest = Pair.all().order_by('-block_timestamp_last').first()
+    timestamp = await latest.values_list('block_timestamp_last', flat=True)
+    return PairsSnapshot(await get_prices(ctx, tokens), timestamp or 0)
+
+
+async def update_pairs(snapshot: PairsSnapshot, pairs: Sequence[Pair]) -> dict[str, int]:
+    """Calculate metrics of a batch of pairs and write them with one bulk update. Returns TVL change per factory."""
+    deltas: defaultdict[str, int] = defaultdict(int)
+    for pair in pairs:
+        previous = pair.tvl_usd or 0
+        update_pair_metrics(pair, snapshot.prices, snapshot.timestamp)
+        deltas[pair.factory_address] += (pair.tvl_usd or 0) - previous
+
+    # NOTE: Write metrics only; reserves are owned by handlers and may be newer than these instances
+    await Pair.bulk_update(pairs, fields=METRIC_FIELDS)
+    return deltas
+
 
 async def calculate_amm_metrics(
     ctx: HookContext,
@@ -23,49 +113,30 @@ async def calculate_amm_metrics(
     else:
         pairs = await Pair.all()
 
-    # Calculate metrics for each pair
-    total_tvl = Decimal(0)
-    for pair in pairs:
-        # Fetch price data from DexScreener
-        token0_pairs = await get_token_pairs("starknet", pair.token0_address)
-        token1_pairs = await get_token_pairs("starknet", pair.token1_address)
-        
-        # Get USD prices
-        token0_price = Decimal(0)
-        token1_price = Decimal(0)
-        
-        for pair_info in token0_pairs:
-            if pair_info.get("priceUsd"):
-                token0_price = Decimal(pair_info["priceUsd"])
-                break
-                
-        for pair_info in token1_pairs:
-            if pair_info.get("priceUsd"):
-                token1_price = Decimal(pair_info["priceUsd"])
-                break
-        
-        # Calculate pair metrics
-        if token0_price > 0 and token1_price > 0:
-            # Set token prices
-            pair.token0_price = token0_price
-            pair.token1_price = token1_price
-            
-            # Calculate TVL in USD
-            tvl_token0 = Decimal(pair.reserve0) * token0_price
-            tvl_token1 = Decimal(pair.reserve1) * token1_price
-            pair.tvl_usd = tvl_token0 + tvl_token1
-            total_tvl += pair.tvl_usd
-            
-            # Calculate 24h APY using fees and volume
-            if pair.volume_24h > 0:
-                fees_24h = Decimal(pair.volume_24h) * Decimal('0.003')  # 0.3% fee
-                pair.apy_24h = (fees_24h * 365) / pair.tvl_usd if pair.tvl_usd > 0 else 0
-        
-        await pair.save()
-    
-    # Update factory TVL if needed
-    if factory_address:
-        factory = await Factory.get_or_none(address=factory_address)
-        if factory:
-            factory.total_value_locked_usd = total_tvl
-            await factory.save() 
\ No newline at end of file
+    pairs = [pair for pair in pairs if pair is not None]
+
+    # Calculate metrics for batches of pairs concurrently
+    results = await metrics_runner.run(
+        ctx,
+        'calculate_amm_metrics',
+        (factory_address, pair_address),
+        pairs,
+        partial(get_snapshot, ctx),
+        update_pairs,
+    )
+    if results is None:
+        return
+
+    # Update factory TVL
+    if not (factory_address or pair_address):
+        # NOTE: Full runs recompute every factory from scratch, correcting drift of incremental updates
+        await ctx.execute_sql_query('metrics.factory_tvl')
+        return
+
+    deltas: defaultdict[str, int] = defaultdict(int)
+    for batch_deltas in results:
+        for address, delta in batch_deltas.items():
+            deltas[address] += delta
+    for address, delta in deltas.items():
+        if delta:
+            await update(Factory, {'address': address}, {}, increments={'total_value_locked_usd': delta})
@@ -1,16 +1,100 @@
+from collections import defaultdict
+from collections.abc import Sequence
 from decimal import Decimal
+from functools import partial
 from dipdup.context import HookContext
-from defi_space_indexer.models.farming_models import Powerplant, Reactor, UserStake
+from dipdup.database import AsyncpgClient
+from dipdup.database import get_connection
+from defi_space_indexer.models.farming_models import Powerplant, Reactor
 from defi_space_indexer.models.amm_models import Pair
-from defi_space_indexer.hooks.dexscreener import get_token_pairs
+from defi_space_indexer.models.upsert import update
+from defi_space_indexer.models.felt import felt_bytes
+from defi_space_indexer.hooks.calculate_amm_metrics import get_prices
+from defi_space_indexer.hooks.metrics_runner import metrics_runner
+from defi_space_indexer.hooks.price_oracle import price_oracle
+
+METRIC_FIELDS = ['tvl_usd']
+
+# NOTE: Stake value is the stake's share of the reactor TVL written just before; rows that wouldn't change are skipped
+REVALUE_STAKES_SQL = """
+UPDATE user_stake
+SET usd_value = revalued.usd_value
+FROM (
+    SELECT stake.id, CASE
+        WHEN reactor.total_staked > 0 THEN CAST(stake.staked_amount * reactor.tvl_usd / reactor.total_staked AS BIGINT)
+        ELSE 0
+    END AS usd_value
+    FROM user_stake AS stake
+    JOIN reactor ON reactor.address = stake.reactor_address
+    WHERE reactor.address = {}
+) AS revalued
+WHERE user_stake.id = revalued.id AND user_stake.usd_value IS DISTINCT FROM revalued.usd_value
+"""
+
+
+async def revalue_stakes(reactor_address: str) -> int:
+    """Set `UserStake.usd_value` of every stake in the reactor with a single statement. Returns rows updated."""
+    conn = get_connection()
+    param = '$1' if isinstance(conn, AsyncpgClient) else '?'
+    # NOTE: Derived column; not journaled for rollback since the next run recomputes it from reverted rows
+    count, _ = await conn.execute_query(REVALUE_STAKES_SQL.format(param), [felt_bytes(reactor_address)])
+    return count  # type: ignore[no-any-return]
+
+
+def get_reactor_tvl(reactor: Reactor, pair: Pair | None, lp_price: Decimal | None) -> Decimal:
+    """USD value of LP tokens staked in the reactor."""
+    total_staked = Decimal(reactor.total_staked)
+    if lp_price:
+        return total_staked / Decimal(10) ** price_oracle.decimals(reactor.lp_token_address) * lp_price
+    # NOTE: LP tokens are rarely listed; value them as a share of the pair TVL
+    if pair is not None and pair.tvl_usd and pair.total_supply > 0:
+        return total_staked * Decimal(pair.tvl_usd) / Decimal(pair.total_supply)
+    return Decimal(0)
+
+
+async def get_lp_prices(ctx: HookContext, reactors: Sequence[Reactor]) -> dict[str, Decimal]:
+    """Prices of LP tokens of all reactors, resolved once per run, not per batch."""
+    return await get_prices(ctx, {reactor.lp_token_address for reactor in reactors})
+
+
+async def update_reactors(
+    ctx: HookContext,
+    prices: dict[str, Decimal],
+    reactors: Sequence[Reactor],
+) -> dict[str, int]:
+    """Calculate metrics of a batch of reactors and write them with one bulk update. Returns TVL change per powerplant."""
+    # NOTE: Resolve pairs of all LP tokens once per batch
+    lp_tokens = {reactor.lp_token_address for reactor in reactors}
+    pairs = {pair.address: pair for pair in await Pair.filter(address__in=lp_tokens)}
+
+    deltas: defaultdict[str, int] = defaultdict(int)
+    for reactor in reactors:
+        pair = pairs.get(reactor.lp_token_address)
+        if pair is None:
+            ctx.logger.info(f"Pair not found for reactor {reactor.address}")
+
+        tvl_usd = get_reactor_tvl(reactor, pair, prices.get(reactor.lp_token_address))
+        deltas[reactor.powerplant_address] += int(tvl_usd) - (reactor.tvl_usd or 0)
+        reactor.tvl_usd = int(tvl_usd)
+
+    # NOTE: Write metrics only; staking state is owned by handlers and may be newer than these instances
+    await Reactor.bulk_update(reactors, fields=METRIC_FIELDS)
+
+    # Update user stakes
+    for reactor in reactors:
+        await revalue_stakes(reactor.address)
+    return deltas
+
 
 async def calculate_farming_metrics(
     ctx: HookContext,
     powerplant_address: str | None = None,
     reactor_address: str | None = None,
 ) -> None:
-    """Calculate farming metrics like TVL, APR, rewards.
-    
+    """Calculate farming metrics like TVL and stake values.
+
+    Reward APR and claimable rewards are calculated by `calculate_reward_metrics`.
+
     Can be run for:
     - Single reactor (reactor_address provided)
     - All reactors in a powerplant (powerplant_address provided)
@@ -24,43 +108,30 @@ async def calculate_farming_metrics(
     else:
         reactors = await Reactor.all()
 
-    # Calculate metrics for each reactor
-    total_tvl = Decimal(0)
-    for reactor in reactors:
-        # Get associated pair for LP token price
-        pair = await Pair.get_or_none(address=reactor.lp_token_address)
-        if pair is None:
-            ctx.logger.info(f"Pair not found for reactor {reactor.address}")
-            continue
-        
-        # Get LP token price from DexScreener
-        lp_pairs = await get_token_pairs("starknet", pair.address)
-        lp_price_usd = Decimal(0)
-        
-        for pair_info in lp_pairs:
-            if pair_info.get("priceUsd"):
-                lp_price_usd = Decimal(pair_info["priceUsd"])
-                break
-        
-        # Calculate TVL using LP token price
-        if lp_price_usd > 0:
-            tvl_usd = Decimal(reactor.total_staked) * lp_price_usd
-        else:
-            # Fallback to pair TVL ratio if LP price not available
-            tvl_usd = Decimal(reactor.total_staked) * Decimal(pair.tvl_usd) / Decimal(pair.total_supply) if pair.total_supply > 0 else 0
-        
-        total_tvl += tvl_usd
-        
-        # Update user stakes
-        stakes = await UserStake.filter(reactor_address=reactor.address)
-        for stake in stakes:
-            stake_share = Decimal(stake.staked_amount) / Decimal(reactor.total_staked) if reactor.total_staked > 0 else 0
-            stake.usd_value = stake_share * tvl_usd
-            await stake.save()
-    
-    # Update powerplant TVL if needed
-    if powerplant_address:
-        powerplant = await Powerplant.get_or_none(address=powerplant_address)
-        if powerplant:
-            powerplant.total_value_locked_usd = total_tvl
-            await powerplant.save() 
\ No newline at end of file
+    reactors = [reactor for reactor in reactors if reactor is not None]
+
+    # Calculate metrics for batches of reactors concurrently
+    results = await metrics_runner.run(
+        ctx,
+        'calculate_farming_metrics',
+        (powerplant_address, reactor_address),
+        reactors,
+        partial(get_lp_prices, ctx),
+        partial(update_reactors, ctx),
+    )
+    if results is None:
+        return
+
+    # Update powerplant TVL
+    if not (powerplant_address or reactor_address):
+        # NOTE: Full runs recompute every powerplant from scratch, correcting drift of incremental updates
+        await ctx.execute_sql_query('metrics.powerplant_tvl')
+        return
+
+    deltas: defaultdict[str, int] = defaultdict(int)
+    for batch_deltas in results:
+        for address, delta in batch_deltas.items():
+            deltas[address] += delta
+    for address, delta in deltas.items():
+        if delta:
+            await update(Powerplant, {'address': address}, {}, increments={'total_value_locked_usd': delta})
@@ -0,0 +1,13 @@
+from dipdup.context import HookContext
+from defi_space_indexer.hooks.reward_engine import update_rewards
+
+
+async def calculate_reward_metrics(
+    ctx: HookContext,
+    timestamp: int | None = None,
+) -> None:
+    """Calculate claimable rewards of every staker and reward APR of every reactor.
+
+    Rewards are accrued up to `timestamp`, wall clock time if not provided.
+    """
+    await update_rewards(ctx, timestamp)
@@ -0,0 +1,100 @@
+from decimal import Decimal
+
+from dipdup.context import HandlerContext
+
+from defi_space_indexer.hooks.price_oracle import price_oracle
+from defi_space_indexer.models.amm_models import CandleResolution, Pair, PairCandle
+from defi_space_indexer.models.cache import candle_cache
+
+RESOLUTIONS = {
+    CandleResolution.MINUTE: 60,
+    CandleResolution.FIVE_MINUTES: 5 * 60,
+    CandleResolution.HOUR: 60 * 60,
+    CandleResolution.DAY: 24 * 60 * 60,
+}
+
+# NOTE: Latest candle of every (pair, resolution); closed ones are evicted from the identity map
+_current: dict[tuple[str, CandleResolution], str] = {}
+
+
+def reset() -> None:
+    """Forget latest candles; call after a rollback reverted them."""
+    _current.clear()
+
+
+def pair_price(pair: Pair) -> Decimal | None:
+    """Spot price of token0 in token1 from reserves, adjusted for decimals."""
+    reserve0, reserve1 = Decimal(pair.reserve0), Decimal(pair.reserve1)
+    if reserve0 <= 0 or reserve1 <= 0:
+        return None
+    decimals = price_oracle.decimals(pair.token0_address) - price_oracle.decimals(pair.token1_address)
+    return reserve1 / reserve0 * Decimal(10) ** decimals
+
+
+async def get_previous_close(pair: Pair, resolution: CandleResolution, start: int) -> Decimal | None:
+    """Close of the pair's latest candle before `start`; loaded from the database after a restart."""
+    if (previous := _current.get((pair.address, resolution))) is not None:
+        candle = await candle_cache.get(previous)
+    else:
+        candle = (
+            await PairCandle.filter(pair_id=pair.address, resolution=resolution, start__lt=start)
+            .order_by('-start')
+            .first()
+        )
+    return candle.close if candle is not None else None
+
+
+async def record(
+    ctx: HandlerContext,
+    pair: Pair,
+    timestamp: int,
+    previous_price: Decimal | None,
+    volume0: int = 0,
+    volume1: int = 0,
+    trades: int = 0,
+) -> None:
+    """Update candles of every resolution with current pair reserves and swap amounts.
+
+    Call after the pair reserves are updated, with `pair_price` from before. A new candle
+    opens at the close of the previous one, or at `previous_price` for the pair's first.
+    Rows are staged in the write-behind cache, so all events of a level are written once
+    and journaled for rollbacks.
+    """
+    price_oracle.configure(ctx)
+    price = pair_price(pair)
+    if price is None:
+        return
+
+    for resolution, size in RESOLUTIONS.items():
+        start = timestamp - timestamp % size
+        pk = f'{pair.address}:{resolution.value}:{start}'
+
+        candle = await candle_cache.get(pk)
+        if candle is None:
+            open_price = await get_previous_close(pair, resolution, start) or previous_price or price
+            candle = PairCandle(
+                id=pk,
+                resolution=resolution,
+                start=start,
+                open=open_price,
+                high=open_price,
+                low=open_price,
+                close=open_price,
+                volume0=0,
+                volume1=0,
+                trades=0,
+                updated_at=timestamp,
+                pair=pair,
+            )
+            if (previous := _current.get((pair.address, resolution))) is not None:
+                candle_cache.evict(previous)
+            _current[(pair.address, resolution)] = pk
+
+        candle.high = max(candle.high, price)
+        candle.low = min(candle.low, price)
+        candle.close = price
+        candle.volume0 += volume0
+        candle.volume1 += volume1
+        candle.trades += trades
+        candle.updated_at = timestamp
+        candle_cache.stage(ctx, candle)
@@ -0,0 +1,568 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from collections.abc import AsyncIterator
+from contextlib import suppress
+from typing import TYPE_CHECKING
+from typing import Any, NamedTuple
+
+import dipdup.context
+from dipdup.config.starknet_events import StarknetEventsIndexConfig
+from dipdup.context import DipDupContext
+from dipdup.context import HandlerContext
+from dipdup.datasources.starknet_node import StarknetNodeDatasource
+from dipdup.datasources.starknet_subsquid import StarknetSubsquidDatasource
+from dipdup.exceptions import ConfigInitializationException
+from dipdup.indexes.starknet import StarknetDatasource
+from dipdup.indexes.starknet_events.fetcher import EventFetcherChannel
+from dipdup.indexes.starknet_events.fetcher import StarknetNodeEventFetcher
+from dipdup.indexes.starknet_events.fetcher import StarknetSubsquidEventFetcher
+from dipdup.indexes.starknet_events.index import StarknetEventsIndex
+from dipdup.models import Index
+from dipdup.models import ReindexingReason
+from dipdup.models.starknet import StarknetEventData
+from dipdup.prometheus import Counter
+from dipdup.prometheus import Gauge
+from defi_space_indexer.models.amm_models import Pair
+from defi_space_indexer.models.farming_models import Reactor
+
+if TYPE_CHECKING:
+    from dipdup.models.starknet_subsquid import EventRequest
+
+MODES = ('dynamic', 'multi')
+DEFAULT_MODE = 'dynamic'
+PARENT_POLL_INTERVAL = 1.0
+HEAD_TTL = 1.0  # Seconds a node or Subsquid head is shared between dynamic indexes
+CATCH_UP_WAIT = 5.0  # Max seconds to wait for every lagging index to join a catch-up batch
+CATCH_UP_MIN_INDEXES = 16  # Smaller node batches sync index by index; address-filtered requests are cheaper
+
+_logger = logging.getLogger(__name__)
+
+_requests = Counter('defi_space_contract_index_requests_total', 'Event pages requested by multi-contract indexes', ['index'])
+_skipped = Counter('defi_space_contract_index_skipped_total', 'Events of untracked contracts dropped by multi-contract indexes', ['index'])
+_catch_up_indexes = Counter('defi_space_catch_up_indexes_total', 'Dynamic indexes synchronized by coalesced catch-up', ['template'])
+_startup = Gauge('defi_space_startup_seconds', 'Duration of startup phases', ['phase'])
+
+
+class ContractTemplate(NamedTuple):
+    """Index template instantiated for every contract a factory creates."""
+
+    parent: str  # Factory index emitting creation events
+    typename: str
+    prefix: str  # Name prefix of per-contract contracts and indexes
+    index: str  # Multi-contract index
+    contract: str  # Address-less contract of the multi-contract index
+
+
+TEMPLATES = {
+    'pair_events': ContractTemplate('amm_factory_events', 'amm_pair', 'pair', 'amm_pair_events', 'amm_pairs'),
+    'reactor_events': ContractTemplate(
+        'farming_factory_events', 'farming_reactor', 'reactor', 'farming_reactor_events', 'farming_reactors'
+    ),
+}
+
+
+def get_event_ids(index: StarknetEventsIndex) -> set[str]:
+    """Selectors of every event handled by the index."""
+    return {id_ for identifiers in index.event_identifiers.values() for id_ in identifiers.values()}
+
+
+class MultiContractEventFetcherChannel(EventFetcherChannel):
+    """Single `starknet_getEvents` stream over every contract of a template.
+
+    Pages are requested without an address filter and events of untracked contracts are dropped
+    before their blocks are looked up.
+    """
+
+    def __init__(self, *args: Any, index: str, addresses: frozenset[int], **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._index = index
+        self._addresses = addresses
+
+    async def fetch(self) -> None:
+        _, key0s = next(iter(self._filter))
+        datasource = self._datasources[0]
+
+        events_chunk = await datasource.get_events(
+            address=None,
+            keys=[list(key0s), [], []],
+            first_level=self._first_level,
+            last_level=self._last_level,
+            continuation_token=self._offset or None,
+        )
+        _requests[self._index] += 1
+
+        for event in events_chunk.events:
+            if event.from_address not in self._addresses:
+                _skipped[self._index] += 1
+                continue
+            if event.block_hash is None or event.transaction_hash is None:
+                _logger.info('Skipping event. No block_hash or transaction_hash found in %s', event)
+                continue
+
+            block = await datasource.get_block_with_tx_hashes(block_hash=event.block_hash)
+            if block is None or event.transaction_hash not in block.transactions:
+                _logger.info('Skipping event. No block or transaction found for %s', event)
+                continue
+
+            self._buffer[event.block_number].append(  # type: ignore[index]
+                StarknetEventData.from_starknetpy(
+                    event=event,
+                    transaction_index=block.transactions.index(event.transaction_hash),
+                    timestamp=block.timestamp,
+                )
+            )
+
+        if events_chunk.continuation_token:
+            self._offset = events_chunk.continuation_token
+            # NOTE: Dropped events count too. The last block may continue on the next page; flushing it
+            # now would split its events into two batches, each sorted on its own.
+            if events_chunk.events:
+                self._head = max(self._head, events_chunk.events[-1].block_number - 1)  # type: ignore[arg-type]
+        else:
+            self._head = self._last_level
+            self._offset = None
+
+
+class MultiContractEventFetcher(StarknetNodeEventFetcher):
+    def __init__(
+        self,
+        name: str,
+        datasources: tuple[StarknetNodeDatasource, ...],
+        first_level: int,
+        last_level: int,
+        key0s: set[str],
+        addresses: frozenset[int],
+    ) -> None:
+        super().__init__(name, datasources, first_level, last_level, event_ids={})
+        self._key0s = key0s
+        self._addresses = addresses
+
+    async def fetch_by_level(self) -> AsyncIterator[tuple[int, tuple[StarknetEventData, ...]]]:
+        channel = MultiContractEventFetcherChannel(
+            buffer=self._buffer,
+            filter={(None, tuple(self._key0s))},
+            first_level=self._first_level,
+            last_level=self._last_level,
+            # NOTE: Fixed datasource to use continuation token
+            datasources=(self.get_random_node(),),
+            index=self._name,
+            addresses=self._addresses,
+        )
+        events_iter = self._merged_iter(
+            {channel}, lambda i: tuple(sorted(i, key=lambda x: (x.block_number, x.transaction_index or 0)))
+        )
+        async for level, batch in self.readahead_by_level(events_iter):
+            yield level, batch
+
+
+class MultiContractSubsquidEventFetcher(StarknetSubsquidEventFetcher):
+    """Subsquid events of every contract of a template, queried with a single address filter."""
+
+    def __init__(
+        self,
+        name: str,
+        datasources: tuple[StarknetSubsquidDatasource, ...],
+        first_level: int,
+        last_level: int,
+        key0s: set[str],
+        addresses: frozenset[int],
+    ) -> None:
+        super().__init__(name, datasources, first_level, last_level, event_ids={})
+        self._key0s = key0s
+        self._addresses = addresses
+
+    async def fetch_by_level(self) -> AsyncIterator[tuple[int, tuple[StarknetEventData, ...]]]:
+        # NOTE: An empty `fromAddress` list would not filter at all
+        filters: tuple[EventRequest, ...] = ()
+        if self._addresses:
+            filters = ({'key0': list(self._key0s), 'fromAddress': [hex(address) for address in self._addresses]},)
+        event_iter = self.random_datasource.iter_events(
+            first_level=self._first_level,
+            last_level=self._last_level,
+            filters=filters,
+        )
+        async for level, batch in self.readahead_by_level(event_iter):
+            yield level, batch
+
+
+class MultiContractEventsIndex(StarknetEventsIndex):
+    """`starknet.events` index of every contract created from a template.
+
+    Handler contracts have no address, so handlers match events of any contract; the fetcher
+    only lets through `addresses`, which factory handlers extend as contracts are created.
+    The index never gets ahead of its parent (factory) index: contracts created at a level
+    must be tracked before that level is fetched.
+    """
+
+    def __init__(
+        self,
+        ctx: DipDupContext,
+        config: StarknetEventsIndexConfig,
+        datasources: tuple[StarknetDatasource, ...],
+        parent: str,
+        addresses: set[int],
+    ) -> None:
+        super().__init__(ctx, config, datasources)
+        self._parent = parent
+        self._parent_level = 0
+        self._parent_checked_at = 0.0
+        self.addresses = addresses
+
+    def get_sync_level(self) -> int:
+        return min(super().get_sync_level(), self._parent_level)
+
+    async def process(self) -> bool:
+        # NOTE: Polled only once caught up, and at most every second while waiting
+        if self.state.level >= self._parent_level and time.monotonic() - self._parent_checked_at >= PARENT_POLL_INTERVAL:
+            parent = await Index.get_or_none(name=self._parent)
+            self._parent_level = parent.level if parent else 0
+            self._parent_checked_at = time.monotonic()
+        return await super().process()
+
+    def _create_node_fetcher(self, first_level: int, last_level: int) -> StarknetNodeEventFetcher:
+        return MultiContractEventFetcher(
+            name=self.name,
+            datasources=self.node_datasources,
+            first_level=first_level,
+            last_level=last_level,
+            key0s=get_event_ids(self),
+            addresses=frozenset(self.addresses),
+        )
+
+    def _create_subsquid_fetcher(self, first_level: int, last_level: int) -> StarknetSubsquidEventFetcher:
+        return MultiContractSubsquidEventFetcher(
+            name=self.name,
+            datasources=self.subsquid_datasources,
+            first_level=first_level,
+            last_level=last_level,
+            key0s=get_event_ids(self),
+            addresses=frozenset(self.addresses),
+        )
+
+
+class CatchUpBatch:
+    """Dynamic indexes of a template synchronized in one pass."""
+
+    def __init__(self, expected: int) -> None:
+        self.expected = expected
+        self.indexes: dict[int, tuple[DynamicEventsIndex, int]] = {}  # Address -> (index, sync level)
+        self.ready = asyncio.Event()
+        self.done: asyncio.Future[bool] = asyncio.get_running_loop().create_future()
+
+    def add(self, index: 'DynamicEventsIndex', sync_level: int) -> None:
+        self.indexes[index.address] = (index, sync_level)
+        if len(self.indexes) >= self.expected:
+            self.ready.set()
+
+
+class CatchUp:
+    """
+    Coalesced synchronization of the dynamic indexes of one template.
+
+    The dispatcher processes indexes concurrently, so after a restart (and on every new head)
+    each per-contract index would request the heads and page through events on its own.
+    Instead, indexes behind the head join a batch per source: Subsquid while more than
+    `NODE_LAST_MILE` levels behind the archive, the node after that, as `SubsquidIndex` routes
+    them. The first one waits until every lagging index of the template has joined (at most
+    `CATCH_UP_WAIT` seconds), fetches events of all of them with a single stream and processes
+    them level by level, one index at a time; the others wait for it. Node batches smaller than
+    `CATCH_UP_MIN_INDEXES` sync index by index.
+    """
+
+    def __init__(self, template: str) -> None:
+        self.template = template
+        self.indexes: list[DynamicEventsIndex] = []
+        self.archive_level = 0  # Subsquid head last seen by indexes of the template
+        self._batches: dict[str, CatchUpBatch] = {}
+        self._heads: dict[str, tuple[float, asyncio.Future[int]]] = {}
+
+    async def get_head_level(self, datasource: StarknetDatasource) -> int:
+        head_at, head = self._heads.get(datasource.name, (0.0, None))
+        if head is None or time.monotonic() - head_at > HEAD_TTL:
+            head = asyncio.ensure_future(datasource.get_head_level())
+            self._heads[datasource.name] = (time.monotonic(), head)
+        return await asyncio.shield(head)
+
+    def uses_archive(self, index_level: int) -> bool:
+        """Whether an index at this level syncs from Subsquid rather than the node."""
+        return self.archive_level - index_level > StarknetNodeDatasource.NODE_LAST_MILE
+
+    async def join(self, index: 'DynamicEventsIndex', source: str, sync_level: int) -> bool:
+        """Wait until the index is synchronized with its batch. False if it has to sync on its own."""
+        batch = self._batches.get(source)
+        if batch is not None:
+            batch.add(index, sync_level)
+            return await asyncio.shield(batch.done)
+
+        archive = source == 'subsquid'
+        expected = sum(
+            1
+            for i in self.indexes
+            if i.is_active and i.state.level < sync_level and self.uses_archive(i.state.level) == archive
+        )
+        batch = self._batches[source] = CatchUpBatch(expected)
+        batch.add(index, sync_level)
+        try:
+            with suppress(TimeoutError):
+                await asyncio.wait_for(batch.ready.wait(), CATCH_UP_WAIT)
+            # NOTE: Indexes falling behind later start the next batch
+            del self._batches[source]
+            # NOTE: Subsquid filters by address either way; only node batches need to be large to pay off
+            coalesced = len(batch.indexes) >= (2 if archive else CATCH_UP_MIN_INDEXES)
+            if coalesced:
+                await self._synchronize(batch, source)
+            batch.done.set_result(coalesced)
+        except Exception as e:
+            batch.done.set_exception(e)
+            raise
+        finally:
+            if self._batches.get(source) is batch:
+                del self._batches[source]
+            if not batch.done.done():
+                batch.done.cancel()
+        return coalesced
+
+    async def _synchronize(self, batch: CatchUpBatch, source: str) -> None:
+        started_at = time.perf_counter()
+        leader, _ = next(iter(batch.indexes.values()))
+        first_level = min(index.state.level for index, _ in batch.indexes.values()) + 1
+        last_level = max(sync_level for _, sync_level in batch.indexes.values())
+        _logger.info(
+            'Catching up %s `%s` indexes at once with %s: %s -> %s',
+            len(batch.indexes),
+            self.template,
+            source,
+            first_level,
+            last_level,
+        )
+
+        fetcher: StarknetSubsquidEventFetcher | StarknetNodeEventFetcher
+        if source == 'subsquid':
+            fetcher = MultiContractSubsquidEventFetcher(
+                name=f'{self.template}_catch_up',
+                datasources=leader.subsquid_datasources,
+                first_level=first_level,
+                last_level=last_level,
+                key0s=get_event_ids(leader),
+                addresses=frozenset(batch.indexes),
+            )
+        else:
+            fetcher = MultiContractEventFetcher(
+                name=f'{self.template}_catch_up',
+                datasources=leader.node_datasources,
+                first_level=first_level,
+                last_level=last_level,
+                key0s=get_event_ids(leader),
+                addresses=frozenset(batch.indexes),
+            )
+        async for level, events in fetcher.fetch_by_level():
+            by_address: defaultdict[int, list[StarknetEventData]] = defaultdict(list)
+            for event in events:
+                by_address[int(event.from_address, 16)].append(event)
+            # NOTE: One index at a time; versioned transactions of concurrent indexes collide near the head
+            for address, index_events in by_address.items():
+                index, sync_level = batch.indexes[address]
+                if index.state.level < level <= sync_level:
+                    await index._process_level_data(tuple(index_events), sync_level)
+
+        _catch_up_indexes[self.template] += len(batch.indexes)
+        _logger.info(
+            'Caught up %s `%s` indexes to %s in %.2fs',
+            len(batch.indexes),
+            self.template,
+            last_level,
+            time.perf_counter() - started_at,
+        )
+
+
+class DynamicEventsIndex(StarknetEventsIndex):
+    """Per-contract index of `dynamic` mode; shares head lookups and catch-up with its template."""
+
+    def __init__(
+        self,
+        ctx: DipDupContext,
+        config: StarknetEventsIndexConfig,
+        datasources: tuple[StarknetDatasource, ...],
+        catch_up: CatchUp,
+    ) -> None:
+        super().__init__(ctx, config, datasources)
+        self.address = int(config.handlers[0].contract.address, 16)  # type: ignore[arg-type]
+        self._catch_up = catch_up
+        catch_up.indexes.append(self)
+
+    async def _synchronize(self, sync_level: int) -> None:
+        # NOTE: Same routing as `SubsquidIndex._synchronize`, with heads and fetching shared by the template
+        if not self.node_datasources:
+            await super()._synchronize(sync_level)
+            return
+
+        index_level = await self._enter_sync_state(sync_level)
+        if index_level is None or sync_level <= index_level:
+            return
+
+        if self.subsquid_datasources:
+            self._catch_up.archive_level = await self._catch_up.get_head_level(self.subsquid_datasources[0])
+        if self._catch_up.uses_archive(index_level):
+            source, sync_level = 'subsquid', min(sync_level, self._catch_up.archive_level)
+        else:
+            source, sync_level = 'node', min(sync_level, await self._catch_up.get_head_level(self.node_datasources[0]))
+        self._logger.debug('Synchronizing with %s: %s -> %s', source, index_level, sync_level)
+
+        if not await self._catch_up.join(self, source, sync_level):
+            if source == 'subsquid':
+                await self._synchronize_subsquid(sync_level)
+            else:
+                await self._synchronize_node(sync_level)
+        await self._exit_sync_state(sync_level)
+
+
+class ContractIndexes:
+    """
+    Indexing of contracts created by factories (pairs and reactors).
+
+    In `dynamic` mode every new contract gets its own index from its template, each with
+    its own fetch loop, state row and node requests. In `multi` mode all contracts of a
+    template share one index (`amm_pair_events`, `farming_reactor_events`) that fetches
+    events in a single stream, so node requests grow with blocks rather than with blocks
+    times contracts. Tracked addresses are loaded from Pair and Reactor rows on restart.
+    In `dynamic` mode, indexes of a template that fall behind (all of them after a restart or
+    a fresh start) catch up together through `CatchUp`, from Subsquid and then from the node.
+
+    Configured through the `custom.contract_indexes` section of `dipdup.yaml`. Switching
+    modes requires a reindex.
+    """
+
+    def __init__(self) -> None:
+        self._configured = False
+        self.mode = DEFAULT_MODE
+        # NOTE: Shared with multi-contract indexes; their fetchers pick up additions on the next sync pass
+        self._addresses: dict[str, set[int]] = {name: set() for name in TEMPLATES}
+        self._catch_ups = {name: CatchUp(name) for name in TEMPLATES}
+        # NOTE: Startup phases; dynamic indexes are restored by DipDup right after `on_restart`
+        self._started_at = 0.0
+        self._restored_at = 0.0
+        self._restoring = 0
+        self._reported = False
+
+    def configure(self, ctx: DipDupContext) -> None:
+        if self._configured:
+            return
+        config = ctx.config.custom.get('contract_indexes') or {}
+        self.mode = str(config.get('mode') or DEFAULT_MODE)
+        if self.mode not in MODES:
+            raise ValueError(f'Unknown contract indexes mode `{self.mode}`, expected one of {MODES}')
+        self._configured = True
+
+    async def register(self, ctx: DipDupContext) -> None:
+        """Route contract indexes to our subclasses; call from `on_restart`, before indexes are spawned."""
+        self.configure(ctx)
+        self._started_at = time.monotonic()
+        multi_names = [template.index for template in TEMPLATES.values()]
+        stale = Index.filter(template__in=tuple(TEMPLATES))
+        if self.mode == 'multi':
+            stale = stale.exclude(name__in=multi_names)
+        else:
+            stale = stale.filter(name__in=multi_names)
+        if await stale.exists():
+            await ctx.reindex(
+                ReindexingReason.config_modified,
+                message='Contract indexes mode changed',
+                mode=self.mode,
+            )
+
+        # NOTE: DipDup spawns every `starknet.events` index with the stock class; route ours to subclasses.
+        # NOTE: That's a DipDup internal (see the version pin in `pyproject.toml`); fail loudly if it moves.
+        spawned = getattr(dipdup.context, 'StarknetEventsIndex', None)
+        if spawned is not StarknetEventsIndex and spawned != self._create_index:
+            raise RuntimeError(
+                f'Unsupported DipDup version: expected `dipdup.context` to spawn `StarknetEventsIndex`, got {spawned!r}'
+            )
+        dipdup.context.StarknetEventsIndex = self._create_index  # type: ignore[assignment,misc]
+
+        if self.mode != 'multi':
+            self._restoring = await Index.filter(template__in=tuple(TEMPLATES)).count()
+            _logger.info('Restoring %s contract indexes', self._restoring)
+            if not self._restoring:
+                self._restored_at = time.monotonic()
+            return
+
+        self._addresses['pair_events'].update(int(address, 16) for address in await Pair.all().values_list('address', flat=True))
+        self._addresses['reactor_events'].update(
+            int(address, 16) for address in await Reactor.all().values_list('address', flat=True)
+        )
+        for name, template in TEMPLATES.items():
+            if template.index not in ctx.config.indexes:
+                ctx.config.add_index(template.index, name, {'contract': template.contract})
+            _logger.info('Tracking %s contracts with `%s`', len(self._addresses[name]), template.index)
+        self._restored_at = time.monotonic()
+
+    def _create_index(
+        self,
+        ctx: DipDupContext,
+        config: StarknetEventsIndexConfig,
+        datasources: tuple[StarknetDatasource, ...],
+    ) -> StarknetEventsIndex:
+        for name, template in TEMPLATES.items():
+            if config.name == template.index:
+                return MultiContractEventsIndex(
+                    ctx,
+                    config,
+                    datasources,
+                    parent=template.parent,
+                    addresses=self._addresses[name],
+                )
+
+        try:
+            template_name = config.parent.name
+        except ConfigInitializationException:
+            # NOTE: Indexes from `dipdup.yaml` aren't created from a template
+            template_name = None
+        if template_name not in TEMPLATES:
+            return StarknetEventsIndex(ctx, config, datasources)
+
+        index = DynamicEventsIndex(ctx, config, datasources, catch_up=self._catch_ups[template_name])
+        if not self._restored_at and sum(len(c.indexes) for c in self._catch_ups.values()) >= self._restoring:
+            self._restored_at = time.monotonic()
+        return index
+
+    def report_startup(self) -> None:
+        """Log and export durations of startup phases; call once indexes are synchronized."""
+        if self._reported or not self._started_at:
+            return
+        self._reported = True
+        restore = self._restored_at - self._started_at
+        catch_up = time.monotonic() - self._restored_at
+        _startup['restore'] = restore
+        _startup['catch_up'] = catch_up
+        _logger.info(
+            'Startup: %s contract indexes restored in %.2fs, synchronized in %.2fs',
+            self._restoring,
+            restore,
+            catch_up,
+        )
+
+    async def add(self, ctx: HandlerContext, template: str, address: str) -> None:
+        """Start indexing a contract created by a factory."""
+        self.configure(ctx)
+        contract = TEMPLATES[template]
+        contract_name = f'{contract.prefix}_{address[-8:]}'
+        await ctx.add_contract(
+            name=contract_name,
+            kind='starknet',
+            address=address,
+            typename=contract.typename,
+        )
+        if self.mode == 'multi':
+            self._addresses[template].add(int(address, 16))
+            return
+
+        await ctx.add_index(
+            name=f'{contract_name}_events',
+            template=template,
+            values={'contract': contract_name},
+        )
+
+
+contract_indexes = ContractIndexes()
@@ -1,6 +1,33 @@
-from typing import TypedDict, List, Optional
-import aiohttp
+import asyncio
+import logging
+import random
+import time
+from collections.abc import Iterable
 from decimal import Decimal
+from decimal import InvalidOperation
+from typing import Any
+from typing import TypedDict
+
+import aiohttp
+from dipdup.context import DipDupContext
+from dipdup.prometheus import Counter
+
+DEFAULT_URL = 'https://api.dexscreener.com'
+DEFAULT_TTL = 30.0
+DEFAULT_TIMEOUT = 10.0
+DEFAULT_CONCURRENCY = 4
+DEFAULT_RETRIES = 3
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 10.0
+# NOTE: Limit of addresses per request to `/tokens/v1` endpoint
+TOKENS_CHUNK_SIZE = 30
+
+_logger = logging.getLogger(__name__)
+
+_cache_hits = Counter('defi_space_dexscreener_cache_hits_total', 'Token lookups served from cache')
+_cache_misses = Counter('defi_space_dexscreener_cache_misses_total', 'Token lookups that required a request')
+_requests = Counter('defi_space_dexscreener_requests_total', 'HTTP requests sent to DexScreener', ['status'])
+
 
 class TokenInfo(TypedDict):
     address: str
@@ -12,17 +39,234 @@ class PairInfo(TypedDict):
     pairAddress: str
     baseToken: TokenInfo
     quoteToken: TokenInfo
-    priceUsd: Optional[str]
+    priceUsd: str | None
+    priceNative: str | None
     liquidity: dict
     volume: dict
 
-async def get_token_pairs(chain_id: str, token_address: str) -> List[PairInfo]:
+
+def _token_key(address: str) -> int:
+    """Addresses may come with or without leading zeros; compare them as felts."""
+    return int(address, 16)
+
+
+class DexScreenerClient:
+    """
+    Long-lived DexScreener API client shared by metrics hooks.
+
+    - One pooled `aiohttp` session with a request timeout
+    - In-memory TTL cache of token pairs keyed by (chain, token)
+    - Batch price lookups of many tokens in chunked multi-address requests
+    - Single-flight: concurrent price lookups of the same token share one request
+    - Bounded number of requests in flight
+    - Retries with exponential backoff on 429 and 5xx, honoring `Retry-After`
+
+    Settings are read from the `custom.dexscreener` section of `dipdup.yaml`.
+    """
+
+    def __init__(
+        self,
+        url: str = DEFAULT_URL,
+        ttl: float = DEFAULT_TTL,
+        timeout: float = DEFAULT_TIMEOUT,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        retries: int = DEFAULT_RETRIES,
+    ) -> None:
+        self._url = url.rstrip('/')
+        self._ttl = ttl
+        self._timeout = aiohttp.ClientTimeout(total=timeout)
+        self._concurrency = concurrency
+        self._retries = retries
+
+        self._session: aiohttp.ClientSession | None = None
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._cache: dict[tuple[str, str], tuple[float, list[PairInfo]]] = {}
+        self._inflight: dict[tuple[str, int], asyncio.Future[Decimal | None]] = {}
+        self._prices: dict[tuple[str, int], tuple[float, Decimal | None]] = {}
+
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                timeout=self._timeout,
+                connector=aiohttp.TCPConnector(limit=self._concurrency),
+            )
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def stats(self) -> dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else None,
+            'size': len(self._cache),
+            'prices': len(self._prices),
+            'inflight': len(self._inflight),
+        }
+
+    async def get_token_pairs(self, chain_id: str, token_address: str) -> list[PairInfo]:
+        """Fetch token pair data, served from cache when fresh."""
+        key = (chain_id, token_address)
+
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            self.hits += 1
+            _cache_hits.inc()
+            return cached[1]
+
+        self.misses += 1
+        _cache_misses.inc()
+        data = await self._fetch(f'{self._url}/token-pairs/v1/{chain_id}/{token_address}')
+        if data is not None:
+            self._cache[key] = (time.monotonic() + self._ttl, data)
+        return data or []
+
+    async def get_token_prices(self, chain_id: str, token_addresses: Iterable[str]) -> dict[str, Decimal]:
+        """Resolve USD prices of many tokens at once.
+
+        Unique addresses missing from the price cache are requested in chunks of
+        `TOKENS_CHUNK_SIZE` concurrently. Tokens DexScreener can't price are cached as
+        unknown too and left out of the result. Tokens another caller is already
+        requesting are not requested again; their prices come from the same response.
+        """
+        now = time.monotonic()
+        requested = {address: _token_key(address) for address in token_addresses}
+
+        known: dict[int, Decimal] = {}
+        missing: dict[int, str] = {}
+        futures: dict[int, asyncio.Future[Decimal | None]] = {}
+        for address, key in requested.items():
+            if key in missing or key in futures:
+                continue
+            cached = self._prices.get((chain_id, key))
+            if cached is not None and cached[0] > now:
+                if cached[1] is not None:
+                    known[key] = cached[1]
+            # NOTE: Somebody is already fetching this token; wait for the same response
+            elif (future := self._inflight.get((chain_id, key))) is not None:
+                futures[key] = future
+            else:
+                missing[key] = address
+        hits = len(set(requested.values())) - len(missing)
+        self.hits += hits
+        self.misses += len(missing)
+        _cache_hits.inc(hits)
+        _cache_misses.inc(len(missing))
+
+        loop = asyncio.get_running_loop()
+        for key in missing:
+            futures[key] = self._inflight[(chain_id, key)] = loop.create_future()
+        keys = list(missing)
+        chunks = [keys[i : i + TOKENS_CHUNK_SIZE] for i in range(0, len(keys), TOKENS_CHUNK_SIZE)]
+        await asyncio.gather(*(self._fetch_prices(chain_id, {key: missing[key] for key in chunk}) for chunk in chunks))
+
+        for key, future in futures.items():
+            if (price := await asyncio.shield(future)) is not None:
+                known[key] = price
+
+        return {address: known[key] for address, key in requested.items() if key in known}
+
+    async def _fetch_prices(self, chain_id: str, chunk: dict[int, str]) -> None:
+        """Request prices of a chunk of tokens and resolve their in-flight futures."""
+        url = f'{self._url}/tokens/v1/{chain_id}/{",".join(chunk.values())}'
+        try:
+            pairs = await self._fetch(url)
+        except BaseException as e:
+            for key in chunk:
+                future = self._inflight.pop((chain_id, key))
+                future.set_exception(e)
+                # NOTE: Mark as retrieved; waiters re-raise it, but there may be none
+                future.exception()
+            raise
+
+        prices = self._extract_prices(pairs) if pairs is not None else {}
+        expires_at = time.monotonic() + self._ttl
+        for key in chunk:
+            price = prices.get(key)
+            # NOTE: Request failed after retries; don't cache, try again next run
+            if pairs is not None:
+                self._prices[(chain_id, key)] = (expires_at, price)
+            self._inflight.pop((chain_id, key)).set_result(price)
+
+    @staticmethod
+    def _extract_prices(pairs: list[PairInfo]) -> dict[int, Decimal]:
+        """Map token to USD price. `priceUsd` is quoted for the base token of a pair."""
+        base_prices: dict[int, Decimal] = {}
+        quote_prices: dict[int, Decimal] = {}
+        for pair in pairs:
+            try:
+                price_usd = Decimal(pair['priceUsd'] or 0)
+                price_native = Decimal(pair.get('priceNative') or 0)
+                base = _token_key(pair['baseToken']['address'])
+                quote = _token_key(pair['quoteToken']['address'])
+            except (KeyError, TypeError, ValueError, InvalidOperation):
+                continue
+            if price_usd <= 0:
+                continue
+            base_prices.setdefault(base, price_usd)
+            # NOTE: `priceNative` is the base token price in quote tokens
+            if price_native > 0:
+                quote_prices.setdefault(quote, price_usd / price_native)
+        return {**quote_prices, **base_prices}
+
+    async def _fetch(self, url: str) -> list[PairInfo] | None:
+        """GET with retries. Returns `None` when the token can't be resolved now."""
+        for attempt in range(self._retries + 1):
+            async with self._semaphore:
+                try:
+                    async with self.session.get(url) as response:
+                        _requests[str(response.status)] += 1
+                        if response.status == 200:
+                            return await response.json()  # type: ignore[no-any-return]
+                        retryable = response.status == 429 or response.status >= 500
+                        retry_after = response.headers.get('Retry-After')
+                except (aiohttp.ClientError, TimeoutError) as e:
+                    _requests['error'] += 1
+                    _logger.debug('DexScreener request failed: %s', e)
+                    retryable, retry_after = True, None
+
+            if not retryable or attempt == self._retries:
+                break
+
+            delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2**attempt) * (1 + random.random())
+            if retry_after and retry_after.isdigit():
+                delay = max(delay, float(retry_after))
+            await asyncio.sleep(delay)
+
+        return None
+
+
+_client: DexScreenerClient | None = None
+
+
+def get_client(ctx: DipDupContext | None = None) -> DexScreenerClient:
+    """Get process-wide client; settings are taken from the first context passed."""
+    global _client
+    if _client is None:
+        config = (ctx.config.custom.get('dexscreener') or {}) if ctx else {}
+        _client = DexScreenerClient(
+            url=config.get('url', DEFAULT_URL),
+            ttl=float(config.get('ttl', DEFAULT_TTL)),
+            timeout=float(config.get('timeout', DEFAULT_TIMEOUT)),
+            concurrency=int(config.get('concurrency', DEFAULT_CONCURRENCY)),
+            retries=int(config.get('retries', DEFAULT_RETRIES)),
+        )
+    return _client
+
+
+async def get_token_pairs(chain_id: str, token_address: str) -> list[PairInfo]:
     """Fetch token pair data from DexScreener API."""
-    url = f"https://api.dexscreener.com/token-pairs/v1/{chain_id}/{token_address}"
-    
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as response:
-            if response.status != 200:
-                return []
-            data = await response.json()
-            return data 
\ No newline at end of file
+    return await get_client().get_token_pairs(chain_id, token_address)
+
+
+async def get_token_prices(chain_id: str, token_addresses: Iterable[str]) -> dict[str, Decimal]:
+    """Fetch USD prices of many tokens from DexScreener API."""
+    return await get_client().get_token_prices(chain_id, token_addresses)
@@ -0,0 +1,455 @@
+import gzip
+import logging
+import time
+from bisect import bisect_left
+from bisect import bisect_right
+from contextlib import suppress
+from heapq import merge
+from pathlib import Path
+from typing import IO
+from typing import Any
+from typing import NamedTuple
+
+import orjson
+from dipdup.context import DipDupContext
+from dipdup.datasources.starknet_node import StarknetNodeDatasource
+from dipdup.datasources.starknet_subsquid import StarknetSubsquidDatasource
+from dipdup.models import Index
+from dipdup.models import IndexStatus
+
+MODES = ('off', 'record', 'replay')
+DEFAULT_MODE = 'off'
+DEFAULT_PATH = 'event_capture.jsonl.gz'
+COMPRESS_LEVEL = 6
+# NOTE: Replayed blocks only carry what DipDup reads: hash, number, timestamp and transaction order
+BLOCK_TEMPLATE = {
+    'status': 'ACCEPTED_ON_L1',
+    'parent_hash': '0x0',
+    'new_root': '0x0',
+    'sequencer_address': '0x0',
+    'l1_gas_price': {'price_in_fri': '0x0', 'price_in_wei': '0x0'},
+    'l1_data_gas_price': {'price_in_fri': '0x0', 'price_in_wei': '0x0'},
+    'l1_da_mode': 'BLOB',
+    'starknet_version': '0.13.2',
+}
+
+_logger = logging.getLogger(__name__)
+
+
+def _int(value: str | int) -> int:
+    return value if isinstance(value, int) else int(value, 16)
+
+
+class CapturedEvent(NamedTuple):
+    level: int
+    transaction_index: int
+    seq: int
+    block_hash: int
+    timestamp: int
+    transaction_hash: int
+    from_address: int
+    keys: tuple[int, ...]
+    data: tuple[int, ...]
+
+
+class EventStore:
+    """
+    Events of a capture file, answering node and Subsquid queries of any shape.
+
+    Pages are deduplicated on load: the same event fetched by a pair index and by a
+    coalesced catch-up counts once. Node events are placed in their transactions with
+    the recorded blocks; events of blocks that were never fetched were skipped by the
+    indexer and are dropped. Only events up to `head`, the level every index reached
+    while recording, are served.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.head: int | None = None
+        self.calls: dict[bytes, Any] = {}
+        self.events: list[CapturedEvent] = []
+        self._levels: list[int] = []
+        self._by_address: dict[int, list[CapturedEvent]] = {}
+        self._address_levels: dict[int, list[int]] = {}
+        self._blocks: dict[int, tuple[int, int, dict[int, int]]] = {}
+        self._hashes: dict[int, int] = {}
+
+    def load(self) -> None:
+        seen: dict[tuple[Any, ...], CapturedEvent] = {}
+        pending: list[tuple[tuple[Any, ...], dict[str, Any]]] = []
+        blocks: dict[int, tuple[int, int, dict[int, int]]] = {}
+
+        with gzip.open(self.path, 'rb') as file, suppress(EOFError):
+            for line in file:
+                record = orjson.loads(line)
+                kind = record['kind']
+                if kind == 'events':
+                    occurrences: dict[tuple[Any, ...], int] = {}
+                    for event in record['data']:
+                        key = self._key(event['block_number'], event['transaction_hash'], event['from_address'], event)
+                        occurrences[key] = occurrences.get(key, -1) + 1
+                        pending.append(((*key, occurrences[key]), event))
+                elif kind == 'block':
+                    block = record['data']
+                    transactions = {_int(hash_): index for hash_, index in block['transactions'].items()}
+                    known = blocks.get(_int(block['block_hash']))
+                    if known is not None:
+                        transactions.update(known[2])
+                    blocks[_int(block['block_hash'])] = (block['block_number'], block['timestamp'], transactions)
+                elif kind == 'archive':
+                    for item in record['data']:
+                        self._add_archive_block(item, seen)
+                elif kind == 'call':
+                    self.calls[orjson.dumps([record['method'], record['params']])] = record['result']
+                elif kind == 'head':
+                    self.head = record['level']
+
+        if self.head is None:
+            raise ValueError(f'Capture `{self.path}` is incomplete: recording stopped before indexes were synchronized')
+
+        dropped = 0
+        for key, event in pending:
+            if key in seen:
+                continue
+            block = blocks.get(_int(event['block_hash']))
+            if block is None or key[1] not in block[2]:
+                dropped += 1
+                continue
+            level, timestamp, transactions = block
+            seen[key] = CapturedEvent(
+                level, transactions[key[1]], len(seen), _int(event['block_hash']), timestamp, *key[1:5]
+            )
+        if dropped:
+            _logger.info('%s captured node events have no recorded block and are not replayed', dropped)
+
+        self.events = sorted(event for event in seen.values() if event.level <= self.head)
+        self._levels = [event.level for event in self.events]
+        for event in self.events:
+            self._by_address.setdefault(event.from_address, []).append(event)
+            self._address_levels.setdefault(event.from_address, []).append(event.level)
+            self._hashes[event.level] = event.block_hash
+            block = self._blocks.setdefault(event.block_hash, (event.level, event.timestamp, {}))
+            block[2][event.transaction_index] = event.transaction_hash
+
+    @staticmethod
+    def _key(level: int, transaction_hash: str, from_address: str, event: dict[str, Any]) -> tuple[Any, ...]:
+        return (
+            level,
+            _int(transaction_hash),
+            _int(from_address),
+            tuple(_int(key) for key in event['keys']),
+            tuple(_int(value) for value in event['data']),
+        )
+
+    def _add_archive_block(self, item: dict[str, Any], seen: dict[tuple[Any, ...], CapturedEvent]) -> None:
+        header = item['header']
+        hashes = {tx['transactionIndex']: tx['transactionHash'] for tx in item.get('transactions') or ()}
+        occurrences: dict[tuple[Any, ...], int] = {}
+        for event in item.get('events') or ():
+            index = event['transactionIndex']
+            key = self._key(header['number'], hashes[index], event['fromAddress'], event)
+            occurrences[key] = occurrences.get(key, -1) + 1
+            key = (*key, occurrences[key])
+            if key not in seen:
+                seen[key] = CapturedEvent(
+                    header['number'], index, len(seen), _int(header['hash']), header['timestamp'], *key[1:5]
+                )
+
+    def select(
+        self,
+        first_level: int,
+        last_level: int,
+        addresses: set[int] | None,
+        keys: set[int] | None,
+    ) -> list[CapturedEvent]:
+        last_level = min(last_level, self.head or 0)
+        if addresses is None:
+            start, end = bisect_left(self._levels, first_level), bisect_right(self._levels, last_level)
+            candidates: Any = self.events[start:end]
+        else:
+            ranges = []
+            for address in addresses:
+                events = self._by_address.get(address, [])
+                levels = self._address_levels.get(address, [])
+                ranges.append(events[bisect_left(levels, first_level) : bisect_right(levels, last_level)])
+            candidates = merge(*ranges)
+        return [event for event in candidates if keys is None or (event.keys and event.keys[0] in keys)]
+
+    def get_events(self, filter_: dict[str, Any]) -> dict[str, Any]:
+        address = filter_.get('address')
+        keys = filter_.get('keys') or []
+        events = self.select(
+            filter_['from_block']['block_number'],
+            filter_['to_block']['block_number'],
+            {_int(address)} if address else None,
+            {_int(key) for key in keys[0]} if keys and keys[0] else None,
+        )
+        start = int(filter_.get('continuation_token') or 0)
+        end = start + filter_['chunk_size']
+        return {
+            'events': [
+                {
+                    'from_address': hex(event.from_address),
+                    'keys': [hex(key) for key in event.keys],
+                    'data': [hex(value) for value in event.data],
+                    'block_hash': hex(event.block_hash),
+                    'block_number': event.level,
+                    'transaction_hash': hex(event.transaction_hash),
+                }
+                for event in events[start:end]
+            ],
+            'continuation_token': str(end) if end < len(events) else None,
+        }
+
+    def get_block(self, block_hash: int) -> dict[str, Any]:
+        if block_hash not in self._blocks:
+            raise ValueError(f'Block {hex(block_hash)} was not recorded in `{self.path}`')
+        level, timestamp, transactions = self._blocks[block_hash]
+        hashes = ['0x0'] * (max(transactions) + 1)
+        for index, transaction_hash in transactions.items():
+            hashes[index] = hex(transaction_hash)
+        return {
+            **BLOCK_TEMPLATE,
+            'block_hash': hex(block_hash),
+            'block_number': level,
+            'timestamp': timestamp,
+            'transactions': hashes,
+        }
+
+    def query_archive(self, query: dict[str, Any]) -> list[dict[str, Any]]:
+        first_level, last_level = query['fromBlock'], query['toBlock']
+        events: dict[tuple[int, int, int], CapturedEvent] = {}
+        for request in query.get('events') or ():
+            addresses = {_int(address) for address in request['fromAddress']} if 'fromAddress' in request else None
+            keys = {_int(key) for key in request['key0']} if 'key0' in request else None
+            for event in self.select(first_level, last_level, addresses, keys):
+                events[event[:3]] = event
+
+        blocks: dict[int, dict[str, Any]] = {}
+        for event in sorted(events.values()):
+            block = blocks.setdefault(event.level, self._header(event.level))
+            block['events'].append(
+                {
+                    'transactionIndex': event.transaction_index,
+                    'fromAddress': hex(event.from_address),
+                    'keys': [hex(key) for key in event.keys],
+                    'data': [hex(value) for value in event.data],
+                }
+            )
+            if not block['transactions'] or block['transactions'][-1]['transactionIndex'] != event.transaction_index:
+                block['transactions'].append(
+                    {'transactionIndex': event.transaction_index, 'transactionHash': hex(event.transaction_hash)}
+                )
+        # NOTE: The last block of the range is always returned so that the client moves on
+        blocks.setdefault(last_level, self._header(last_level))
+        return [blocks[level] for level in sorted(blocks)]
+
+    def _header(self, level: int) -> dict[str, Any]:
+        block_hash = self._hashes.get(level, 0)
+        timestamp = self._blocks[block_hash][1] if block_hash in self._blocks else 0
+        return {
+            'header': {'number': level, 'hash': hex(block_hash), 'timestamp': timestamp},
+            'events': [],
+            'transactions': [],
+        }
+
+
+class CaptureGateway:
+    """HTTP gateway of a datasource that records its responses or answers from the capture."""
+
+    def __init__(self, capture: 'EventCapture', gateway: Any, node: bool) -> None:
+        self._capture = capture
+        self._gateway = gateway
+        self._node = node
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._gateway, name)
+
+    async def __aenter__(self) -> None:
+        await self._gateway.__aenter__()
+
+    async def __aexit__(self, *args: object) -> None:
+        await self._gateway.__aexit__(*args)
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        weight: int = 1,
+        **kwargs: Any,
+    ) -> Any:
+        store = self._capture.store
+        if store is None:
+            response = await self._gateway.request(method, url, weight, **kwargs)
+            if self._node:
+                self._capture.record_rpc(kwargs.get('json') or {}, response)
+            return response
+
+        if not self._node:
+            if url == 'height':
+                return store.head
+            raise ValueError(f"Subsquid request `{method} {url}` can't be replayed")
+
+        payload = kwargs.get('json') or {}
+        rpc_method, params = payload.get('method'), payload.get('params') or {}
+        if rpc_method == 'starknet_blockNumber':
+            result = store.head
+        elif rpc_method == 'starknet_getEvents':
+            result = store.get_events(params['filter'])
+        elif rpc_method == 'starknet_getBlockWithTxHashes':
+            result = store.get_block(_int(params['block_id']['block_hash']))
+        else:
+            key = orjson.dumps([rpc_method, params])
+            if key not in store.calls:
+                raise ValueError(f'`{rpc_method}` was not recorded in `{store.path}`')
+            result = store.calls[key]
+        return {'jsonrpc': '2.0', 'id': payload.get('id'), 'result': result}
+
+
+class EventCapture:
+    """
+    Recording of the Starknet data the indexer fetches, and its replay without network.
+
+    In `record` mode the responses of `starknet.node` and `starknet.subsquid` datasources
+    are written to a gzipped JSON lines file at `path` as they arrive: raw event pages,
+    archive blocks and the fetched blocks, trimmed to the transactions of captured
+    events. Recording ends once indexes are synchronized, storing the level they
+    reached. Record into a fresh database; events indexed before are not captured.
+
+    In `replay` mode the same datasources answer from that file instead (see `EventStore`),
+    without network or rate limits; both report the recorded level as their head. Event
+    queries are answered by range, address and key rather than by matching recorded
+    requests, so replay works whatever order indexes are spawned and coalesced in.
+
+    Configured through the `custom.event_capture` section of `dipdup.yaml`.
+    """
+
+    def __init__(self) -> None:
+        self._configured = False
+        self.mode = DEFAULT_MODE
+        self.path = Path(DEFAULT_PATH)
+        self.store: EventStore | None = None
+        self._file: IO[bytes] | None = None
+        self._transactions: set[int] = set()
+        self._pages = 0
+        self._started_at = 0.0
+
+    def configure(self, ctx: DipDupContext) -> None:
+        if self._configured:
+            return
+        config = ctx.config.custom.get('event_capture') or {}
+        self.mode = str(config.get('mode') or DEFAULT_MODE)
+        if self.mode not in MODES:
+            raise ValueError(f'Unknown event capture mode `{self.mode}`, expected one of {MODES}')
+        self.path = Path(str(config.get('path') or DEFAULT_PATH))
+        self._configured = True
+
+    async def install(self, ctx: DipDupContext) -> None:
+        """Wrap gateways of Starknet datasources; call from `on_restart` after `node_pool`."""
+        self.configure(ctx)
+        if self.mode == 'off' or self._started_at:
+            return
+
+        if self.mode == 'record':
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # NOTE: Written until indexes are synchronized; `complete` closes it
+            self._file = gzip.open(self.path, 'wb', compresslevel=COMPRESS_LEVEL)  # noqa: SIM115
+        else:
+            self.store = EventStore(self.path)
+            self.store.load()
+
+        for name in ctx.config.datasources:
+            datasource = ctx.datasources.get(name)
+            if isinstance(datasource, StarknetNodeDatasource):
+                datasource._http = CaptureGateway(self, datasource._http, node=True)  # type: ignore[assignment]
+            elif isinstance(datasource, StarknetSubsquidDatasource):
+                datasource._http = CaptureGateway(self, datasource._http, node=False)  # type: ignore[assignment]
+                # NOTE: Archive queries go to workers with their own gateways
+                datasource.query_worker = self._wrap_query_worker(datasource)  # type: ignore[method-assign]
+
+        self._started_at = time.monotonic()
+        if self.store is not None:
+            _logger.info(
+                'Replaying %s captured events up to level %s from `%s`',
+                len(self.store.events),
+                self.store.head,
+                self.path,
+            )
+        else:
+            _logger.info('Recording fetched Starknet events to `%s`', self.path)
+
+    def _wrap_query_worker(self, datasource: StarknetSubsquidDatasource) -> Any:
+        query_worker = datasource.query_worker
+
+        async def _query_worker(query: Any, current_level: int) -> list[dict[str, Any]]:
+            if self.store is not None:
+                return self.store.query_archive(query)
+            response = await query_worker(query, current_level)
+            self._write({'kind': 'archive', 'data': response})
+            return response
+
+        return _query_worker
+
+    def record_rpc(self, payload: dict[str, Any], response: Any) -> None:
+        if self._file is None or not isinstance(response, dict) or 'result' not in response:
+            return
+        method, params, result = payload.get('method'), payload.get('params') or {}, response['result']
+        if method == 'starknet_getEvents':
+            for event in result['events']:
+                self._transactions.add(_int(event['transaction_hash']))
+            self._write({'kind': 'events', 'data': result['events']})
+            self._pages += 1
+        elif method == 'starknet_getBlockWithTxHashes':
+            transactions = {
+                transaction_hash: index
+                for index, transaction_hash in enumerate(result['transactions'])
+                if _int(transaction_hash) in self._transactions
+            }
+            self._write(
+                {
+                    'kind': 'block',
+                    'data': {
+                        'block_hash': result['block_hash'],
+                        'block_number': result['block_number'],
+                        'timestamp': result['timestamp'],
+                        'transactions': transactions,
+                    },
+                }
+            )
+        elif method != 'starknet_blockNumber':
+            self._write({'kind': 'call', 'method': method, 'params': params, 'result': result})
+
+    def _write(self, record: dict[str, Any]) -> None:
+        if self._file is not None:
+            self._file.write(orjson.dumps(record) + b'\n')
+
+    async def complete(self, ctx: DipDupContext) -> None:
+        """Finish the recording or report the replay; call from `on_synchronized`."""
+        if not self._started_at:
+            return
+        seconds = time.monotonic() - self._started_at
+
+        if self.store is not None:
+            _logger.info(
+                'Replayed %s captured events up to level %s in %.1fs',
+                len(self.store.events),
+                self.store.head,
+                seconds,
+            )
+            return
+
+        if self._file is None:
+            return
+        try:
+            indexes = await Index.exclude(status=IndexStatus.disabled).all()
+            head = min((index.level for index in indexes), default=0)
+            self._write({'kind': 'head', 'level': head})
+        finally:
+            # NOTE: Flush the gzip trailer even if the head can't be stored; events recorded so far stay readable
+            self._file.close()
+            self._file = None
+            self._transactions.clear()
+        _logger.info('Captured %s event pages up to level %s to `%s` in %.1fs', self._pages, head, self.path, seconds)
+
+
+event_capture = EventCapture()
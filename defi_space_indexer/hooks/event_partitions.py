@@ -0,0 +1,122 @@
+import logging
+from datetime import UTC
+from datetime import datetime
+from typing import Any
+
+from dipdup.context import DipDupContext
+from dipdup.database import get_connection
+from dipdup.models import Index
+from dipdup.models import IndexStatus
+from dipdup.prometheus import Counter
+
+EVENT_TABLES = ('swap_event', 'liquidity_event', 'stake_event', 'reward_event')
+DEFAULT_START = '2024-01'
+DEFAULT_MONTHS_AHEAD = 2
+DEFAULT_RETENTION_MODE = 'archive'
+RETENTION_MODES = ('archive', 'drop')
+
+PARTITIONED_TABLES_SQL = """
+SELECT pg_class.relname::TEXT
+FROM pg_partitioned_table
+JOIN pg_class ON pg_class.oid = pg_partitioned_table.partrelid
+WHERE pg_class.relname = ANY($1)
+"""
+EXTEND_SQL = "SELECT event_partitions_extend($1, date_trunc('month', now() AT TIME ZONE 'UTC')::DATE, $2)"
+
+_logger = logging.getLogger(__name__)
+
+_compacted = Counter('defi_space_event_partitions_compacted_total', 'Event partitions rolled up and retired', ['table'])
+
+
+def _parse_bool(value: Any) -> bool:
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
+    return bool(value)
+
+
+def month_start(year: int, month: int) -> int:
+    """Timestamp of the first second of a month (UTC); `month` may be out of 1..12."""
+    year, month = year + (month - 1) // 12, (month - 1) % 12 + 1
+    return int(datetime(year, month, 1, tzinfo=UTC).timestamp())
+
+
+class EventPartitions:
+    """
+    Monthly partitioning and retention of event tables (PostgreSQL only).
+
+    When enabled, `sql/on_reindex` replaces SwapEvent, LiquidityEvent, StakeEvent and
+    RewardEvent tables with tables range-partitioned by `created_at`, one partition per
+    month from `start`. `sql/on_restart` and the daily maintenance job keep `months_ahead`
+    partitions ready in advance.
+
+    With `retention_months` set, maintenance compacts partitions older than that: each is
+    rolled up into daily `EventRollup` rows and then dropped or moved to the `event_archive`
+    schema, depending on `retention_mode`. Compaction waits until every index is realtime,
+    so a partition is never retired while sync is still filling it.
+
+    Configured through the `custom.event_partitions` section of `dipdup.yaml`; partitioning
+    is applied on reindex only.
+    """
+
+    def __init__(self) -> None:
+        self._configured = False
+        self.enabled = False
+        self.start = DEFAULT_START
+        self.months_ahead = DEFAULT_MONTHS_AHEAD
+        self.retention_months = 0
+        self.retention_mode = DEFAULT_RETENTION_MODE
+
+    def configure(self, ctx: DipDupContext) -> None:
+        if self._configured:
+            return
+        config = ctx.config.custom.get('event_partitions') or {}
+        self.enabled = _parse_bool(config.get('enabled'))
+        self.start = str(config.get('start') or DEFAULT_START)
+        self.months_ahead = int(config.get('months_ahead') or DEFAULT_MONTHS_AHEAD)
+        self.retention_months = int(config.get('retention_months') or 0)
+        self.retention_mode = str(config.get('retention_mode') or DEFAULT_RETENTION_MODE)
+        if self.retention_mode not in RETENTION_MODES:
+            raise ValueError(f'Unknown event partitions retention mode `{self.retention_mode}`, expected one of {RETENTION_MODES}')
+        # NOTE: Validate before it's formatted into SQL
+        datetime.strptime(self.start, '%Y-%m')
+        self._configured = True
+
+    def script_args(self) -> dict[str, Any]:
+        """Format arguments of `sql/on_reindex` and `sql/on_restart` scripts."""
+        return {
+            'enabled': self.enabled,
+            'start': self.start,
+            'months_ahead': self.months_ahead,
+        }
+
+    async def maintain(self, ctx: DipDupContext) -> None:
+        """Create upcoming partitions and compact expired ones."""
+        self.configure(ctx)
+        if ctx.config.database.kind != 'postgres':
+            return
+
+        conn = get_connection()
+        _, rows = await conn.execute_query(PARTITIONED_TABLES_SQL, [list(EVENT_TABLES)])
+        tables = [table for (table,) in rows]
+        for table in tables:
+            await conn.execute_query(EXTEND_SQL, [table, self.months_ahead])
+        if not tables or not self.retention_months:
+            return
+
+        if await Index.filter(status__in=(IndexStatus.new, IndexStatus.syncing)).exists():
+            _logger.info('Indexes are syncing; event partitions compaction postponed')
+            return
+
+        now = datetime.now(UTC)
+        cutoff = month_start(now.year, now.month - self.retention_months)
+        archive = self.retention_mode == 'archive'
+        for table in tables:
+            _, rows = await conn.execute_query('SELECT event_partitions_expired($1, $2)', [table, cutoff])
+            for (partition,) in rows:
+                # NOTE: One statement per partition; a failure leaves it attached for the next run
+                _, result = await conn.execute_query('SELECT event_partition_compact($1, $2)', [partition, archive])
+                _compacted[table] += 1
+                _logger.info('Compacted `%s` into %s daily rollups (%s)', partition, result[0][0], self.retention_mode)
+
+
+event_partitions = EventPartitions()
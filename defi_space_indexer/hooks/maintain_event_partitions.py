@@ -0,0 +1,12 @@
+from dipdup.context import HookContext
+from defi_space_indexer.hooks.event_partitions import event_partitions
+
+
+async def maintain_event_partitions(
+    ctx: HookContext,
+) -> None:
+    """Create upcoming event table partitions and compact the ones past retention.
+
+    No-op unless event tables were partitioned on reindex (PostgreSQL only).
+    """
+    await event_partitions.maintain(ctx)
@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable
+from collections.abc import Callable
+from collections.abc import Hashable
+from collections.abc import Sequence
+from typing import Any
+from typing import TypeVar
+
+from dipdup.context import DipDupContext
+from dipdup.prometheus import Counter
+from dipdup.prometheus import Histogram
+
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_CONCURRENCY = 4
+DEFAULT_DEADLINE = 50.0
+
+T = TypeVar('T')
+P = TypeVar('P')
+R = TypeVar('R')
+
+_logger = logging.getLogger(__name__)
+
+_duration = Histogram('defi_space_metrics_run_duration_seconds', 'Duration of metrics hook runs', ['hook'])
+_overruns = Counter('defi_space_metrics_run_overruns_total', 'Metrics hook runs cut short by the deadline', ['hook'])
+_deferred = Counter('defi_space_metrics_run_deferred_total', 'Entities left for the next run by the deadline', ['hook'])
+_skipped = Counter('defi_space_metrics_run_skipped_total', 'Metrics hook runs skipped while the previous one is running', ['hook'])
+_failures = Counter('defi_space_metrics_batch_failures_total', 'Metrics batches that raised', ['hook'])
+
+
+class MetricsRunner:
+    """
+    Bounded-concurrency executor for metrics hooks.
+
+    A run first prepares what all entities share (prices) once, then splits entities
+    into batches of `batch_size`; each batch computes metrics with the prepared value
+    and writes them back with one bulk update. At most `concurrency` batches are in
+    flight. Whatever is still running `deadline` seconds after the run started, be it
+    preparation or batches, is cancelled and its entities are picked up by the next run.
+
+    A run is skipped when the previous one with the same arguments hasn't finished
+    yet, so slow runs never stack up behind the job interval. A failed batch is
+    logged and doesn't affect the others.
+
+    Configured through the `custom.metrics_jobs` section of `dipdup.yaml`.
+    """
+
+    def __init__(self) -> None:
+        self._running: set[Hashable] = set()
+        self._configured = False
+        self._batch_size = DEFAULT_BATCH_SIZE
+        self._concurrency = DEFAULT_CONCURRENCY
+        self._deadline = DEFAULT_DEADLINE
+
+    def configure(self, ctx: DipDupContext) -> None:
+        if self._configured:
+            return
+        config = ctx.config.custom.get('metrics_jobs') or {}
+        self._batch_size = int(config.get('batch_size') or DEFAULT_BATCH_SIZE)
+        self._concurrency = int(config.get('concurrency') or DEFAULT_CONCURRENCY)
+        self._deadline = float(config.get('deadline') or DEFAULT_DEADLINE)
+        self._configured = True
+
+    async def run(
+        self,
+        ctx: DipDupContext,
+        hook: str,
+        key: Hashable,
+        items: Sequence[T],
+        prepare: Callable[[Sequence[T]], Awaitable[P]],
+        process: Callable[[P, Sequence[T]], Awaitable[R]],
+    ) -> list[R] | None:
+        """Process items in concurrent batches. Returns results of completed batches, `None` if skipped."""
+        self.configure(ctx)
+        if (hook, key) in self._running:
+            _skipped[hook] += 1
+            _logger.warning('`%s` with %s is still running; skipping', hook, key)
+            return None
+
+        self._running.add((hook, key))
+        started_at = time.perf_counter()
+        semaphore = asyncio.Semaphore(self._concurrency)
+
+        tasks: dict[asyncio.Task[R], int] = {}
+        try:
+            try:
+                prepared = await asyncio.wait_for(prepare(items), timeout=self._deadline)
+            except TimeoutError:
+                _overruns[hook] += 1
+                _deferred[hook] += len(items)
+                _logger.warning(
+                    '`%s` hit the %ss deadline while preparing; %s entities deferred', hook, self._deadline, len(items)
+                )
+                return []
+
+            async def _process(batch: Sequence[T]) -> R:
+                async with semaphore:
+                    return await process(prepared, batch)
+
+            batches = [items[i : i + self._batch_size] for i in range(0, len(items), self._batch_size)]
+            tasks = {asyncio.create_task(_process(batch)): len(batch) for batch in batches}
+            pending: set[asyncio.Task[R]] = set()
+            if tasks:
+                timeout = max(self._deadline - (time.perf_counter() - started_at), 0)
+                _, pending = await asyncio.wait(tasks, timeout=timeout)
+            if pending:
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+                deferred = sum(tasks[task] for task in pending)
+                _overruns[hook] += 1
+                _deferred[hook] += deferred
+                _logger.warning('`%s` hit the %ss deadline; %s entities deferred', hook, self._deadline, deferred)
+
+            results = []
+            for task in tasks:
+                if task in pending:
+                    continue
+                if (exc := task.exception()) is not None:
+                    _failures[hook] += 1
+                    _logger.error('`%s` batch failed', hook, exc_info=exc)
+                    continue
+                results.append(task.result())
+            return results
+        finally:
+            # NOTE: No-op for finished batches; stops the rest if the run itself is cancelled
+            for task in tasks:
+                task.cancel()
+            self._running.discard((hook, key))
+            _duration[hook] += time.perf_counter() - started_at
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            'running': len(self._running),
+            'batch_size': self._batch_size,
+            'concurrency': self._concurrency,
+            'deadline': self._deadline,
+        }
+
+
+metrics_runner = MetricsRunner()
@@ -0,0 +1,141 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from typing import Any
+
+from dipdup.context import DipDupContext
+from dipdup.context import HandlerContext
+from dipdup.prometheus import Counter
+from dipdup.prometheus import Gauge
+
+DEFAULT_WINDOW = 10.0
+DEFAULT_WORKERS = 4
+
+# (hook name, argument name, address)
+Job = tuple[str, str, str]
+
+_logger = logging.getLogger(__name__)
+
+_touches = Counter('defi_space_metrics_touches_total', 'Entities marked dirty by handlers', ['hook'])
+_runs = Counter('defi_space_metrics_runs_total', 'Metrics hook runs started by the scheduler', ['hook'])
+_failures = Counter('defi_space_metrics_failures_total', 'Metrics hook runs that raised', ['hook'])
+_queue_depth = Gauge('defi_space_metrics_queue_depth', 'Entities waiting for a metrics run')
+_coalescing_ratio = Gauge('defi_space_metrics_coalescing_ratio', 'Touches per metrics run')
+
+
+class MetricsScheduler:
+    """
+    Coalescing scheduler for per-entity metrics hooks.
+
+    Handlers mark pairs and reactors as dirty instead of firing a hook per event.
+    Marks become eligible once the level that produced them is committed. Every
+    `window` seconds the dirty set is drained into a queue served by a fixed pool
+    of workers, so each entity is recalculated at most once per window no matter
+    how many events touched it, and no more than `workers` hooks run at a time.
+
+    Configured through the `custom.metrics_scheduler` section of `dipdup.yaml`.
+    """
+
+    def __init__(self) -> None:
+        self._pending: defaultdict[str, set[Job]] = defaultdict(set)
+        self._dirty: dict[Job, None] = {}
+        self._active: set[Job] = set()
+        self._queue: asyncio.Queue[Job] = asyncio.Queue()
+        self._tasks: list[asyncio.Task[None]] = []
+        self._ctx: DipDupContext | None = None
+        self._window = DEFAULT_WINDOW
+        self._workers = DEFAULT_WORKERS
+        self.touches = 0
+        self.runs = 0
+
+    def touch(self, ctx: HandlerContext, hook: str, arg: str, address: str) -> None:
+        """Mark an entity as dirty within the current level."""
+        self._pending[ctx.handler_config.parent.name].add((hook, arg, address))
+        self.touches += 1
+        _touches[hook] += 1
+
+    def touch_pair(self, ctx: HandlerContext, pair_address: str) -> None:
+        self.touch(ctx, 'calculate_amm_metrics', 'pair_address', pair_address)
+
+    def touch_reactor(self, ctx: HandlerContext, reactor_address: str) -> None:
+        self.touch(ctx, 'calculate_farming_metrics', 'reactor_address', reactor_address)
+
+    def commit(self, ctx: HandlerContext) -> None:
+        """Make marks of a committed level eligible for the next window."""
+        for job in self._pending.pop(ctx.handler_config.parent.name, ()):
+            self._dirty[job] = None
+        self._update_gauges()
+
+    def discard(self, index: str) -> None:
+        """Drop marks of a level that failed."""
+        self._pending.pop(index, None)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            'dirty': len(self._dirty),
+            'queued': self._queue.qsize(),
+            'active': len(self._active),
+            'touches': self.touches,
+            'runs': self.runs,
+            'coalescing_ratio': self.touches / self.runs if self.runs else None,
+        }
+
+    def start(self, ctx: DipDupContext) -> None:
+        """Start the dispatcher and workers; call from `on_restart`.
+
+        Tasks inherit the database connection of the context they are created in. Started
+        from a handler, they would keep using a level transaction after it is released.
+        """
+        if self._tasks:
+            return
+        config = ctx.config.custom.get('metrics_scheduler') or {}
+        self._window = float(config.get('window', DEFAULT_WINDOW))
+        self._workers = int(config.get('workers', DEFAULT_WORKERS))
+        self._ctx = ctx
+
+        self._tasks.append(asyncio.create_task(self._dispatch_loop()))
+        for _ in range(self._workers):
+            self._tasks.append(asyncio.create_task(self._worker_loop()))
+
+    async def _dispatch_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self._window)
+            for job in tuple(self._dirty):
+                # NOTE: Already queued or running; keep it dirty for the next window
+                if job in self._active:
+                    continue
+                del self._dirty[job]
+                self._active.add(job)
+                self._queue.put_nowait(job)
+            self._update_gauges()
+
+    async def _worker_loop(self) -> None:
+        if self._ctx is None:
+            raise RuntimeError('Scheduler is not started')
+
+        while True:
+            job = await self._queue.get()
+            hook, arg, address = job
+            self.runs += 1
+            _runs[hook] += 1
+            started_at = time.perf_counter()
+            try:
+                await self._ctx.fire_hook(hook, wait=True, **{arg: address})
+            except Exception:
+                _failures[hook] += 1
+                _logger.exception('Metrics hook `%s` failed for %s', hook, address)
+            else:
+                _logger.debug('%s(%s) done in %.3fs', hook, address, time.perf_counter() - started_at)
+            finally:
+                self._active.discard(job)
+                self._queue.task_done()
+                self._update_gauges()
+
+    def _update_gauges(self) -> None:
+        _queue_depth.set(len(self._dirty) + self._queue.qsize())
+        if self.runs:
+            _coalescing_ratio.set(self.touches / self.runs)
+
+
+metrics_scheduler = MetricsScheduler()
@@ -0,0 +1,345 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import suppress
+from typing import Any
+from urllib.parse import urlsplit
+
+import aiohttp
+import orjson
+from dipdup.context import DipDupContext
+from dipdup.datasources.starknet_node import StarknetNodeDatasource
+from dipdup.prometheus import Counter
+from dipdup.prometheus import Gauge
+from dipdup.prometheus import Histogram
+
+MODES = ('off', 'adaptive')
+DEFAULT_MODE = 'off'
+DEFAULT_DATASOURCE = 'node'
+DEFAULT_RATE = 10.0  # Requests per second when the datasource has no `ratelimit_rate`
+DEFAULT_MIN_RATE = 1.0
+DEFAULT_MAX_RATE = 50.0
+DEFAULT_SLOW_AFTER = 2.0
+DEFAULT_HEDGE_AFTER = 3.0
+ADDITIVE_INCREASE = 1.0  # Requests per second gained per second of successful traffic
+THROTTLED_DECREASE = 0.5
+SLOW_DECREASE = 0.8
+DECREASE_INTERVAL = 1.0  # A burst of 429s or slow responses counts as one signal
+LATENCY_ALPHA = 0.2
+MAX_COOLDOWN = 60.0
+
+_logger = logging.getLogger(__name__)
+
+_requests = Counter('defi_space_node_pool_requests_total', 'Requests sent to node endpoints', ['endpoint', 'status'])
+_hedged = Counter('defi_space_node_pool_hedged_total', 'Slow calls sent to a second endpoint', ['endpoint'])
+_latency = Histogram('defi_space_node_pool_latency_seconds', 'Latency of node endpoint responses', ['endpoint'])
+_rate = Gauge('defi_space_node_pool_rate', 'Adaptive request rate limit of node endpoints', ['endpoint'])
+_healthy = Gauge('defi_space_node_pool_healthy', 'Whether a node endpoint takes requests now', ['endpoint'])
+
+
+class Endpoint:
+    """
+    One JSON-RPC endpoint of the pool with an AIMD rate limit.
+
+    Requests are spaced `1 / rate` seconds apart. Until the first 429 or slow response every
+    success raises the rate by `ADDITIVE_INCREASE` (slow start); afterwards the increase is
+    additive, so a fully used endpoint gains `ADDITIVE_INCREASE` requests per second each
+    second. A 429 halves the rate and a response slower than `slow_after` cuts it by a fifth.
+    Failures put the endpoint on an exponential cooldown, 429s on `Retry-After` if sent.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        alias: str,
+        rate: float,
+        min_rate: float,
+        max_rate: float,
+        slow_after: float,
+    ) -> None:
+        self.url = url
+        self.alias = alias
+        self.rate = rate
+        self._min_rate = min_rate
+        self._max_rate = max_rate
+        self._slow_after = slow_after
+        self._next_at = 0.0
+        self._available_at = 0.0
+        self._decreased_at = 0.0
+        self._slow_start = True
+        self.failures = 0
+        self.latency: float | None = None
+        self.session: aiohttp.ClientSession | None = None
+        _rate[alias] = rate
+        _healthy[alias] = 1
+
+    def ready_at(self, now: float) -> float:
+        return max(now, self._next_at, self._available_at)
+
+    def take(self, now: float) -> None:
+        self._next_at = now + 1 / self.rate
+
+    def on_success(self, latency: float) -> None:
+        now = time.monotonic()
+        self.failures = 0
+        self.latency = latency if self.latency is None else self.latency + LATENCY_ALPHA * (latency - self.latency)
+        _latency[self.alias] += latency
+        _requests[self.alias, 'ok'] += 1
+        _healthy[self.alias] = 1
+        if latency > self._slow_after:
+            self._decrease(now, SLOW_DECREASE)
+        else:
+            self._set_rate(self.rate + (ADDITIVE_INCREASE if self._slow_start else ADDITIVE_INCREASE / self.rate))
+
+    def on_throttled(self, retry_after: float | None) -> None:
+        now = time.monotonic()
+        _requests[self.alias, 'throttled'] += 1
+        self._decrease(now, THROTTLED_DECREASE)
+        if retry_after:
+            self._available_at = max(self._available_at, now + min(retry_after, MAX_COOLDOWN))
+
+    def on_error(self, retry_sleep: float) -> None:
+        _requests[self.alias, 'error'] += 1
+        self.failures += 1
+        self._available_at = time.monotonic() + min(MAX_COOLDOWN, retry_sleep * 2 ** (self.failures - 1))
+        _healthy[self.alias] = 0
+
+    def _decrease(self, now: float, factor: float) -> None:
+        if now - self._decreased_at < DECREASE_INTERVAL:
+            return
+        self._decreased_at = now
+        self._slow_start = False
+        self._set_rate(self.rate * factor)
+
+    def _set_rate(self, rate: float) -> None:
+        self.rate = min(self._max_rate, max(self._min_rate, rate))
+        _rate[self.alias] = self.rate
+
+
+class NodePool:
+    """
+    Requests of a `starknet.node` datasource spread over several JSON-RPC endpoints.
+
+    In `adaptive` mode the datasource's HTTP gateway is swapped for the pool on restart;
+    the pool serves the datasource URL and every URL of `urls`. Calls wait in a single
+    queue; each goes to the endpoint that can take it soonest under its AIMD rate limit
+    (see `Endpoint`), so faster and less throttled endpoints get more traffic. Failed calls are retried on
+    the next best endpoint up to the datasource's `http.retry_count` times. Calls still
+    unanswered `hedge_after` seconds after being sent are also sent to another endpoint
+    and the first response wins; node reads are idempotent.
+
+    Configured through the `custom.node_pool` section of `dipdup.yaml`.
+    """
+
+    def __init__(self) -> None:
+        self._configured = False
+        self.mode = DEFAULT_MODE
+        self.endpoints: list[Endpoint] = []
+        self._datasource = DEFAULT_DATASOURCE
+        self._urls: list[str] = []
+        self._min_rate = DEFAULT_MIN_RATE
+        self._max_rate = DEFAULT_MAX_RATE
+        self._slow_after = DEFAULT_SLOW_AFTER
+        self._hedge_after = DEFAULT_HEDGE_AFTER
+        self._retries = 0
+        self._retry_sleep = 1.0
+        self._headers: dict[str, str] = {}
+        self._gateway_url = ''
+        self._timeout = aiohttp.ClientTimeout()
+        self._connection_limit = 100
+        self._waiters: deque[tuple[asyncio.Future[Endpoint], Endpoint | None]] = deque()
+        self._dispatcher: asyncio.Task[None] | None = None
+
+    # NOTE: Gateway interface used by `HTTPGateway`; starknet.py checks the URL on every call
+    @property
+    def _url(self) -> str:
+        return self._gateway_url
+
+    def configure(self, ctx: DipDupContext) -> None:
+        if self._configured:
+            return
+        config = ctx.config.custom.get('node_pool') or {}
+        self.mode = str(config.get('mode') or DEFAULT_MODE)
+        if self.mode not in MODES:
+            raise ValueError(f'Unknown node pool mode `{self.mode}`, expected one of {MODES}')
+        self._datasource = str(config.get('datasource') or DEFAULT_DATASOURCE)
+        urls = config.get('urls') or []
+        if isinstance(urls, str):
+            urls = urls.split(',')
+        self._urls = [url.strip() for url in urls if url.strip()]
+        self._min_rate = float(config.get('min_rate') or DEFAULT_MIN_RATE)
+        self._max_rate = float(config.get('max_rate') or DEFAULT_MAX_RATE)
+        self._slow_after = float(config.get('slow_after') or DEFAULT_SLOW_AFTER)
+        self._hedge_after = float(config.get('hedge_after', DEFAULT_HEDGE_AFTER) or 0)
+        self._configured = True
+
+    async def install(self, ctx: DipDupContext) -> None:
+        """Route requests of the node datasource through the pool; call from `on_restart`."""
+        self.configure(ctx)
+        if self.mode == 'off' or self.endpoints:
+            return
+
+        datasource = ctx.get_starknet_datasource(self._datasource)
+        if not isinstance(datasource, StarknetNodeDatasource):
+            raise TypeError(f'`{self._datasource}` is not a `starknet.node` datasource')
+
+        http = datasource._http_config
+        rate = http.ratelimit_rate / http.ratelimit_period if http.ratelimit_rate and http.ratelimit_period else DEFAULT_RATE
+        self._retries = http.retry_count
+        self._retry_sleep = http.retry_sleep
+        self._timeout = aiohttp.ClientTimeout(total=http.request_timeout, connect=http.connection_timeout)
+        self._connection_limit = http.connection_limit
+
+        gateway = datasource._http
+        self._gateway_url = gateway._url
+        self._headers = {'User-Agent': gateway.user_agent}
+        aliases: set[str] = set()
+        for url in (datasource._config.url, *self._urls):
+            alias = urlsplit(url).netloc
+            # NOTE: API keys are part of the path; don't put them into metric labels
+            while alias in aliases:
+                alias += '+'
+            aliases.add(alias)
+            self.endpoints.append(Endpoint(url, alias, rate, self._min_rate, self._max_rate, self._slow_after))
+
+        await self.__aenter__()
+        # NOTE: Entered by DipDup already; the datasource closes the pool on exit instead
+        await gateway.__aexit__(None, None, None)
+        datasource._http = self  # type: ignore[assignment]
+        _logger.info(
+            'Spreading `%s` requests over %s endpoints: %s',
+            self._datasource,
+            len(self.endpoints),
+            ', '.join(endpoint.alias for endpoint in self.endpoints),
+        )
+
+    async def __aenter__(self) -> None:
+        for endpoint in self.endpoints:
+            endpoint.session = aiohttp.ClientSession(
+                json_serialize=lambda v: orjson.dumps(v).decode(),
+                connector=aiohttp.TCPConnector(limit=self._connection_limit),
+                timeout=self._timeout,
+            )
+
+    async def __aexit__(self, *args: object) -> None:
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+        for endpoint in self.endpoints:
+            if endpoint.session is not None:
+                await endpoint.session.close()
+
+    def set_user_agent(self, *args: str) -> None:
+        pass
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        weight: int = 1,
+        **kwargs: Any,
+    ) -> Any:
+        """Send a request to the best endpoint, retrying and hedging on others."""
+        attempt = 0
+        while True:
+            try:
+                return await self._hedged_request(method, url, kwargs)
+            except (aiohttp.ClientError, TimeoutError) as e:
+                attempt += 1
+                if attempt > self._retries:
+                    raise
+                _logger.warning('Node request attempt %s/%s failed: %s', attempt, self._retries + 1, e)
+
+    async def _acquire(self, exclude: Endpoint | None = None) -> Endpoint:
+        """Wait for a free slot of the best endpoint; hedged calls skip the queue."""
+        future: asyncio.Future[Endpoint] = asyncio.get_running_loop().create_future()
+        if exclude is None:
+            self._waiters.append((future, exclude))
+        else:
+            self._waiters.appendleft((future, exclude))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        return await future
+
+    async def _dispatch(self) -> None:
+        while self._waiters:
+            future, exclude = self._waiters[0]
+            if future.done():
+                self._waiters.popleft()
+                continue
+
+            now = time.monotonic()
+            endpoints = [endpoint for endpoint in self.endpoints if endpoint is not exclude] or self.endpoints
+            endpoint = min(endpoints, key=lambda endpoint: (endpoint.ready_at(now), endpoint.latency or 0))
+            ready_at = endpoint.ready_at(now)
+            # NOTE: Pick again after sleeping; rates and cooldowns change while requests complete
+            if ready_at > now:
+                await asyncio.sleep(ready_at - now)
+                continue
+
+            self._waiters.popleft()
+            endpoint.take(now)
+            future.set_result(endpoint)
+
+    async def _hedged_request(self, method: str, url: str, kwargs: dict[str, Any]) -> Any:
+        primary = await self._acquire()
+        tasks = {asyncio.create_task(self._request(primary, method, url, kwargs))}
+        try:
+            if self._hedge_after and len(self.endpoints) > 1:
+                done, _ = await asyncio.wait(tasks, timeout=self._hedge_after)
+                if not done:
+                    _hedged[primary.alias] += 1
+                    tasks.add(asyncio.create_task(self._hedge(primary, method, url, kwargs)))
+
+            error: BaseException | None = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error  # type: ignore[misc]
+        finally:
+            for task in tasks:
+                task.cancel()
+                with suppress(asyncio.CancelledError, aiohttp.ClientError, TimeoutError):
+                    await task
+
+    async def _hedge(self, primary: Endpoint, method: str, url: str, kwargs: dict[str, Any]) -> Any:
+        endpoint = await self._acquire(exclude=primary)
+        return await self._request(endpoint, method, url, kwargs)
+
+    async def _request(self, endpoint: Endpoint, method: str, url: str, kwargs: dict[str, Any]) -> Any:
+        if endpoint.session is None:
+            raise RuntimeError('Node pool is not entered')
+        started_at = time.monotonic()
+        try:
+            async with endpoint.session.request(
+                method,
+                f'{endpoint.url.rstrip("/")}/{url}' if url else endpoint.url,
+                headers=self._headers,
+                raise_for_status=True,
+                **kwargs,
+            ) as response:
+                body = await response.read()
+        except aiohttp.ClientResponseError as e:
+            if e.status == 429:
+                retry_after = None
+                with suppress(KeyError, TypeError, ValueError):
+                    retry_after = float(e.headers['Retry-After'])  # type: ignore[index]
+                endpoint.on_throttled(retry_after)
+            else:
+                endpoint.on_error(self._retry_sleep)
+            raise
+        except (aiohttp.ClientError, TimeoutError):
+            endpoint.on_error(self._retry_sleep)
+            raise
+        except asyncio.CancelledError:
+            _requests[endpoint.alias, 'cancelled'] += 1
+            raise
+
+        endpoint.on_success(time.monotonic() - started_at)
+        return orjson.loads(body)
+
+
+node_pool = NodePool()
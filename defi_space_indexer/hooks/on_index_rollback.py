@@ -1,5 +1,8 @@
 from dipdup.context import HookContext
 from dipdup.index import Index
+from defi_space_indexer.models import cache
+from defi_space_indexer.hooks import candles
+from defi_space_indexer.hooks.price_oracle import price_oracle
 
 
 async def on_index_rollback(
@@ -13,4 +16,8 @@ async def on_index_rollback(
         index=index.name,
         from_level=from_level,
         to_level=to_level,
-    )
\ No newline at end of file
+    )
+    # NOTE: Reverted rows are stale in memory; reload them on the next access
+    cache.invalidate(index.name)
+    candles.reset()
+    price_oracle.reset()
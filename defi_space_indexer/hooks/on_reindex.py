@@ -1,7 +1,11 @@
 from dipdup.context import HookContext
+from defi_space_indexer.hooks.event_partitions import event_partitions
 
 
 async def on_reindex(
     ctx: HookContext,
 ) -> None:
-    await ctx.execute_sql_script('on_reindex')
\ No newline at end of file
+    # NOTE: Scripts in `sql/on_reindex` and `sql/on_restart` are PostgreSQL-only
+    if ctx.config.database.kind == 'postgres':
+        event_partitions.configure(ctx)
+        await ctx.execute_sql_script('on_reindex', **event_partitions.script_args())
\ No newline at end of file
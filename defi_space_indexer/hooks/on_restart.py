@@ -1,7 +1,23 @@
 from dipdup.context import HookContext
+from defi_space_indexer.hooks.contract_indexes import contract_indexes
+from defi_space_indexer.hooks.event_capture import event_capture
+from defi_space_indexer.hooks.event_partitions import event_partitions
+from defi_space_indexer.hooks.metrics_scheduler import metrics_scheduler
+from defi_space_indexer.hooks.node_pool import node_pool
 
 
 async def on_restart(
     ctx: HookContext,
 ) -> None:
-    await ctx.execute_sql_script('on_restart')
\ No newline at end of file
+    if ctx.config.database.kind == 'postgres':
+        event_partitions.configure(ctx)
+        await ctx.execute_sql_script('on_restart', **event_partitions.script_args())
+        # NOTE: Idempotent schema migrations for databases created by older versions
+        await ctx.execute_sql_script('migrations')
+
+    await node_pool.install(ctx)
+    await event_capture.install(ctx)
+
+    # NOTE: Before indexes are loaded; in `multi` mode pairs and reactors share one index per template
+    await contract_indexes.register(ctx)
+    metrics_scheduler.start(ctx)
\ No newline at end of file
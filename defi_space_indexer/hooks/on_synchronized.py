@@ -1,7 +1,13 @@
 from dipdup.context import HookContext
+from defi_space_indexer.hooks.analytics_views import refresh_analytics_views
+from defi_space_indexer.hooks.contract_indexes import contract_indexes
+from defi_space_indexer.hooks.event_capture import event_capture
 
 
 async def on_synchronized(
     ctx: HookContext,
 ) -> None:
-    await ctx.execute_sql('on_synchronized')
\ No newline at end of file
+    await ctx.execute_sql('on_synchronized')
+    contract_indexes.report_startup()
+    await event_capture.complete(ctx)
+    await refresh_analytics_views(ctx)
\ No newline at end of file
@@ -0,0 +1,331 @@
+import heapq
+import logging
+from collections import defaultdict
+from collections.abc import Iterable
+from decimal import Decimal
+from typing import Any
+from typing import NamedTuple
+
+from dipdup.context import DipDupContext
+from dipdup.context import HandlerContext
+from dipdup.prometheus import Counter
+from dipdup.prometheus import Gauge
+
+from defi_space_indexer.hooks.metrics_scheduler import metrics_scheduler
+from defi_space_indexer.models.amm_models import Pair
+from defi_space_indexer.models.cache import index_name, pair_cache
+
+DEFAULT_MODE = 'off'
+DEFAULT_DECIMALS = 18
+DEFAULT_MAX_HOPS = 3
+DEFAULT_MIN_LIQUIDITY_USD = 0
+MODES = ('off', 'primary', 'fallback')
+
+_logger = logging.getLogger(__name__)
+
+_recomputed = Counter('defi_space_price_oracle_recomputed_total', 'Token prices recomputed by the oracle', ['kind'])
+_priced_tokens = Gauge('defi_space_price_oracle_priced_tokens', 'Tokens with a route to a stablecoin anchor')
+
+
+class Edge(NamedTuple):
+    token0: int
+    token1: int
+    reserve0: Decimal
+    reserve1: Decimal
+
+    @property
+    def alive(self) -> bool:
+        return self.reserve0 > 0 and self.reserve1 > 0
+
+
+def _token_key(address: str) -> int:
+    return int(address, 16)
+
+
+def _parse_tokens(value: Any) -> dict[int, int]:
+    """Parse `{address: decimals}` mapping or `address:decimals,...` string."""
+    if not value:
+        return {}
+    if isinstance(value, str):
+        value = dict(item.split(':') for item in value.split(',') if item.strip())
+    return {_token_key(address.strip()): int(decimals) for address, decimals in value.items()}
+
+
+class PriceOracle:
+    """
+    USD prices derived from indexed `Pair` reserves, without network calls.
+
+    Pairs form a token graph with reserves as edge weights. Stablecoin anchors are
+    priced at $1; every other token is priced through its pairs with tokens that are
+    closer (in hops) to an anchor, averaging spot prices weighted by the USD depth of
+    the priced side. Pairs shallower than `min_liquidity_usd` on the priced side and
+    routes longer than `max_hops` are ignored.
+
+    Handlers report pairs with changed reserves; at the level boundary only tokens
+    downstream of those pairs are recomputed. The whole graph is recomputed when a
+    pair starts or stops qualifying as a route, since hop distances change then.
+
+    In `primary` mode changed prices of pairs the current level changed are written to
+    `Pair.token0_price`/`token1_price` with that level; other pairs next to a repriced
+    token are handed to the metrics scheduler, which writes their prices outside level
+    transactions. Metrics hooks ask DexScreener only for tokens the oracle can't route.
+    In `fallback` mode the oracle covers tokens DexScreener can't price.
+
+    Configured through the `custom.price_oracle` section of `dipdup.yaml`.
+    """
+
+    def __init__(self) -> None:
+        self._pending: defaultdict[str, dict[str, Edge]] = defaultdict(dict)
+        self._edges: dict[str, Edge] = {}
+        self._adjacency: defaultdict[int, set[str]] = defaultdict(set)
+        self._layers: dict[int, int] = {}
+        self._prices: dict[int, Decimal] = {}
+        # NOTE: (pair, priced token) routes deep enough to price the other token
+        self._qualified: set[tuple[str, int]] = set()
+        self._loaded = False
+
+        self._configured = False
+        self.mode = DEFAULT_MODE
+        self._anchors: set[int] = set()
+        self._decimals: dict[int, int] = {}
+        self._default_decimals = DEFAULT_DECIMALS
+        self._max_hops = DEFAULT_MAX_HOPS
+        self._min_liquidity = Decimal(DEFAULT_MIN_LIQUIDITY_USD)
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != 'off' and bool(self._anchors)
+
+    def configure(self, ctx: DipDupContext) -> None:
+        if self._configured:
+            return
+        config = ctx.config.custom.get('price_oracle') or {}
+        self.mode = config.get('mode') or DEFAULT_MODE
+        if self.mode not in MODES:
+            raise ValueError(f'Unknown price oracle mode `{self.mode}`, expected one of {MODES}')
+        anchors = _parse_tokens(config.get('anchors'))
+        self._anchors = set(anchors)
+        self._decimals = {**_parse_tokens(config.get('decimals')), **anchors}
+        self._default_decimals = int(config.get('default_decimals') or DEFAULT_DECIMALS)
+        self._max_hops = int(config.get('max_hops') or DEFAULT_MAX_HOPS)
+        self._min_liquidity = Decimal(config.get('min_liquidity_usd') or DEFAULT_MIN_LIQUIDITY_USD)
+        self._configured = True
+
+    def touch(self, ctx: HandlerContext, pair: Pair) -> None:
+        """Report pair reserves changed within the current level."""
+        self._pending[index_name(ctx)][pair.address] = Edge(
+            _token_key(pair.token0_address),
+            _token_key(pair.token1_address),
+            Decimal(pair.reserve0),
+            Decimal(pair.reserve1),
+        )
+
+    async def commit(self, ctx: HandlerContext) -> None:
+        """Apply reserves of the current level and stage changed Pair prices."""
+        edges = self._pending.pop(index_name(ctx), None)
+        self.configure(ctx)
+        if not edges or not self.enabled:
+            return
+
+        await self._ensure_loaded()
+        for address, edge in edges.items():
+            self._add_edge(address, edge)
+
+        seeds = {token for edge in edges.values() for token in (edge.token0, edge.token1)}
+        changed = self._propagate(seeds)
+        if changed is None:
+            changed = self._rebuild()
+            _recomputed['full'] += len(self._layers)
+        else:
+            _recomputed['incremental'] += len(changed)
+
+        if self.mode != 'primary' or not changed:
+            return
+
+        addresses = set().union(*(self._adjacency[token] for token in changed))
+        for address in addresses:
+            # NOTE: Other pairs may be staged by indexes still processing their levels; writing them here
+            # NOTE: would flush and journal their reserves under this index. Let metrics hooks reprice them.
+            if not pair_cache.is_staged(ctx, address):
+                metrics_scheduler.touch_pair(ctx, address)
+                continue
+            pair = await pair_cache.get(address)
+            if pair is None:
+                continue
+            pair.token0_price = self._prices.get(_token_key(pair.token0_address))
+            pair.token1_price = self._prices.get(_token_key(pair.token1_address))
+
+    def discard(self, index: str) -> None:
+        """Drop reserves reported by a level that failed."""
+        self._pending.pop(index, None)
+        # NOTE: The graph may already hold reserves of that level; rebuild it from the database
+        self._loaded = False
+
+    def reset(self) -> None:
+        """Forget everything after a rollback; graph is reloaded on the next use."""
+        self._pending.clear()
+        self._loaded = False
+
+    def decimals(self, address: str) -> int:
+        """Token decimals from config; used to convert raw amounts to whole tokens."""
+        return self._decimals.get(_token_key(address), self._default_decimals)
+
+    async def get_prices(self, ctx: DipDupContext, token_addresses: Iterable[str]) -> dict[str, Decimal]:
+        """USD prices of tokens that have a route to an anchor."""
+        self.configure(ctx)
+        if not self.enabled:
+            return {}
+        await self._ensure_loaded()
+
+        result = {}
+        for address in token_addresses:
+            if (price := self._prices.get(_token_key(address))) is not None:
+                result[address] = price
+        return result
+
+    async def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+
+        self._edges.clear()
+        self._adjacency.clear()
+        rows = await Pair.all().values('address', 'token0_address', 'token1_address', 'reserve0', 'reserve1')
+        for row in rows:
+            edge = Edge(
+                _token_key(row['token0_address']),
+                _token_key(row['token1_address']),
+                Decimal(row['reserve0']),
+                Decimal(row['reserve1']),
+            )
+            self._add_edge(row['address'], edge)
+
+        self._prices = {}
+        self._rebuild()
+        self._loaded = True
+        _logger.info('Price oracle loaded: %s pairs, %s priced tokens', len(self._edges), len(self._prices))
+
+    def _add_edge(self, address: str, edge: Edge) -> None:
+        self._edges[address] = edge
+        self._adjacency[edge.token0].add(address)
+        self._adjacency[edge.token1].add(address)
+
+    def _rebuild(self) -> set[int]:
+        """Recompute hop layers and all prices. Returns tokens whose price changed."""
+        previous = self._prices
+        self._prices = dict.fromkeys(self._anchors, Decimal(1))
+        self._layers = dict.fromkeys(self._anchors, 0)
+
+        frontier = list(self._anchors)
+        for hop in range(1, self._max_hops + 1):
+            layer = set()
+            for token in frontier:
+                for address in self._adjacency.get(token, ()):
+                    other = self._other(address, token)
+                    if other not in self._layers and self._qualifies(address, token):
+                        layer.add(other)
+
+            self._layers.update(dict.fromkeys(layer, hop))
+            for token in layer:
+                if (price := self._compute(token)) is not None:
+                    self._prices[token] = price
+            frontier = [token for token in layer if token in self._prices]
+
+        self._qualified = {
+            (address, token)
+            for token in self._prices
+            for address in self._adjacency.get(token, ())
+            if self._qualifies(address, token)
+        }
+        _priced_tokens.set(len(self._prices))
+        return {token for token in previous.keys() | self._prices.keys() if previous.get(token) != self._prices.get(token)}
+
+    def _propagate(self, seeds: set[int]) -> set[int] | None:
+        """Recompute prices downstream of changed tokens. Returns tokens whose price changed.
+
+        Returns `None` when a route started or stopped qualifying and layers must be rebuilt.
+        """
+        heap = [(self._layers[token], token) for token in seeds if token in self._layers]
+        heapq.heapify(heap)
+        queued = {token for _, token in heap}
+        changed = set()
+
+        while heap:
+            layer, token = heapq.heappop(heap)
+            price = self._compute(token)
+            if price == self._prices.get(token):
+                continue
+
+            changed.add(token)
+            if price is None:
+                del self._prices[token]
+            else:
+                self._prices[token] = price
+
+            # NOTE: Tokens depend only on neighbours in lower layers; push the ones above
+            for address in self._adjacency[token]:
+                other = self._other(address, token)
+                if other not in queued and self._layers.get(other, -1) > layer:
+                    queued.add(other)
+                    heapq.heappush(heap, (self._layers[other], other))
+
+        for token in changed | seeds:
+            for address in self._adjacency.get(token, ()):
+                if ((address, token) in self._qualified) != self._qualifies(address, token):
+                    return None
+
+        _priced_tokens.set(len(self._prices))
+        return changed
+
+    def _compute(self, token: int) -> Decimal | None:
+        if token in self._anchors:
+            return Decimal(1)
+
+        layer = self._layers[token]
+        weighted, depth_total = Decimal(0), Decimal(0)
+        for address in self._adjacency[token]:
+            other = self._other(address, token)
+            if self._layers.get(other, layer) >= layer:
+                continue
+            if (depth := self._depth(address, other)) is None or depth < self._min_liquidity:
+                continue
+
+            reserve = self._reserve(address, token)
+            price = depth / (reserve / self._scale(token))
+            weighted += price * depth
+            depth_total += depth
+
+        return weighted / depth_total if depth_total else None
+
+    def _qualifies(self, address: str, token: int) -> bool:
+        """Whether `token` side of the pair is deep enough to price the other side."""
+        depth = self._depth(address, token)
+        return depth is not None and depth >= self._min_liquidity
+
+    def _depth(self, address: str, token: int) -> Decimal | None:
+        """USD value of `token` reserve of the pair."""
+        edge = self._edges[address]
+        if not edge.alive or (price := self._prices.get(token)) is None:
+            return None
+        return self._reserve(address, token) / self._scale(token) * price
+
+    def _other(self, address: str, token: int) -> int:
+        edge = self._edges[address]
+        return edge.token1 if edge.token0 == token else edge.token0
+
+    def _reserve(self, address: str, token: int) -> Decimal:
+        edge = self._edges[address]
+        return edge.reserve0 if edge.token0 == token else edge.reserve1
+
+    def _scale(self, token: int) -> Decimal:
+        return Decimal(10) ** self._decimals.get(token, self._default_decimals)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            'mode': self.mode,
+            'pairs': len(self._edges),
+            'tokens': len(self._adjacency),
+            'priced': len(self._prices),
+        }
+
+
+price_oracle = PriceOracle()
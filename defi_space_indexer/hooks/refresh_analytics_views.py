@@ -0,0 +1,16 @@
+from dipdup.context import HookContext
+from dipdup.models import Index
+from dipdup.models import IndexStatus
+from defi_space_indexer.hooks import analytics_views
+
+
+async def refresh_analytics_views(
+    ctx: HookContext,
+) -> None:
+    """Refresh analytics materialized views once indexes are realtime.
+
+    `on_synchronized` refreshes them when the indexer reaches head; this keeps them fresh afterward.
+    """
+    if await Index.filter(status__in=(IndexStatus.new, IndexStatus.syncing)).exists():
+        return
+    await analytics_views.refresh_analytics_views(ctx)
@@ -0,0 +1,260 @@
+import logging
+import time
+from collections.abc import Sequence
+from decimal import Decimal
+from typing import Any
+
+import numpy as np
+from numpy.typing import NDArray
+from dipdup.context import HookContext
+from dipdup.database import AsyncpgClient
+from dipdup.database import get_connection
+from dipdup.prometheus import Histogram
+from defi_space_indexer.models.farming_models import RewardSchedule
+from defi_space_indexer.models.farming_models import UserRewardState
+from defi_space_indexer.models.felt import felt
+from defi_space_indexer.models.upsert import update
+from defi_space_indexer.models.upsert import upsert
+from defi_space_indexer.hooks.calculate_amm_metrics import get_prices
+from defi_space_indexer.hooks.price_oracle import price_oracle
+
+PRECISION = 10**18  # Fixed-point scale of reward per token
+SECONDS_PER_YEAR = 365 * 24 * 60 * 60
+
+_logger = logging.getLogger(__name__)
+
+_duration = Histogram('defi_space_reward_engine_duration_seconds', 'Duration of reward engine passes', ['stage'])
+
+# NOTE: u256 columns are read as float64 (~15 significant digits). The stored-minus-paid difference is taken
+# in SQL before the cast, so a user's earned amount is precise relative to itself, not to the cumulative
+# reward per token of the reactor.
+REACTORS_SQL = """
+SELECT address, COALESCE(tvl_usd, 0)
+FROM reactor
+ORDER BY address
+"""
+
+SCHEDULES_SQL = """
+SELECT
+    schedule.id,
+    schedule.reactor_address,
+    schedule.reward_token,
+    CAST(schedule.reward_rate AS DOUBLE PRECISION),
+    schedule.period_finish,
+    schedule.last_update_time,
+    CAST(reactor.total_staked AS DOUBLE PRECISION)
+FROM reward_schedule AS schedule
+JOIN reactor ON reactor.address = schedule.reactor_address
+ORDER BY schedule.id
+"""
+
+# NOTE: Reward states are created by the first deposit of a stake (see `update_reward`), so every stake
+# NOTE: that has been checkpointed for a reward token has one.
+STATES_SQL = """
+SELECT
+    state.id,
+    schedule.id,
+    CAST(stake.staked_amount AS DOUBLE PRECISION),
+    CAST(schedule.reward_per_token_stored - state.reward_per_token_paid AS DOUBLE PRECISION),
+    CAST(state.rewards AS DOUBLE PRECISION),
+    CAST(state.earned AS DOUBLE PRECISION)
+FROM user_reward_state AS state
+JOIN user_stake AS stake ON stake.id = state.stake_id
+JOIN reward_schedule AS schedule
+    ON schedule.reactor_address = state.reactor_address AND schedule.reward_token = state.reward_token
+"""
+
+UPDATE_EARNED_SQL = 'UPDATE user_reward_state SET earned = {} WHERE id = {}'
+UPDATE_APR_SQL = 'UPDATE reactor SET apr = {} WHERE address = {}'
+
+
+def get_columns(rows: Sequence[Sequence[Any]], dtypes: Sequence[Any]) -> list[NDArray[Any]]:
+    """Transpose query rows into one array per column."""
+    if not rows:
+        return [np.empty(0, dtype=dtype) for dtype in dtypes]
+    # NOTE: Felts must stay `object`; fixed-width bytes arrays strip trailing zero bytes
+    return [np.asarray(column, dtype=dtype) for column, dtype in zip(zip(*rows, strict=True), dtypes, strict=True)]
+
+
+def get_reward_per_token_accrued(
+    reward_rate: NDArray[np.float64],
+    period_finish: NDArray[np.int64],
+    last_update_time: NDArray[np.int64],
+    total_staked: NDArray[np.float64],
+    now: int,
+) -> NDArray[np.float64]:
+    """Reward per staked token accrued by each schedule since its `reward_per_token_stored` checkpoint."""
+    # NOTE: Contract's `last_time_reward_applicable`; streams stop accruing at `period_finish`
+    elapsed = np.clip(np.minimum(period_finish, now) - last_update_time, 0, None)
+    accrued = np.zeros(len(reward_rate))
+    staked = total_staked > 0
+    accrued[staked] = elapsed[staked] * reward_rate[staked] * PRECISION / total_staked[staked]
+    return accrued
+
+
+def get_earned(
+    staked_amount: NDArray[np.float64],
+    unpaid_per_token: NDArray[np.float64],
+    rewards: NDArray[np.float64],
+    accrued_per_token: NDArray[np.float64],
+) -> NDArray[np.float64]:
+    """Contract's `earned()`: `rewards + staked * (reward per token now - reward per token paid) / 1e18`."""
+    earned = rewards + staked_amount * (unpaid_per_token + accrued_per_token) / PRECISION
+    return np.floor(np.maximum(earned, 0))
+
+
+def get_reward_apr(
+    reactor_index: NDArray[np.intp],
+    yearly_usd: NDArray[np.float64],
+    tvl_usd: NDArray[np.float64],
+) -> NDArray[np.float64]:
+    """Annualized value of reward streams relative to the TVL of their reactor."""
+    totals = np.bincount(reactor_index, weights=yearly_usd, minlength=len(tvl_usd))
+    return np.divide(totals, tvl_usd, out=np.zeros(len(tvl_usd)), where=tvl_usd > 0)
+
+
+def to_numeric(value: float, postgres: bool, places: int = 0) -> Decimal | str:
+    """Parameter for a raw `DecimalField` write; SQLite stores decimals as text."""
+    text = f'{value:.{places}f}'
+    return Decimal(text) if postgres else text
+
+
+def get_reward_per_token(schedule: RewardSchedule, total_staked: int, now: int) -> int:
+    """Contract's `reward_per_token()` in exact integer math; `total_staked` is the reactor's at `now`."""
+    elapsed = min(schedule.period_finish, now) - schedule.last_update_time
+    stored = int(schedule.reward_per_token_stored)
+    if elapsed <= 0 or total_staked <= 0:
+        return stored
+    return stored + int(schedule.reward_rate) * elapsed * PRECISION // total_staked
+
+
+async def update_reward(
+    reactor_address: str,
+    stake_id: int,
+    user_address: str,
+    staked_amount: int,
+    total_staked: int,
+    timestamp: int,
+) -> None:
+    """Contract's `update_reward` for a stake change: checkpoint every reward stream of the reactor.
+
+    `staked_amount` and `total_staked` are the user's and the reactor's stake before the change.
+    """
+    states = {state.reward_token: state for state in await UserRewardState.filter(stake_id=stake_id)}
+    for schedule in await RewardSchedule.filter(reactor_address=reactor_address):
+        reward_per_token = get_reward_per_token(schedule, total_staked, timestamp)
+        # NOTE: A stake without state is either new, with nothing staked before, or older than the stream
+        state = states.get(schedule.reward_token)
+        paid = int(state.reward_per_token_paid) if state else 0
+        rewards = int(state.rewards) if state else 0
+        rewards += staked_amount * (reward_per_token - paid) // PRECISION
+
+        await update(
+            RewardSchedule,
+            keys={
+                'reactor_address': reactor_address,
+                'reward_token': schedule.reward_token,
+            },
+            values={
+                'reward_per_token_stored': Decimal(reward_per_token),
+                'last_update_time': min(timestamp, schedule.period_finish),
+                'updated_at': timestamp,
+            },
+        )
+        await upsert(
+            UserRewardState,
+            keys={
+                'stake_id': stake_id,
+                'reward_token': schedule.reward_token,
+            },
+            values={
+                'reward_per_token_paid': Decimal(reward_per_token),
+                'rewards': Decimal(rewards),
+                'earned': Decimal(rewards),
+                'updated_at': timestamp,
+            },
+            defaults={
+                'reactor_address': reactor_address,
+                'user_address': user_address,
+            },
+        )
+
+
+async def update_rewards(ctx: HookContext, now: int | None = None) -> tuple[int, int]:
+    """Compute `earned` of every stake and reward stream and APR of every reactor in one pass.
+
+    Returns the number of reward states written and reactors updated.
+    """
+    now = int(time.time()) if now is None else now
+    conn = get_connection()
+    postgres = isinstance(conn, AsyncpgClient)
+    params = ['$1', '$2'] if postgres else ['?', '?']
+
+    started_at = time.perf_counter()
+    _, reactor_rows = await conn.execute_query(REACTORS_SQL)
+    _, schedule_rows = await conn.execute_query(SCHEDULES_SQL)
+    _, state_rows = await conn.execute_query(STATES_SQL)
+    _duration['load'] += time.perf_counter() - started_at
+
+    reactor_addresses, tvl_usd = get_columns(reactor_rows, (object, np.float64))
+    (
+        schedule_ids,
+        schedule_reactors,
+        schedule_tokens,
+        reward_rate,
+        period_finish,
+        last_update_time,
+        total_staked,
+    ) = get_columns(schedule_rows, (np.int64, object, object, np.float64, np.int64, np.int64, np.float64))
+    state_ids, state_schedules, staked_amount, unpaid_per_token, rewards, current_earned = get_columns(
+        state_rows,
+        (np.int64, np.int64, np.float64, np.float64, np.float64, np.float64),
+    )
+
+    # NOTE: Per-schedule lookups only; schedules number in the hundreds, states in the tens of thousands
+    reward_tokens = [felt(int.from_bytes(token, 'big')) for token in schedule_tokens]
+    prices = await get_prices(ctx, set(reward_tokens))
+
+    started_at = time.perf_counter()
+    reactor_positions = {address: i for i, address in enumerate(reactor_addresses)}
+    reactor_index = np.asarray([reactor_positions[address] for address in schedule_reactors], dtype=np.intp)
+    token_scale = np.asarray([10.0 ** price_oracle.decimals(token) for token in reward_tokens], dtype=np.float64)
+    token_price = np.asarray([float(prices.get(token, 0)) for token in reward_tokens], dtype=np.float64)
+
+    accrued = get_reward_per_token_accrued(reward_rate, period_finish, last_update_time, total_staked, now)
+    active = period_finish > now
+    yearly_usd = np.where(active, reward_rate / token_scale * SECONDS_PER_YEAR * token_price, 0.0)
+    apr = get_reward_apr(reactor_index, yearly_usd, tvl_usd)
+
+    # NOTE: Schedules are ordered by id, so each state finds its schedule by binary search
+    schedule_index = np.searchsorted(schedule_ids, state_schedules)
+    earned = get_earned(staked_amount, unpaid_per_token, rewards, accrued[schedule_index])
+    _duration['compute'] += time.perf_counter() - started_at
+
+    # NOTE: Derived columns; not journaled for rollback since the next pass recomputes them from reverted rows
+    started_at = time.perf_counter()
+    changed = earned != current_earned
+    earned_values = [
+        [to_numeric(value, postgres), state_id]
+        for value, state_id in zip(earned[changed].tolist(), state_ids[changed].tolist(), strict=True)
+    ]
+    if earned_values:
+        await conn.execute_many(UPDATE_EARNED_SQL.format(*params), earned_values)
+
+    apr_values = [
+        [to_numeric(value, postgres, 18), address]
+        for value, address in zip(apr.tolist(), reactor_addresses.tolist(), strict=True)
+    ]
+    if apr_values:
+        await conn.execute_many(UPDATE_APR_SQL.format(*params), apr_values)
+    _duration['write'] += time.perf_counter() - started_at
+
+    _logger.info(
+        'Reward pass at %s: %s schedules, %s of %s states updated, %s reactors',
+        now,
+        len(schedule_ids),
+        len(earned_values),
+        len(state_ids),
+        len(apr_values),
+    )
+    return len(earned_values), len(apr_values)
@@ -0,0 +1,77 @@
+from decimal import Decimal
+from typing import Any, NamedTuple
+
+BUCKET_SIZE = 60 * 60
+WINDOW_SIZE = 24 * 60 * 60
+# NOTE: Pair contracts charge 0.3% of the input amount
+FEE_NUMERATOR = 3
+FEE_DENOMINATOR = 1000
+
+
+class Bucket(NamedTuple):
+    start: int
+    volume0: Decimal
+    volume1: Decimal
+    fees0: Decimal
+    fees1: Decimal
+
+
+def swap_fee(amount_in: int) -> int:
+    return amount_in * FEE_NUMERATOR // FEE_DENOMINATOR
+
+
+class VolumeWindow:
+    """
+    Rolling 24h swap volume and fees of a pair, kept in hourly buckets.
+
+    State lives in `Pair.volume_buckets` as `[start, volume0, volume1, fees0, fees1]`
+    lists (amounts as strings, in token units), so it's restored on restart and
+    reverted with the pair on rollback. Swaps update the current bucket; buckets fully
+    outside of the window are dropped as block timestamps move forward. Totals are
+    computed from at most 25 buckets, never from `SwapEvent` rows.
+
+    Volume counts both sides of a swap (`amount_in + amount_out`); fees are taken
+    from `amount_in` only.
+    """
+
+    def __init__(self, buckets: list[list[Any]] | None) -> None:
+        self._buckets = [
+            Bucket(int(start), *(Decimal(value) for value in values))
+            for start, *values in buckets or ()
+        ]
+
+    def add(
+        self,
+        timestamp: int,
+        amount0_in: int,
+        amount1_in: int,
+        amount0_out: int,
+        amount1_out: int,
+    ) -> tuple[int, int]:
+        """Account swap in the window. Returns fees taken in token0 and token1."""
+        fees0, fees1 = swap_fee(amount0_in), swap_fee(amount1_in)
+        start = timestamp - timestamp % BUCKET_SIZE
+        swap = Bucket(start, Decimal(amount0_in + amount0_out), Decimal(amount1_in + amount1_out), Decimal(fees0), Decimal(fees1))
+
+        if self._buckets and self._buckets[-1].start == start:
+            last = self._buckets[-1]
+            self._buckets[-1] = Bucket(start, *(a + b for a, b in zip(last[1:], swap[1:], strict=True)))
+        else:
+            # NOTE: Events of a pair arrive in order; a new bucket is always the latest one
+            self._buckets.append(swap)
+
+        self.expire(timestamp)
+        return fees0, fees1
+
+    def expire(self, timestamp: int) -> None:
+        """Drop buckets that ended before the window starting at `timestamp - 24h`."""
+        threshold = timestamp - WINDOW_SIZE
+        self._buckets = [bucket for bucket in self._buckets if bucket.start + BUCKET_SIZE > threshold]
+
+    def totals(self) -> Bucket:
+        """Volume and fees summed over the window."""
+        sums = [sum(values, Decimal(0)) for values in zip(*(bucket[1:] for bucket in self._buckets), strict=True)]
+        return Bucket(self._buckets[0].start if self._buckets else 0, *(sums or [Decimal(0)] * 4))
+
+    def dump(self) -> list[list[Any]]:
+        return [[bucket.start, *(str(value) for value in bucket[1:])] for bucket in self._buckets]
@@ -9,6 +9,8 @@ from defi_space_indexer.models.amm_models import (
     # Event Models
     LiquidityEvent,
     SwapEvent,
+    # Aggregated Models
+    PairCandle,
 )
 
 from defi_space_indexer.models.farming_models import (
@@ -16,11 +18,23 @@ from defi_space_indexer.models.farming_models import (
     Powerplant,
     Reactor,
     UserStake,
+    RewardSchedule,
+    UserRewardState,
     # Event Models
     StakeEvent,
     RewardEvent,
 )
 
+from defi_space_indexer.models.config_models import (
+    # History Models
+    ConfigChange,
+)
+
+from defi_space_indexer.models.rollup_models import (
+    # Aggregated Models
+    EventRollup,
+)
+
 __all__ = [
     # AMM Core Models
     'Factory',
@@ -31,12 +45,23 @@ __all__ = [
     'LiquidityEvent',
     'SwapEvent',
     
+    # AMM Aggregated Models
+    'PairCandle',
+    
     # Farming Core Models
     'Powerplant',
     'Reactor',
     'UserStake',
+    'RewardSchedule',
+    'UserRewardState',
     
     # Farming Event Models
     'StakeEvent',
     'RewardEvent',
+    
+    # Config History Models
+    'ConfigChange',
+    
+    # Event Rollup Models
+    'EventRollup',
 ]
@@ -1,5 +1,6 @@
 from dipdup import fields
 from dipdup.models import Model
+from defi_space_indexer.models.felt import FeltField
 from enum import Enum
 
 
@@ -15,19 +16,18 @@ class Factory(Model):
     - Maintains ownership and administrative settings
     
     Historical tracking:
-    - Stores configuration changes in config_history
+    - Configuration changes are recorded in ConfigChange
     - Tracks ownership transfers
     - Records fee receiver updates
     """
-    address = fields.TextField(primary_key=True)  # ContractAddress
+    address = FeltField(primary_key=True)  # ContractAddress
     num_of_pairs = fields.IntField()
     total_value_locked_usd = fields.BigIntField(null=True)  # Derived from pair TVLs
     
-    # Config with history
-    owner = fields.TextField()  # Current owner
-    fee_to = fields.TextField()  # Current fee receiver
-    pair_contract_class_hash = fields.TextField()  # Current implementation
-    config_history = fields.JSONField()  # List of {field, old_value, new_value, timestamp}
+    # Current config (changes are recorded in ConfigChange)
+    owner = FeltField()  # Current owner
+    fee_to = FeltField()  # Current fee receiver
+    pair_contract_class_hash = FeltField()  # Current implementation
     
     created_at = fields.BigIntField()
     updated_at = fields.BigIntField()
@@ -54,12 +54,12 @@ class Pair(Model):
     - Has many LiquidityPositions
     - Can be used in farming Reactors
     """
-    address = fields.TextField(primary_key=True)  # ContractAddress
+    address = FeltField(primary_key=True)  # ContractAddress
     
     # Creation data (from PairCreatedEvent)
-    factory_address = fields.TextField()
-    token0_address = fields.TextField()
-    token1_address = fields.TextField()
+    factory_address = FeltField()
+    token0_address = FeltField()
+    token1_address = FeltField()
     
     # Current state
     reserve0 = fields.DecimalField(max_digits=100, decimal_places=0)
@@ -73,13 +73,14 @@ class Pair(Model):
     block_timestamp_last = fields.BigIntField()
     
     # Derived Metrics
-    token0_price = fields.BigIntField(null=True)
-    token1_price = fields.BigIntField(null=True)
+    token0_price = fields.DecimalField(max_digits=100, decimal_places=18, null=True)  # USD per whole token
+    token1_price = fields.DecimalField(max_digits=100, decimal_places=18, null=True)  # USD per whole token
     volume_24h = fields.BigIntField(null=True)
     tvl_usd = fields.BigIntField(null=True)
-    apy_24h = fields.BigIntField(null=True)
-    accumulated_fees_token0 = fields.BigIntField(null=True)
-    accumulated_fees_token1 = fields.BigIntField(null=True)
+    apy_24h = fields.DecimalField(max_digits=100, decimal_places=18, null=True)  # Fraction, 0.1 = 10%
+    accumulated_fees_token0 = fields.DecimalField(max_digits=100, decimal_places=0, null=True)  # All-time swap fees
+    accumulated_fees_token1 = fields.DecimalField(max_digits=100, decimal_places=0, null=True)  # All-time swap fees
+    volume_buckets = fields.JSONField(null=True)  # Rolling 24h window: [[start, volume0, volume1, fees0, fees1], ...]
 
     created_at = fields.BigIntField()
     updated_at = fields.BigIntField()
@@ -111,8 +112,8 @@ class LiquidityPosition(Model):
     - Sync events (reserve updates)
     """
     id = fields.IntField(primary_key=True)
-    pair_address = fields.TextField()  # ContractAddress
-    user_address = fields.TextField()  # ContractAddress
+    pair_address = FeltField()  # ContractAddress
+    user_address = FeltField()  # ContractAddress
     
     # Current Position State
     liquidity = fields.DecimalField(max_digits=100, decimal_places=0)  # Current LP token balance
@@ -136,6 +137,9 @@ class LiquidityPosition(Model):
         'models.Pair', related_name='liquidity_positions'
     )
 
+    class Meta:
+        unique_together = (('pair_address', 'user_address'),)
+
 
 class LiquidityEventType(Enum):
     MINT = "MINT"
@@ -163,11 +167,11 @@ class LiquidityEvent(Model):
     - Position updates
     """
     id = fields.IntField(primary_key=True)
-    transaction_hash = fields.TextField()
+    transaction_hash = FeltField()
     created_at = fields.BigIntField()
     
     event_type = fields.EnumField(LiquidityEventType)
-    sender = fields.TextField()
+    sender = FeltField()
     amount0 = fields.DecimalField(max_digits=100, decimal_places=0)
     amount1 = fields.DecimalField(max_digits=100, decimal_places=0)
     liquidity = fields.DecimalField(max_digits=100, decimal_places=0)
@@ -180,6 +184,9 @@ class LiquidityEvent(Model):
         'models.LiquidityPosition', related_name='events'
     )
 
+    class Meta:
+        indexes = (('pair_id', 'created_at'),)
+
 class SwapEvent(Model):
     """
     Records individual swap events.
@@ -202,10 +209,10 @@ class SwapEvent(Model):
     - Market analysis
     """
     id = fields.IntField(primary_key=True)
-    transaction_hash = fields.TextField()
+    transaction_hash = FeltField()
     created_at = fields.BigIntField()
     
-    sender = fields.TextField()
+    sender = FeltField()
     amount0_in = fields.DecimalField(max_digits=100, decimal_places=0)
     amount1_in = fields.DecimalField(max_digits=100, decimal_places=0)
     amount0_out = fields.DecimalField(max_digits=100, decimal_places=0)
@@ -215,4 +222,54 @@ class SwapEvent(Model):
     # Relationships
     pair: fields.ForeignKeyField[Pair] = fields.ForeignKeyField(
         'models.Pair', related_name='swaps'
-    )
\ No newline at end of file
+    )
+
+    class Meta:
+        indexes = (('pair_id', 'created_at'),)
+
+
+class CandleResolution(Enum):
+    MINUTE = "1m"
+    FIVE_MINUTES = "5m"
+    HOUR = "1h"
+    DAY = "1d"
+
+class PairCandle(Model):
+    """
+    OHLCV candle of a pair at a fixed resolution.
+    Maintained incrementally by Swap and Sync handlers; the current bucket is updated in place.
+    
+    Key responsibilities:
+    - Tracks token0 price in token1 (adjusted for decimals) from reserves
+    - Accumulates swap volume and trade count per bucket
+    - Serves chart range reads without aggregating SwapEvent rows
+    
+    Differs from SwapEvent:
+    - Stores aggregated buckets vs individual trades
+    - Includes Sync price moves vs swaps only
+    
+    Used for:
+    - Price charts
+    - Volume history
+    """
+    id = fields.TextField(primary_key=True)  # {pair_address}:{resolution}:{start}
+    resolution = fields.EnumField(CandleResolution)
+    start = fields.BigIntField()  # Bucket start timestamp
+    
+    open = fields.DecimalField(max_digits=100, decimal_places=18)
+    high = fields.DecimalField(max_digits=100, decimal_places=18)
+    low = fields.DecimalField(max_digits=100, decimal_places=18)
+    close = fields.DecimalField(max_digits=100, decimal_places=18)
+    volume0 = fields.DecimalField(max_digits=100, decimal_places=0)  # amount0_in + amount0_out
+    volume1 = fields.DecimalField(max_digits=100, decimal_places=0)  # amount1_in + amount1_out
+    trades = fields.IntField()
+    
+    updated_at = fields.BigIntField()
+    
+    # Relationships
+    pair: fields.ForeignKeyField[Pair] = fields.ForeignKeyField(
+        'models.Pair', related_name='candles'
+    )
+
+    class Meta:
+        indexes = (('pair_id', 'resolution', 'start'),)
@@ -0,0 +1,58 @@
+from collections import defaultdict
+
+from dipdup import models as dipdup_models
+from dipdup.context import HandlerContext
+from dipdup.models import Model
+
+from defi_space_indexer.models.cache import index_name
+
+BULK_BATCH_SIZE = 1000
+
+
+class EventBuffer:
+    """
+    Collects append-only event rows created by handlers of a level.
+
+    Rows are grouped by model and inserted with one `bulk_create` per model when the
+    `batch` handler reaches the level boundary, instead of one INSERT per event.
+
+    Nothing may reference buffered rows by primary key before the flush; only leaf
+    event tables (swaps, liquidity, stake and reward events, config changes) should go through here.
+    """
+
+    def __init__(self) -> None:
+        self._rows: defaultdict[str, defaultdict[type[Model], list[Model]]] = defaultdict(
+            lambda: defaultdict(list)
+        )
+
+    def add(self, ctx: HandlerContext, row: Model) -> None:
+        """Queue a new row to be inserted at the end of the current level."""
+        self._rows[index_name(ctx)][type(row)].append(row)
+
+    async def flush(self, ctx: HandlerContext) -> int:
+        """Insert rows queued by the index of `ctx`. Returns number of rows written."""
+        rows = self._rows.pop(index_name(ctx), None)
+        if not rows:
+            return 0
+
+        # NOTE: Near the head levels are versioned. Bulk inserts don't return autoincrement PKs,
+        # NOTE: and the rollback journal needs them, so fall back to plain saves there.
+        versioned = dipdup_models.get_transaction() is not None
+
+        written = 0
+        for model, items in rows.items():
+            if versioned:
+                for item in items:
+                    await item.save()
+            else:
+                await model.bulk_create(items, batch_size=BULK_BATCH_SIZE)
+            written += len(items)
+
+        return written
+
+    def discard(self, index: str) -> None:
+        """Drop rows queued by a level that failed."""
+        self._rows.pop(index, None)
+
+
+event_buffer = EventBuffer()
@@ -0,0 +1,123 @@
+from collections import defaultdict
+
+from dipdup.context import HandlerContext
+from dipdup.models import Model
+from dipdup.performance import caches
+
+from defi_space_indexer.models.amm_models import Factory, Pair, PairCandle
+from defi_space_indexer.models.felt import felt, is_felt_field
+
+
+def index_name(ctx: HandlerContext) -> str:
+    """Name of the index the handler is fired for."""
+    return ctx.handler_config.parent.name
+
+
+class ModelCache[ModelT: Model]:
+    """
+    Identity map with write-behind for hot rows shared by many handlers.
+
+    Handlers of a level get the same in-memory instance for a primary key instead of
+    fetching the row for every event. Changed rows are staged per index and written once,
+    with only the changed columns, when the `batch` handler reaches the level boundary.
+    Rows created in memory and staged are inserted in full.
+
+    Staging is tracked per index because indexes are processed concurrently: every index
+    flushes only the rows it changed, inside its own level transaction, so rollback
+    journal entries are recorded against the right index.
+    """
+
+    def __init__(self, model: type[ModelT]) -> None:
+        self._model = model
+        # NOTE: Handlers pass `from_address` as formatted by the datasource; key rows by canonical form
+        self._normalize = felt if is_felt_field(model._meta.fields_map[model._meta.pk_attr]) else str
+        self._items: dict[str, ModelT] = {}
+        self._staged: defaultdict[str, set[str]] = defaultdict(set)
+        caches.add_plain(self._items, f'{model.__name__}:identity_map')
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    async def get(self, pk: str) -> ModelT | None:
+        """Get row from memory, loading it from the database on first access."""
+        pk = self._normalize(pk)
+        if (item := self._items.get(pk)) is not None:
+            return item
+
+        item = await self._model.get_or_none(pk=pk)
+        if item is not None:
+            self._items[pk] = item
+        return item
+
+    def add(self, item: ModelT) -> None:
+        """Track a row that was just created and saved by a handler."""
+        self._items[item.pk] = item
+
+    def evict(self, pk: str) -> None:
+        """Forget a row that won't be changed anymore, unless it's waiting for a flush."""
+        pk = self._normalize(pk)
+        if not any(pk in staged for staged in self._staged.values()):
+            self._items.pop(pk, None)
+
+    def is_staged(self, ctx: HandlerContext, pk: str) -> bool:
+        """Whether the row is waiting for a flush of the index of `ctx`."""
+        return self._normalize(pk) in self._staged.get(index_name(ctx), ())
+
+    def stage(self, ctx: HandlerContext, item: ModelT) -> None:
+        """Mark row as changed; it will be saved at the end of the current level."""
+        self._items[item.pk] = item
+        self._staged[index_name(ctx)].add(item.pk)
+
+    async def flush(self, ctx: HandlerContext) -> int:
+        """Save rows staged by the index of `ctx`. Returns number of rows written."""
+        written = 0
+        for pk in self._staged.pop(index_name(ctx), ()):
+            item = self._items[pk]
+            if not item._saved_in_db:
+                await item.save()
+            elif changed := [field for field in item.versioned_data_diff if field in item._meta.fields_map]:
+                await item.save(update_fields=changed)
+            else:
+                continue
+
+            # NOTE: DipDup diffs against the state the instance was loaded with. Cached instances live
+            # NOTE: across levels, so move the baseline forward or rollback data would point to the first load.
+            item._original_versioned_data = item.versioned_data
+            written += 1
+
+        return written
+
+    def invalidate(self, index: str | None = None) -> None:
+        """Drop cached rows after a rollback or a failed level.
+
+        Rows staged by other indexes are kept; they have not been written yet and belong to
+        levels that are still being processed.
+        """
+        if index is None:
+            self._staged.clear()
+        else:
+            self._staged.pop(index, None)
+
+        pending = set().union(*self._staged.values())
+        for pk in tuple(self._items):
+            if pk not in pending:
+                del self._items[pk]
+
+
+pair_cache: ModelCache[Pair] = ModelCache(Pair)
+factory_cache: ModelCache[Factory] = ModelCache(Factory)
+candle_cache: ModelCache[PairCandle] = ModelCache(PairCandle)
+
+
+async def flush_level(ctx: HandlerContext) -> None:
+    """Write all rows staged by handlers of the current level."""
+    await pair_cache.flush(ctx)
+    await factory_cache.flush(ctx)
+    await candle_cache.flush(ctx)
+
+
+def invalidate(index: str | None = None) -> None:
+    """Invalidate all identity maps."""
+    pair_cache.invalidate(index)
+    factory_cache.invalidate(index)
+    candle_cache.invalidate(index)
@@ -0,0 +1,42 @@
+from dipdup import fields
+from dipdup.models import Model
+from defi_space_indexer.models.felt import FeltField
+from enum import Enum
+
+
+class ConfigEntityType(Enum):
+    FACTORY = "FACTORY"
+    POWERPLANT = "POWERPLANT"
+    REACTOR = "REACTOR"
+
+class ConfigChange(Model):
+    """
+    Records a change of a protocol contract's configuration.
+    Append-only history behind the current-config columns of Factory, Powerplant and Reactor.
+
+    Key responsibilities:
+    - Records ownership transfers
+    - Records fee and penalty receiver updates
+    - Records implementation (class hash) upgrades
+
+    Differs from config columns:
+    - Stores every change vs latest value
+    - Written once vs updated in place
+
+    Used for:
+    - Configuration audit trail
+    - Reconstructing config at a given level
+    """
+    id = fields.IntField(primary_key=True)
+    transaction_hash = FeltField()
+    level = fields.BigIntField()
+    created_at = fields.BigIntField()
+
+    entity_type = fields.EnumField(ConfigEntityType)
+    entity_address = FeltField()  # ContractAddress
+    field = fields.TextField()  # Name of the changed config column
+    old_value = fields.TextField(null=True)
+    new_value = fields.TextField(null=True)
+
+    class Meta:
+        indexes = (('entity_address', 'level'),)
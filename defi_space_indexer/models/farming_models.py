@@ -1,5 +1,6 @@
 from dipdup import fields
 from dipdup.models import Model
+from defi_space_indexer.models.felt import FeltField
 from enum import Enum
 
 class Powerplant(Model):
@@ -14,7 +15,7 @@ class Powerplant(Model):
     - Manages ownership and permissions
     
     Historical tracking:
-    - Stores configuration changes in config_history
+    - Configuration changes are recorded in ConfigChange
     - Tracks ownership transfers
     - Records reactor implementations
     
@@ -23,15 +24,14 @@ class Powerplant(Model):
     - Creates reactors vs trading pairs
     - Focuses on staking vs swapping
     """
-    address = fields.TextField(primary_key=True)  # ContractAddress
+    address = FeltField(primary_key=True)  # ContractAddress
     
     reactor_count = fields.BigIntField()
     total_value_locked_usd = fields.BigIntField(null=True)  # Derived from reactor TVLs
     
-    # Config with history
-    owner = fields.TextField()
-    reactor_class_hash = fields.TextField()
-    config_history = fields.JSONField()  # List of {field, old_value, new_value, timestamp}
+    # Current config (changes are recorded in ConfigChange)
+    owner = FeltField()
+    reactor_class_hash = FeltField()
     
     created_at = fields.BigIntField()
     updated_at = fields.BigIntField()
@@ -56,33 +56,33 @@ class Reactor(Model):
     Relationships:
     - Created by and linked to Powerplant
     - Has many UserStakes
-    - Distributes multiple reward tokens
+    - Distributes multiple reward tokens (RewardSchedules)
     """
-    address = fields.TextField(primary_key=True)  # ContractAddress
+    address = FeltField(primary_key=True)  # ContractAddress
     
     # Creation data (from ReactorCreatedEvent)
-    powerplant_address = fields.TextField()
-    lp_token_address = fields.TextField()
+    powerplant_address = FeltField()
+    lp_token_address = FeltField()
     reactor_index = fields.IntField()
     
     # Current state
-    owner = fields.TextField()
+    owner = FeltField()
     total_staked = fields.DecimalField(max_digits=100, decimal_places=0)
     multiplier = fields.BigIntField()
     locked = fields.BooleanField()
     
+    # Metrics (TVL by `calculate_farming_metrics`, APR by `calculate_reward_metrics`)
+    tvl_usd = fields.BigIntField(null=True)
+    apr = fields.DecimalField(max_digits=100, decimal_places=18, null=True)  # Fraction, 0.1 = 10%
+    
     created_at = fields.BigIntField()
     updated_at = fields.BigIntField()
     
-    # Config with history
+    # Current config (changes are recorded in ConfigChange)
     penalty_duration = fields.BigIntField()
     withdraw_penalty = fields.BigIntField()
-    penalty_receiver = fields.TextField()
+    penalty_receiver = FeltField()
     authorized_rewarders = fields.JSONField()
-    config_history = fields.JSONField()  # List of {field, old_value, new_value, timestamp}
-    
-    # Reward state
-    active_rewards = fields.JSONField()  # Map<token, {rate, duration, finish, stored}>
     
     # Relationships
     powerplant: fields.ForeignKeyField[Powerplant] = fields.ForeignKeyField(
@@ -110,18 +110,18 @@ class UserStake(Model):
     - Deposit events (staking)
     - Withdraw events (unstaking)
     - Harvest events (claiming)
+    
+    Relationships:
+    - Reward accrual per token in UserRewardStates
     """
     id = fields.IntField(primary_key=True)
-    reactor_address = fields.TextField()  # ContractAddress
-    user_address = fields.TextField()  # ContractAddress
+    reactor_address = FeltField()  # ContractAddress
+    user_address = FeltField()  # ContractAddress
     
     # Current Position State
     staked_amount = fields.DecimalField(max_digits=100, decimal_places=0)
     penalty_end_time = fields.BigIntField()
-    
-    # Reward State
-    reward_per_token_paid = fields.JSONField()  # Map<ContractAddress, u256>
-    rewards = fields.JSONField()  # Map<ContractAddress, u256>
+    usd_value = fields.BigIntField(null=True)  # Share of reactor TVL; set by `calculate_farming_metrics`
     
     # Timestamps
     created_at = fields.BigIntField()  # First stake timestamp
@@ -132,6 +132,94 @@ class UserStake(Model):
         'models.Reactor', related_name='user_stakes'
     )
 
+    class Meta:
+        unique_together = (('reactor_address', 'user_address'),)
+
+
+class RewardSchedule(Model):
+    """
+    Tracks a reward token stream of a reactor.
+    One row per (reactor, reward token), updated in place.
+    
+    Key responsibilities:
+    - Stores reward rate and period
+    - Tracks accumulated reward per staked token
+    - Tracks rewards not allocated to stakers
+    
+    Differs from RewardEvent:
+    - Stores current state vs individual events
+    - One row per token vs one per event
+    
+    Updated by:
+    - RewardAdded events (new period)
+    - Harvest events (reward per token checkpoint)
+    - UnallocatedRewardsClaimed events
+    """
+    id = fields.IntField(primary_key=True)
+    reactor_address = FeltField()  # ContractAddress
+    reward_token = FeltField()  # ContractAddress
+    
+    # Stream State (u256)
+    reward_rate = fields.DecimalField(max_digits=100, decimal_places=0)  # Raw amount per second
+    reward_amount = fields.DecimalField(max_digits=100, decimal_places=0)  # Amount added in the latest period
+    reward_duration = fields.BigIntField()
+    period_finish = fields.BigIntField()
+    reward_per_token_stored = fields.DecimalField(max_digits=100, decimal_places=0)
+    last_update_time = fields.BigIntField()  # When `reward_per_token_stored` was observed
+    unallocated_rewards = fields.DecimalField(max_digits=100, decimal_places=0)
+    
+    # Timestamps
+    created_at = fields.BigIntField()
+    updated_at = fields.BigIntField()
+    
+    # Relationships
+    reactor: fields.ForeignKeyField[Reactor] = fields.ForeignKeyField(
+        'models.Reactor', related_name='reward_schedules'
+    )
+
+    class Meta:
+        unique_together = (('reactor_address', 'reward_token'),)
+
+
+class UserRewardState(Model):
+    """
+    Tracks a user's reward accrual for one reward token of a stake.
+    
+    Key responsibilities:
+    - Stores reward per token already accounted to the user
+    - Stores rewards accrued but not claimed
+    - Stores estimated claimable rewards (`earned`)
+    
+    Differs from UserStake:
+    - One row per reward token vs one per reactor
+    
+    Updated by:
+    - Harvest events (checkpoint and claim)
+    - calculate_reward_metrics hook (`earned`; creates states of stakes that haven't harvested yet)
+    
+    Pending rewards: `rewards + staked_amount * (reward per token now - reward_per_token_paid) / 1e18`
+    """
+    id = fields.IntField(primary_key=True)
+    reactor_address = FeltField()  # ContractAddress
+    user_address = FeltField()  # ContractAddress
+    reward_token = FeltField()  # ContractAddress
+    
+    # Accrual State (u256)
+    reward_per_token_paid = fields.DecimalField(max_digits=100, decimal_places=0)
+    rewards = fields.DecimalField(max_digits=100, decimal_places=0)
+    earned = fields.DecimalField(max_digits=100, decimal_places=0, default=0)  # Claimable as of the latest metrics run
+    
+    updated_at = fields.BigIntField()
+    
+    # Relationships
+    stake: fields.ForeignKeyField[UserStake] = fields.ForeignKeyField(
+        'models.UserStake', related_name='reward_states'
+    )
+
+    class Meta:
+        unique_together = (('stake_id', 'reward_token'),)
+        indexes = (('user_address', 'reactor_address'),)
+
 class StakeEventType(Enum):
     DEPOSIT = "DEPOSIT"
     WITHDRAW = "WITHDRAW"
@@ -158,11 +246,11 @@ class StakeEvent(Model):
     - Position updates
     """
     id = fields.IntField(primary_key=True)
-    transaction_hash = fields.TextField()
+    transaction_hash = FeltField()
     created_at = fields.BigIntField()
     
     event_type = fields.EnumField(StakeEventType)
-    user_address = fields.TextField()
+    user_address = FeltField()
     staked_amount = fields.DecimalField(max_digits=100, decimal_places=0)
     penalty_amount = fields.DecimalField(max_digits=100, decimal_places=0, null=True)  # For withdrawals
     
@@ -174,6 +262,9 @@ class StakeEvent(Model):
         'models.UserStake', related_name='events'
     )
 
+    class Meta:
+        indexes = (('reactor_id', 'created_at'),)
+
 
 class RewardEventType(Enum):
     HARVEST = "HARVEST"
@@ -201,13 +292,13 @@ class RewardEvent(Model):
     - Protocol metrics
     """
     id = fields.IntField(primary_key=True)
-    transaction_hash = fields.TextField()
+    transaction_hash = FeltField()
     created_at = fields.BigIntField()
 
     
     event_type = fields.EnumField(RewardEventType)
-    user_address = fields.TextField(null=True)  # For harvests
-    reward_token = fields.TextField()
+    user_address = FeltField(null=True)  # For harvests
+    reward_token = FeltField()
     reward_amount = fields.DecimalField(max_digits=100, decimal_places=0)
     
     # Additional fields for REWARD_ADDED
@@ -218,4 +309,7 @@ class RewardEvent(Model):
     # Relationships
     reactor: fields.ForeignKeyField[Reactor] = fields.ForeignKeyField(
         'models.Reactor', related_name='reward_events'
-    )
\ No newline at end of file
+    )
+
+    class Meta:
+        indexes = (('reactor_id', 'created_at'),)
\ No newline at end of file
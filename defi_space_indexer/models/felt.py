@@ -0,0 +1,79 @@
+from typing import Any
+
+from dipdup.fields import Field
+from dipdup.fields import TextField
+
+FELT_SIZE = 32
+
+
+def felt(value: int | str) -> str:
+    """Canonical form of a felt (address, hash): `0x` followed by 64 lowercase hex digits."""
+    if isinstance(value, str):
+        value = int(value, 16)
+    if not 0 <= value < 2 ** (FELT_SIZE * 8):
+        raise ValueError(f'Felt out of range: {value}')
+    return f'0x{value:064x}'
+
+
+def felt_bytes(value: int | str) -> bytes:
+    """Database representation of a felt; use for raw SQL parameters."""
+    if isinstance(value, str):
+        value = int(value, 16)
+    return value.to_bytes(FELT_SIZE, 'big')
+
+
+class _FeltConverter:
+    """Felt conversions shared by every `FeltField` and the foreign keys copied from them."""
+
+    def to_db_value(self, value: Any, instance: Any) -> bytes | None:
+        if value is None:
+            return None
+        if isinstance(value, bytes):
+            return value
+        return felt_bytes(value)
+
+    def to_python_value(self, value: Any) -> str | None:
+        if value is None:
+            return None
+        if isinstance(value, bytes | bytearray | memoryview):
+            return felt(int.from_bytes(value, 'big'))
+        return felt(value)
+
+    def __deepcopy__(self, memo: dict[int, Any]) -> '_FeltConverter':
+        return self
+
+
+_converter = _FeltConverter()
+
+
+class _FeltPostgres:
+    SQL_TYPE = 'BYTEA'
+
+
+def FeltField(**kwargs: Any) -> TextField:
+    """
+    252-bit Starknet felt stored as 32 big-endian bytes.
+
+    Takes ints or hex strings of any padding and always gives back canonical hex (see `felt`),
+    so lookups and comparisons don't depend on how the value was formatted. Hasura returns
+    model tables' felts as `\\x`-prefixed hex and serves the `0x` form through `<table>_hex`
+    views (see `sql/migrations/004_felt_views.sql`).
+
+    DipDup accepts only field classes from `dipdup.fields`, so this is a `TextField` with felt
+    conversions and a binary column type instead of a class of its own.
+    """
+    field = TextField(**kwargs)
+    # NOTE: Tortoise passes rows of native types like `str` through as is and converts others by
+    # NOTE: calling `field_type`; it's copied to foreign keys, so their values are converted too.
+    # NOTE: `values()` drops converters that are plain functions, hence bound methods.
+    field.field_type = _converter.to_python_value  # type: ignore[assignment]
+    field.SQL_TYPE = 'BLOB'
+    field._db_postgres = _FeltPostgres  # type: ignore[attr-defined]
+    field.to_db_value = _converter.to_db_value  # type: ignore[method-assign]
+    field.to_python_value = _converter.to_python_value  # type: ignore[method-assign,assignment]
+    return field
+
+
+def is_felt_field(field: Field[Any]) -> bool:
+    """Whether the model field was declared with `FeltField`; foreign keys to one count too."""
+    return getattr(field.to_python_value, '__self__', None) is _converter
@@ -0,0 +1,49 @@
+from dipdup import fields
+from dipdup.models import Model
+from defi_space_indexer.models.felt import FeltField
+from enum import Enum
+
+
+class EventKind(Enum):
+    SWAP = "SWAP"
+    LIQUIDITY = "LIQUIDITY"
+    STAKE = "STAKE"
+    REWARD = "REWARD"
+
+class EventRollup(Model):
+    """
+    Daily aggregate of raw events of one type for a pair or reactor.
+    Written when an event table partition passes the retention period, before its rows are dropped or archived.
+    
+    Key responsibilities:
+    - Preserves event counts and amounts of compacted partitions
+    - Counts distinct users per day
+    
+    Differs from event models:
+    - One row per (entity, event type, token, day) vs one per event
+    - Only covers compacted months vs recent history
+    
+    Amounts by kind:
+    - SWAP: amount0/amount1 = token0/token1 volume (in + out)
+    - LIQUIDITY: amount0/amount1 = token amounts, amount2 = liquidity
+    - STAKE: amount0 = staked amount, amount1 = penalties
+    - REWARD: amount0 = reward amount of `token_address`
+    
+    Used for:
+    - Long-range activity and volume history
+    """
+    id = fields.TextField(primary_key=True)  # {kind}:{event_type}:{entity_address}[:{token_address}]:{day}
+    kind = fields.EnumField(EventKind)
+    event_type = fields.TextField()  # SWAP or the event's `event_type`
+    entity_address = FeltField()  # Pair or reactor address
+    token_address = FeltField(null=True)  # Reward token of REWARD rollups
+    day = fields.BigIntField()  # Day start timestamp (UTC)
+    
+    events = fields.IntField()
+    users = fields.IntField()  # Distinct senders/users
+    amount0 = fields.DecimalField(max_digits=100, decimal_places=0)
+    amount1 = fields.DecimalField(max_digits=100, decimal_places=0)
+    amount2 = fields.DecimalField(max_digits=100, decimal_places=0)
+
+    class Meta:
+        indexes = (('entity_address', 'day'),)
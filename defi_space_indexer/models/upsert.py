@@ -0,0 +1,137 @@
+from typing import Any
+
+from dipdup import models as dipdup_models
+from dipdup.database import AsyncpgClient
+from dipdup.database import get_connection
+from dipdup.models import Model
+from dipdup.models import ModelUpdate
+from dipdup.models import ModelUpdateAction
+
+
+async def upsert(
+    model: type[Model],
+    keys: dict[str, Any],
+    values: dict[str, Any],
+    increments: dict[str, Any] | None = None,
+    defaults: dict[str, Any] | None = None,
+) -> int:
+    """Insert a row or apply changes to the existing one atomically. Returns primary key.
+
+    - `keys`: columns of a unique constraint to match the row by
+    - `values`: set on insert, overwritten on conflict
+    - `increments`: set on insert, added to the current value on conflict
+    - `defaults`: set on insert only
+    """
+    increments, defaults = increments or {}, defaults or {}
+    table, pk = model._meta.db_table, model._meta.db_pk_column
+    columns = {**keys, **values, **increments, **defaults}
+    args = [_to_db(model, name, value) for name, value in columns.items()]
+
+    assignments = [f'{name} = EXCLUDED.{name}' for name in values]
+    assignments += [f'{name} = COALESCE({table}.{name}, 0) + EXCLUDED.{name}' for name in increments]
+    sql = (
+        f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({", ".join(_params(len(args)))}) '
+        f'ON CONFLICT ({", ".join(keys)}) DO UPDATE SET {", ".join(assignments)}'
+    )
+    row = await _execute(model, sql, args, keys, [*values, *increments])
+    if row is None:
+        raise RuntimeError(f'Upsert into `{table}` returned no rows')
+    return row[pk]  # type: ignore[no-any-return]
+
+
+async def update(
+    model: type[Model],
+    keys: dict[str, Any],
+    values: dict[str, Any],
+    increments: dict[str, Any] | None = None,
+) -> int | None:
+    """Apply changes to an existing row atomically. Returns primary key or `None` if there's no such row."""
+    increments = increments or {}
+    table, pk = model._meta.db_table, model._meta.db_pk_column
+    args = [_to_db(model, name, value) for name, value in {**values, **increments}.items()]
+    args += [_to_db(model, name, value) for name, value in keys.items()]
+
+    params = iter(_params(len(args)))
+    assignments = [f'{name} = {next(params)}' for name in values]
+    assignments += [f'{name} = COALESCE({table}.{name}, 0) + {next(params)}' for name in increments]
+    conditions = [f'{name} = {next(params)}' for name in keys]
+    sql = f'UPDATE {table} SET {", ".join(assignments)} WHERE {" AND ".join(conditions)}'
+
+    row = await _execute(model, sql, args, keys, [*values, *increments])
+    return None if row is None else row[pk]
+
+
+def _postgres() -> bool:
+    return isinstance(get_connection(), AsyncpgClient)
+
+
+def _params(count: int) -> list[str]:
+    if _postgres():
+        return [f'${i}' for i in range(1, count + 1)]
+    return ['?'] * count
+
+
+def _to_db(model: type[Model], name: str, value: Any) -> Any:
+    return model._meta.fields_map[name].to_db_value(value, model)
+
+
+async def _execute(
+    model: type[Model],
+    sql: str,
+    args: list[Any],
+    keys: dict[str, Any],
+    tracked: list[str],
+) -> dict[str, Any] | None:
+    """Run write statement, recording a rollback journal entry if the level is versioned."""
+    conn = get_connection()
+    table, pk = model._meta.db_table, model._meta.db_pk_column
+    transaction = dipdup_models.get_transaction()
+    journal = transaction is not None and table not in transaction.immune_tables
+    returning = ', '.join((pk, *tracked))
+
+    if _postgres():
+        # NOTE: Every part of a statement sees the same snapshot, so `previous` is the row before the write
+        conditions = ' AND '.join(f'{name} = ${len(args) + i}' for i, name in enumerate(keys, 1))
+        sql = (
+            f'WITH previous AS (SELECT {returning} FROM {table} WHERE {conditions}), '
+            f'written AS ({sql} RETURNING {returning}) '
+            f'SELECT written.*, {", ".join(f"previous.{name} AS old_{name}" for name in (pk, *tracked))} '
+            f'FROM written LEFT JOIN previous ON TRUE'
+        )
+        args = [*args, *(_to_db(model, name, value) for name, value in keys.items())]
+        _, rows = await conn.execute_query(sql, args)
+        row = dict(rows[0]) if rows else None
+        old = {name: row[f'old_{name}'] for name in (pk, *tracked)} if row else None
+    else:
+        old = None
+        if journal:
+            conditions = ' AND '.join(f'{name} = ?' for name in keys)
+            key_args = [_to_db(model, name, value) for name, value in keys.items()]
+            _, rows = await conn.execute_query(f'SELECT {returning} FROM {table} WHERE {conditions}', key_args)
+            old = dict(rows[0]) if rows else None
+        _, rows = await conn.execute_query(f'{sql} RETURNING {returning}', args)
+        row = dict(rows[0]) if rows else None
+
+    if row is None or not journal or transaction is None:
+        return row
+
+    # NOTE: Same entries `Model.save` would produce, so `ctx.rollback` reverts raw writes too
+    if old is None or old[pk] is None:
+        action, data = ModelUpdateAction.INSERT, None
+    else:
+        action = ModelUpdateAction.UPDATE
+        data = {name: old[name] for name in tracked if old[name] != row[name]}
+        if not data:
+            return row
+
+    dipdup_models.get_pending_updates().append(
+        ModelUpdate(
+            model_name=model.__name__,
+            model_pk=row[pk],
+            level=transaction.level,
+            index=transaction.index,
+            action=action,
+            data=data,
+        )
+    )
+    return row
@@ -0,0 +1,12 @@
+-- Protocol TVL of every factory as the sum of its pairs' TVL, in one statement.
+-- Factories whose value wouldn't change are left untouched.
+UPDATE factory
+SET total_value_locked_usd = totals.tvl_usd
+FROM (
+    SELECT factory.address, COALESCE(SUM(pair.tvl_usd), 0) AS tvl_usd
+    FROM factory
+    LEFT JOIN pair ON pair.factory_address = factory.address
+    GROUP BY factory.address
+) AS totals
+WHERE factory.address = totals.address
+    AND factory.total_value_locked_usd IS DISTINCT FROM totals.tvl_usd
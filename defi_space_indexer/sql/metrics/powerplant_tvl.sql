@@ -0,0 +1,12 @@
+-- Protocol TVL of every powerplant as the sum of its reactors' TVL, in one statement.
+-- Powerplants whose value wouldn't change are left untouched.
+UPDATE powerplant
+SET total_value_locked_usd = totals.tvl_usd
+FROM (
+    SELECT powerplant.address, COALESCE(SUM(reactor.tvl_usd), 0) AS tvl_usd
+    FROM powerplant
+    LEFT JOIN reactor ON reactor.powerplant_address = powerplant.address
+    GROUP BY powerplant.address
+) AS totals
+WHERE powerplant.address = totals.address
+    AND powerplant.total_value_locked_usd IS DISTINCT FROM totals.tvl_usd
@@ -0,0 +1,60 @@
+-- Composite unique constraints and lookup indexes declared in models.
+--
+-- Fresh databases get them when DipDup creates the schema; this brings databases created
+-- before they were declared up to date. Scripts in this directory run on every restart
+-- (PostgreSQL only) and must be idempotent: an index is created only when no index on
+-- the same columns exists yet, whatever its name.
+--
+-- Existing databases: run `dipdup schema approve` once to accept the new schema hash,
+-- then restart the indexer.
+DO $$
+DECLARE
+    spec RECORD;
+    duplicates BIGINT;
+BEGIN
+    FOR spec IN
+        SELECT * FROM (VALUES
+            ('liquidity_position', 'pair_address,user_address', TRUE),
+            ('user_stake', 'reactor_address,user_address', TRUE),
+            ('liquidity_event', 'pair_id,created_at', FALSE),
+            ('swap_event', 'pair_id,created_at', FALSE),
+            ('stake_event', 'reactor_id,created_at', FALSE),
+            ('reward_event', 'reactor_id,created_at', FALSE)
+        ) AS t(table_name, columns, is_unique)
+    LOOP
+        CONTINUE WHEN to_regclass(spec.table_name) IS NULL;
+        CONTINUE WHEN EXISTS (
+            SELECT 1
+            FROM pg_index i
+            WHERE i.indrelid = spec.table_name::regclass
+              AND (i.indisunique OR NOT spec.is_unique)
+              AND (
+                  SELECT string_agg(a.attname, ',' ORDER BY k.ord)
+                  FROM unnest(i.indkey) WITH ORDINALITY AS k(attnum, ord)
+                  JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = k.attnum
+              ) = spec.columns
+        );
+
+        IF spec.is_unique THEN
+            EXECUTE format(
+                'SELECT count(*) FROM (SELECT 1 FROM %I GROUP BY %s HAVING count(*) > 1) d',
+                spec.table_name, spec.columns
+            ) INTO duplicates;
+            IF duplicates > 0 THEN
+                RAISE EXCEPTION '%: % duplicated (%) keys; resolve them or reindex before adding the constraint',
+                    spec.table_name, duplicates, spec.columns;
+            END IF;
+            EXECUTE format(
+                'ALTER TABLE %I ADD CONSTRAINT %I UNIQUE (%s)',
+                spec.table_name, 'uid_' || spec.table_name || '_' || replace(spec.columns, ',', '_'), spec.columns
+            );
+        ELSE
+            EXECUTE format(
+                'CREATE INDEX %I ON %I (%s)',
+                'idx_' || spec.table_name || '_' || replace(spec.columns, ',', '_'), spec.table_name, spec.columns
+            );
+        END IF;
+        RAISE NOTICE 'Created % index on %(%)', CASE WHEN spec.is_unique THEN 'unique' ELSE 'lookup' END, spec.table_name, spec.columns;
+    END LOOP;
+END
+$$;
@@ -0,0 +1,8 @@
+-- Addresses and hashes are stored as 32-byte BYTEA felts. Hasura and psql render them
+-- as `\x`-prefixed hex; this renders the canonical `0x` form used by the indexer and
+-- Starknet tooling, for views, ad-hoc queries and Hasura computed fields:
+--
+--   SELECT felt_hex(address), tvl_usd FROM pair;
+CREATE OR REPLACE FUNCTION felt_hex(value BYTEA) RETURNS TEXT
+LANGUAGE SQL IMMUTABLE STRICT PARALLEL SAFE
+AS $$ SELECT '0x' || encode(value, 'hex') $$;
@@ -0,0 +1,110 @@
+-- Materialized views behind the heaviest dashboard queries. They're refreshed when the
+-- indexer reaches head and by the `analytics_views_refresh` job afterward. Each one has a
+-- unique index so it can be refreshed concurrently, without blocking readers. Hasura
+-- tracks them like model tables.
+--
+-- Views are created on restart rather than on reindex, so databases created before they
+-- were added get them too; Hasura tracks those after `dipdup hasura configure --force`.
+-- Every statement is idempotent.
+
+-- Pairs ranked by TVL and 24h volume
+CREATE MATERIALIZED VIEW IF NOT EXISTS top_pairs AS
+SELECT
+    pair.address,
+    pair.factory_address,
+    pair.token0_address,
+    pair.token1_address,
+    COALESCE(pair.tvl_usd, 0) AS tvl_usd,
+    COALESCE(pair.volume_24h, 0) AS volume_24h,
+    pair.apy_24h,
+    COALESCE(candles.trades_24h, 0)::BIGINT AS trades_24h,
+    COALESCE(positions.providers, 0) AS providers,
+    rank() OVER (ORDER BY COALESCE(pair.tvl_usd, 0) DESC) AS tvl_rank,
+    rank() OVER (ORDER BY COALESCE(pair.volume_24h, 0) DESC) AS volume_rank
+FROM pair
+LEFT JOIN (
+    SELECT pair_id, SUM(trades) AS trades_24h
+    FROM pair_candle
+    WHERE resolution = '1h' AND start >= extract(epoch FROM now())::BIGINT - 86400
+    GROUP BY pair_id
+) AS candles ON candles.pair_id = pair.address
+LEFT JOIN (
+    SELECT pair_address, count(*) AS providers
+    FROM liquidity_position
+    WHERE liquidity > 0
+    GROUP BY pair_address
+) AS positions ON positions.pair_address = pair.address;
+
+CREATE UNIQUE INDEX IF NOT EXISTS top_pairs_address ON top_pairs (address);
+CREATE INDEX IF NOT EXISTS top_pairs_tvl_rank ON top_pairs (tvl_rank);
+CREATE INDEX IF NOT EXISTS top_pairs_volume_rank ON top_pairs (volume_rank);
+
+-- USD value of every user's LP positions and stakes; LP value is the position's share of the pair TVL
+CREATE MATERIALIZED VIEW IF NOT EXISTS user_portfolio AS
+SELECT
+    user_address,
+    SUM(lp_positions)::INTEGER AS lp_positions,
+    SUM(lp_usd_value)::BIGINT AS lp_usd_value,
+    SUM(stakes)::INTEGER AS stakes,
+    SUM(staked_usd_value)::BIGINT AS staked_usd_value,
+    SUM(lp_usd_value + staked_usd_value)::BIGINT AS total_usd_value
+FROM (
+    SELECT
+        position.user_address,
+        1 AS lp_positions,
+        CASE
+            WHEN pair.total_supply > 0 THEN CAST(position.liquidity * COALESCE(pair.tvl_usd, 0) / pair.total_supply AS BIGINT)
+            ELSE 0
+        END AS lp_usd_value,
+        0 AS stakes,
+        0 AS staked_usd_value
+    FROM liquidity_position AS position
+    JOIN pair ON pair.address = position.pair_address
+    WHERE position.liquidity > 0
+    UNION ALL
+    SELECT user_address, 0, 0, 1, COALESCE(usd_value, 0)
+    FROM user_stake
+    WHERE staked_amount > 0
+) AS holdings
+GROUP BY user_address;
+
+CREATE UNIQUE INDEX IF NOT EXISTS user_portfolio_user_address ON user_portfolio (user_address);
+CREATE INDEX IF NOT EXISTS user_portfolio_total_usd_value ON user_portfolio (total_usd_value);
+
+-- Staker counts and withdrawal penalties of every reactor, including compacted event history
+CREATE MATERIALIZED VIEW IF NOT EXISTS reactor_stakers AS
+SELECT
+    reactor.address,
+    reactor.powerplant_address,
+    reactor.lp_token_address,
+    reactor.total_staked,
+    reactor.tvl_usd,
+    reactor.apr,
+    COALESCE(stakes.stakers, 0) AS stakers,
+    COALESCE(stakes.locked_stakers, 0) AS locked_stakers,
+    (COALESCE(withdrawals.withdrawals, 0) + COALESCE(rollups.withdrawals, 0))::BIGINT AS withdrawals,
+    COALESCE(withdrawals.penalty_total, 0) + COALESCE(rollups.penalty_total, 0) AS penalty_total
+FROM reactor
+LEFT JOIN (
+    SELECT
+        reactor_address,
+        count(*) AS stakers,
+        count(*) FILTER (WHERE penalty_end_time > extract(epoch FROM now())) AS locked_stakers
+    FROM user_stake
+    WHERE staked_amount > 0
+    GROUP BY reactor_address
+) AS stakes ON stakes.reactor_address = reactor.address
+LEFT JOIN (
+    SELECT reactor_id, count(*) AS withdrawals, SUM(COALESCE(penalty_amount, 0)) AS penalty_total
+    FROM stake_event
+    WHERE event_type = 'WITHDRAW'
+    GROUP BY reactor_id
+) AS withdrawals ON withdrawals.reactor_id = reactor.address
+LEFT JOIN (
+    SELECT entity_address, SUM(events) AS withdrawals, SUM(amount1) AS penalty_total
+    FROM event_rollup
+    WHERE kind = 'STAKE' AND event_type = 'WITHDRAW'
+    GROUP BY entity_address
+) AS rollups ON rollups.entity_address = reactor.address;
+
+CREATE UNIQUE INDEX IF NOT EXISTS reactor_stakers_address ON reactor_stakers (address);
@@ -0,0 +1,47 @@
+-- Read-only `<table>_hex` views with felts rendered as `0x`-prefixed hex.
+--
+-- Felt columns are BYTEA since `002_felt_hex.sql`, which Hasura returns as `\x`-prefixed
+-- hex. Every table and materialized view with felt columns gets a view with the same
+-- columns, felts passed through `felt_hex`; Hasura tracks them like model tables
+-- (`pair_hex` is `pairHex` in GraphQL). Views are replaced on every restart, so they
+-- follow schema changes and are created again after a reindex.
+DO $$
+DECLARE
+    relation RECORD;
+    view_name TEXT;
+    columns TEXT;
+BEGIN
+    FOR relation IN
+        SELECT cls.oid, cls.relname::TEXT AS relname
+        FROM pg_class AS cls
+        WHERE cls.relnamespace = current_schema()::REGNAMESPACE
+            AND cls.relkind IN ('r', 'p', 'm')
+            AND NOT cls.relispartition
+            AND cls.relname NOT LIKE 'dipdup\_%'
+            AND EXISTS (
+                SELECT 1 FROM pg_attribute
+                WHERE attrelid = cls.oid AND attnum > 0 AND NOT attisdropped AND atttypid = 'bytea'::REGTYPE
+            )
+        ORDER BY cls.relname
+    LOOP
+        SELECT string_agg(
+            CASE
+                WHEN atttypid = 'bytea'::REGTYPE THEN format('felt_hex(%1$I) AS %1$I', attname)
+                ELSE quote_ident(attname)
+            END,
+            ', ' ORDER BY attnum
+        )
+        INTO columns
+        FROM pg_attribute
+        WHERE attrelid = relation.oid AND attnum > 0 AND NOT attisdropped;
+
+        view_name := relation.relname || '_hex';
+        BEGIN
+            EXECUTE format('CREATE OR REPLACE VIEW %I AS SELECT %s FROM %I', view_name, columns, relation.relname);
+        EXCEPTION WHEN invalid_table_definition THEN
+            -- NOTE: Columns were dropped or reordered; a view can only be replaced with appended columns
+            EXECUTE format('DROP VIEW %I', view_name);
+            EXECUTE format('CREATE VIEW %I AS SELECT %s FROM %I', view_name, columns, relation.relname);
+        END;
+    END LOOP;
+END $$;
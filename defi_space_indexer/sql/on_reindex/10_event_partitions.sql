@@ -0,0 +1,203 @@
+-- Monthly range partitioning of event tables by `created_at` (see `custom.event_partitions`).
+--
+-- DipDup creates plain tables; when enabled, this swaps each event table for a partitioned
+-- one with the same columns, defaults, indexes and foreign keys. The primary key becomes
+-- (id, created_at) since it must include the partition key. Partitions are named
+-- `<table>_YYYY_MM`; rows outside of them land in `<table>_default` and are moved out when
+-- their month is created. Scripts in this directory run once on a fresh database.
+
+CREATE OR REPLACE FUNCTION event_partition_create(parent TEXT, month DATE) RETURNS VOID
+LANGUAGE plpgsql AS $$
+DECLARE
+    partition_name TEXT := parent || '_' || to_char(month, 'YYYY_MM');
+    default_name TEXT := parent || '_default';
+    lower_bound BIGINT := extract(epoch FROM month)::BIGINT;
+    upper_bound BIGINT := extract(epoch FROM month + INTERVAL '1 month')::BIGINT;
+BEGIN
+    IF to_regclass(partition_name) IS NOT NULL THEN
+        RETURN;
+    END IF;
+
+    EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', partition_name, parent);
+    -- NOTE: A range can't be attached while the default partition holds rows of it
+    IF to_regclass(default_name) IS NOT NULL THEN
+        EXECUTE format(
+            'WITH moved AS (DELETE FROM %I WHERE created_at >= %s AND created_at < %s RETURNING *) '
+            'INSERT INTO %I SELECT * FROM moved',
+            default_name, lower_bound, upper_bound, partition_name
+        );
+    END IF;
+    EXECUTE format(
+        'ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (%s) TO (%s)',
+        parent, partition_name, lower_bound, upper_bound
+    );
+END
+$$;
+
+-- Creates monthly partitions from `since` to `months_ahead` months past the current one,
+-- and for every month with rows in the default partition.
+CREATE OR REPLACE FUNCTION event_partitions_extend(parent TEXT, since DATE, months_ahead INTEGER) RETURNS VOID
+LANGUAGE plpgsql AS $$
+DECLARE
+    current_month DATE := date_trunc('month', now() AT TIME ZONE 'UTC')::DATE;
+    month DATE;
+BEGIN
+    IF to_regclass(parent || '_default') IS NOT NULL THEN
+        FOR month IN EXECUTE format(
+            'SELECT DISTINCT date_trunc(''month'', to_timestamp(created_at) AT TIME ZONE ''UTC'')::DATE FROM %I',
+            parent || '_default'
+        ) LOOP
+            PERFORM event_partition_create(parent, month);
+        END LOOP;
+    END IF;
+
+    FOR month IN
+        SELECT generate_series(
+            date_trunc('month', since)::DATE,
+            current_month + make_interval(months => months_ahead),
+            INTERVAL '1 month'
+        )::DATE
+    LOOP
+        PERFORM event_partition_create(parent, month);
+    END LOOP;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION event_table_partition(parent TEXT, since DATE, months_ahead INTEGER) RETURNS VOID
+LANGUAGE plpgsql AS $$
+DECLARE
+    source TEXT := parent || '_unpartitioned';
+    id_sequence TEXT := pg_get_serial_sequence(parent, 'id');
+    definitions TEXT[];
+    definition TEXT;
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = parent::regclass) THEN
+        RETURN;
+    END IF;
+
+    EXECUTE format('ALTER TABLE %I RENAME TO %I', parent, source);
+    EXECUTE format('ALTER INDEX IF EXISTS %I RENAME TO %I', parent || '_pkey', source || '_pkey');
+
+    -- NOTE: LIKE can't copy the primary key, and index names are taken until the old table is gone
+    SELECT array_agg(regexp_replace(pg_get_indexdef(indexrelid), ' ON (ONLY )?\S+ ', ' ON ' || quote_ident(parent) || ' '))
+    INTO definitions
+    FROM pg_index
+    WHERE indrelid = source::regclass AND NOT indisprimary;
+
+    SELECT definitions || array_agg(format('ALTER TABLE %I ADD CONSTRAINT %I %s', parent, conname, pg_get_constraintdef(oid)))
+    INTO definitions
+    FROM pg_constraint
+    WHERE conrelid = source::regclass AND contype = 'f';
+
+    EXECUTE format(
+        'CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS INCLUDING CONSTRAINTS, PRIMARY KEY (id, created_at)) '
+        'PARTITION BY RANGE (created_at)',
+        parent, source
+    );
+    EXECUTE format('CREATE TABLE %I PARTITION OF %I DEFAULT', parent || '_default', parent);
+    EXECUTE format('INSERT INTO %I SELECT * FROM %I', parent, source);
+
+    -- NOTE: The id sequence is owned by the old column; keep it for the new table
+    IF id_sequence IS NOT NULL THEN
+        EXECUTE format('ALTER SEQUENCE %s OWNED BY NONE', id_sequence);
+    END IF;
+    EXECUTE format('DROP TABLE %I', source);
+    IF id_sequence IS NOT NULL THEN
+        EXECUTE format('ALTER SEQUENCE %s OWNED BY %I.id', id_sequence, parent);
+    END IF;
+
+    FOREACH definition IN ARRAY coalesce(definitions, ARRAY[]::TEXT[]) LOOP
+        EXECUTE definition;
+    END LOOP;
+
+    PERFORM event_partitions_extend(parent, since, months_ahead);
+END
+$$;
+
+-- Monthly partitions of `parent` whose range ends at or before `before`.
+CREATE OR REPLACE FUNCTION event_partitions_expired(parent TEXT, before BIGINT) RETURNS SETOF TEXT
+LANGUAGE SQL STABLE AS $$
+    SELECT child.relname::TEXT
+    FROM pg_inherits
+    JOIN pg_class AS child ON child.oid = pg_inherits.inhrelid
+    WHERE pg_inherits.inhparent = to_regclass(parent)
+        AND substring(pg_get_expr(child.relpartbound, child.oid) FROM 'TO \(''?(\d+)''?\)')::BIGINT <= before
+    ORDER BY child.relname
+$$;
+
+-- Rolls a partition up into daily `event_rollup` rows, then drops it or moves it to the
+-- `event_archive` schema. One statement, so a failure leaves the partition in place.
+CREATE OR REPLACE FUNCTION event_partition_compact(partition_name TEXT, archive BOOLEAN) RETURNS BIGINT
+LANGUAGE plpgsql AS $$
+DECLARE
+    parent TEXT;
+    rollup TEXT;
+    rows_written BIGINT;
+BEGIN
+    SELECT inhparent::regclass::TEXT INTO parent
+    FROM pg_inherits
+    WHERE inhrelid = partition_name::regclass;
+
+    rollup := CASE parent
+        WHEN 'swap_event' THEN
+            'SELECT ''SWAP'', ''SWAP'', pair_id, NULL::BYTEA, day, count(*), count(DISTINCT sender), '
+            'sum(amount0_in + amount0_out), sum(amount1_in + amount1_out), 0 '
+            'FROM (SELECT *, created_at / 86400 * 86400 AS day FROM %I) AS event '
+            'GROUP BY pair_id, day'
+        WHEN 'liquidity_event' THEN
+            'SELECT ''LIQUIDITY'', event_type, pair_id, NULL::BYTEA, day, count(*), count(DISTINCT sender), '
+            'sum(amount0), sum(amount1), sum(liquidity) '
+            'FROM (SELECT *, created_at / 86400 * 86400 AS day FROM %I) AS event '
+            'GROUP BY event_type, pair_id, day'
+        WHEN 'stake_event' THEN
+            'SELECT ''STAKE'', event_type, reactor_id, NULL::BYTEA, day, count(*), count(DISTINCT user_address), '
+            'sum(staked_amount), coalesce(sum(penalty_amount), 0), 0 '
+            'FROM (SELECT *, created_at / 86400 * 86400 AS day FROM %I) AS event '
+            'GROUP BY event_type, reactor_id, day'
+        WHEN 'reward_event' THEN
+            'SELECT ''REWARD'', event_type, reactor_id, reward_token, day, count(*), count(DISTINCT user_address), '
+            'sum(reward_amount), 0, 0 '
+            'FROM (SELECT *, created_at / 86400 * 86400 AS day FROM %I) AS event '
+            'GROUP BY event_type, reactor_id, reward_token, day'
+    END;
+    IF rollup IS NULL THEN
+        RAISE EXCEPTION '% is not an event table partition', partition_name;
+    END IF;
+
+    EXECUTE format(
+        'INSERT INTO event_rollup (id, kind, event_type, entity_address, token_address, day, events, users, amount0, amount1, amount2) '
+        'SELECT concat_ws('':'', kind, event_type, felt_hex(entity_address), felt_hex(token_address), day), * '
+        'FROM (' || rollup || ') AS rollup (kind, event_type, entity_address, token_address, day, events, users, amount0, amount1, amount2) '
+        'ON CONFLICT (id) DO UPDATE SET '
+        'events = event_rollup.events + EXCLUDED.events, users = event_rollup.users + EXCLUDED.users, '
+        'amount0 = event_rollup.amount0 + EXCLUDED.amount0, amount1 = event_rollup.amount1 + EXCLUDED.amount1, '
+        'amount2 = event_rollup.amount2 + EXCLUDED.amount2',
+        partition_name
+    );
+    GET DIAGNOSTICS rows_written = ROW_COUNT;
+
+    EXECUTE format('ALTER TABLE %I DETACH PARTITION %I', parent, partition_name);
+    IF archive THEN
+        CREATE SCHEMA IF NOT EXISTS event_archive;
+        -- NOTE: Left by a previous reindex; holds the same events
+        EXECUTE format('DROP TABLE IF EXISTS event_archive.%I', partition_name);
+        EXECUTE format('ALTER TABLE %I SET SCHEMA event_archive', partition_name);
+    ELSE
+        EXECUTE format('DROP TABLE %I', partition_name);
+    END IF;
+    RETURN rows_written;
+END
+$$;
+
+DO $$
+DECLARE
+    parent TEXT;
+BEGIN
+    IF NOT {enabled} THEN
+        RETURN;
+    END IF;
+    FOREACH parent IN ARRAY ARRAY['swap_event', 'liquidity_event', 'stake_event', 'reward_event'] LOOP
+        PERFORM event_table_partition(parent, '{start}-01'::DATE, {months_ahead});
+    END LOOP;
+END
+$$;
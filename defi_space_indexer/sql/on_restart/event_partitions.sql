@@ -0,0 +1,12 @@
+-- Creates partitions for the months ahead (and months stuck in the default partition) of
+-- event tables partitioned on reindex; no-op for plain tables.
+DO $$
+DECLARE
+    parent TEXT;
+BEGIN
+    FOREACH parent IN ARRAY ARRAY['swap_event', 'liquidity_event', 'stake_event', 'reward_event'] LOOP
+        CONTINUE WHEN NOT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(parent));
+        PERFORM event_partitions_extend(parent, date_trunc('month', now() AT TIME ZONE 'UTC')::DATE, {months_ahead});
+    END LOOP;
+END
+$$;
@@ -55,7 +55,7 @@ EOF
     pdm venv create
     
     echo "Installing dipdup..."
-    pdm add "dipdup>=8,<9" --venv
+    pdm add "dipdup>=8.2,<9" --venv
     
     echo "Activating virtual environment..."
     eval "$(pdm venv activate)"
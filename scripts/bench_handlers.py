@@ -0,0 +1,543 @@
+"""
+Handler throughput on synthetic event streams, against SQLite and PostgreSQL.
+
+Generates a factory history with `--pairs` pairs, `--reactors` reactors staking their LP
+tokens and `--users` users: PairCreated and ReactorCreated first, then `--levels` levels
+of `--events-per-level` events drawn from `--mix`. Mint, Burn and Swap are each preceded by
+the Sync of the same reserve change, as pair contracts emit them. Pairs and users are
+picked with a Zipf-like skew, so a few pairs and users see most of the activity.
+
+Payloads are built with the generated types in `defi_space_indexer/types`, encoded
+with the contract ABIs and fed level by level into the project's indexes in-process:
+the DipDup matcher, the `batch` handler and level transactions all run as in a real
+sync, but no datasource is started. Metrics hooks are deferred past the run.
+
+    python scripts/bench_handlers.py --pairs 50 --users 500 --levels 500
+    python scripts/bench_handlers.py --postgres postgres://postgres@127.0.0.1:5432/postgres
+
+Runs from any directory, the repository root included: `DIPDUP_PACKAGE_PATH` is set to
+`defi_space_indexer`, so DipDup doesn't take the working directory for the package.
+
+Every run starts from an empty database: a temporary SQLite file and, with `--postgres`,
+the `bench_handlers` schema of that database, which is dropped first. Reports events per
+second, p50/p99 latency per handler and per index level (handlers plus flush and commit)
+and SQL statements per event. Keep the arguments fixed when comparing before/after.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import AsyncExitStack
+from itertools import accumulate
+from pathlib import Path
+from typing import Any
+from urllib.parse import urlsplit
+
+from pydantic import BaseModel
+
+ROOT = Path(__file__).resolve().parent.parent
+PACKAGE = ROOT / 'defi_space_indexer'
+SCHEMA = 'bench_handlers'
+FIRST_LEVEL = 1_000_000
+FIRST_TIMESTAMP = 1_700_000_000
+BLOCK_TIME = 6
+DEFAULT_MIX = 'swap=40,sync=0,mint=10,burn=5,deposit=20,withdraw=5,harvest=15,reward_added=5'
+REWARD_TOKENS = (0x7E1, 0x7E2)
+REWARD_DURATION = 7 * 86400
+SWAP_FEE = 997  # Per mille left after the 0.3% fee
+
+sys.path.insert(0, str(ROOT))
+# NOTE: DipDup takes the working directory for the package when its name matches `pyproject.toml`, as it
+# NOTE: does in the repository root; point it to the package so the script runs from any directory
+os.environ['DIPDUP_PACKAGE_PATH'] = str(PACKAGE)
+
+from defi_space_indexer.types.amm_factory.starknet_events.factory_initialized import (
+    FactoryInitializedPayload,
+)
+from defi_space_indexer.types.amm_factory.starknet_events.pair_created import PairCreatedPayload
+from defi_space_indexer.types.amm_pair.starknet_events.burn import BurnPayload
+from defi_space_indexer.types.amm_pair.starknet_events.mint import MintPayload
+from defi_space_indexer.types.amm_pair.starknet_events.swap import SwapPayload
+from defi_space_indexer.types.amm_pair.starknet_events.sync import SyncPayload
+from defi_space_indexer.types.farming_factory.starknet_events.powerplant_initialized import (
+    PowerplantInitializedPayload,
+)
+from defi_space_indexer.types.farming_factory.starknet_events.reactor_created import ReactorCreatedPayload
+from defi_space_indexer.types.farming_reactor.starknet_events.deposit import DepositPayload
+from defi_space_indexer.types.farming_reactor.starknet_events.harvest import HarvestPayload
+from defi_space_indexer.types.farming_reactor.starknet_events.reward_added import RewardAddedPayload
+from defi_space_indexer.types.farming_reactor.starknet_events.withdraw import WithdrawPayload
+
+# NOTE: (typename, event name) of every payload type, for the ABI encoder
+EVENTS: dict[type[BaseModel], tuple[str, str]] = {
+    FactoryInitializedPayload: ('amm_factory', 'FactoryInitialized'),
+    PairCreatedPayload: ('amm_factory', 'PairCreated'),
+    MintPayload: ('amm_pair', 'Mint'),
+    BurnPayload: ('amm_pair', 'Burn'),
+    SwapPayload: ('amm_pair', 'Swap'),
+    SyncPayload: ('amm_pair', 'Sync'),
+    PowerplantInitializedPayload: ('farming_factory', 'PowerplantInitialized'),
+    ReactorCreatedPayload: ('farming_factory', 'ReactorCreated'),
+    DepositPayload: ('farming_reactor', 'Deposit'),
+    WithdrawPayload: ('farming_reactor', 'Withdraw'),
+    HarvestPayload: ('farming_reactor', 'Harvest'),
+    RewardAddedPayload: ('farming_reactor', 'RewardAdded'),
+}
+
+
+def parse_mix(value: str) -> dict[str, float]:
+    mix = {}
+    for item in value.split(','):
+        kind, _, weight = item.partition('=')
+        if kind.strip() not in ('swap', 'sync', 'mint', 'burn', 'deposit', 'withdraw', 'harvest', 'reward_added'):
+            raise argparse.ArgumentTypeError(f'Unknown event kind `{kind}`')
+        mix[kind.strip()] = float(weight)
+    return mix
+
+
+class Zipf:
+    """Items picked with probability proportional to 1 / rank."""
+
+    def __init__(self, items: list[Any], rng: random.Random) -> None:
+        self.items = items
+        self._rng = rng
+        self._weights = list(accumulate(1 / rank for rank in range(1, len(items) + 1)))
+
+    def pick(self) -> Any:
+        return self.items[bisect_left(self._weights, self._rng.random() * self._weights[-1])]
+
+
+class Stream:
+    """Synthetic events as (level, [(address, payload), ...]) in chain order, with consistent state."""
+
+    def __init__(self, factory: int, powerplant: int, args: argparse.Namespace) -> None:
+        self._rng = rng = random.Random(args.seed)
+        self.factory = factory
+        self.levels: list[tuple[int, list[tuple[int, BaseModel]]]] = []
+        self.pairs = [rng.getrandbits(250) for _ in range(args.pairs)]
+        self.reactors = [rng.getrandbits(250) for _ in range(min(args.reactors, args.pairs))]
+        self._users = Zipf([rng.getrandbits(250) for _ in range(args.users)], rng)
+        self._pairs = Zipf(self.pairs, rng)
+        self._reactors = Zipf(self.reactors, rng)
+        self._reserves = {pair: [0, 0] for pair in self.pairs}
+        self._supply = dict.fromkeys(self.pairs, 0)
+        self._liquidity: dict[tuple[int, int], int] = defaultdict(int)
+        self._staked: dict[tuple[int, int], int] = defaultdict(int)
+        self._total_staked = dict.fromkeys(self.reactors, 0)
+        self._reward_per_token = dict.fromkeys(self.reactors, 0)
+        self._rewards: dict[int, list[int]] = {reactor: [] for reactor in self.reactors}
+
+        self._level = FIRST_LEVEL
+        self._events: list[tuple[int, BaseModel]] = [
+            (factory, FactoryInitializedPayload(
+                factory_address=factory, owner=0x1, fee_to=0x2, pair_contract_class_hash=0x3,
+                block_timestamp=self.timestamp,
+            )),
+            (powerplant, PowerplantInitializedPayload(
+                powerplant=powerplant, owner=0x1, reactor_class_hash=0x4, block_timestamp=self.timestamp,
+            )),
+        ]
+        for i, pair in enumerate(self.pairs):
+            self._emit(factory, PairCreatedPayload(
+                token0=0x100 + 2 * i, token1=0x101 + 2 * i, pair=pair, total_pairs=i + 1,
+                pair_contract_class_hash=0x3, factory_address=factory, block_timestamp=self.timestamp,
+            ), args.events_per_level)
+        for i, (reactor, pair) in enumerate(zip(self.reactors, self.pairs[: len(self.reactors)], strict=True)):
+            self._emit(powerplant, ReactorCreatedPayload(
+                reactor=reactor, lp_token=pair, powerplant=powerplant, penalty_duration=86400,
+                withdraw_penalty=500, multiplier=100, penalty_receiver=0x5, reactor_index=i,
+                reactor_count=i + 1, block_timestamp=self.timestamp,
+            ), args.events_per_level)
+        self._next_level()
+
+        generators = {
+            'swap': self._swap, 'sync': self._sync, 'mint': self._mint, 'burn': self._burn,
+            'deposit': self._deposit, 'withdraw': self._withdraw, 'harvest': self._harvest,
+            'reward_added': self._reward_added,
+        }
+        kinds = [kind for kind, weight in args.mix.items() if weight > 0]
+        weights = [args.mix[kind] for kind in kinds]
+        for _ in range(args.levels):
+            while len(self._events) < args.events_per_level:
+                generators[rng.choices(kinds, weights)[0]]()
+            self._next_level()
+
+    @property
+    def timestamp(self) -> int:
+        return FIRST_TIMESTAMP + (self._level - FIRST_LEVEL) * BLOCK_TIME
+
+    @property
+    def count(self) -> int:
+        return sum(len(events) for _, events in self.levels)
+
+    def _emit(self, address: int, payload: BaseModel, per_level: int | None = None) -> None:
+        self._events.append((address, payload))
+        if per_level and len(self._events) >= per_level:
+            self._next_level()
+
+    def _next_level(self) -> None:
+        if self._events:
+            self.levels.append((self._level, self._events))
+        self._events = []
+        self._level += 1
+
+    def _amount(self) -> int:
+        return int(10 ** self._rng.uniform(15, 21))
+
+    def _sync(self, pair: int | None = None) -> None:
+        pair = pair or self._pairs.pick()
+        reserve0, reserve1 = self._reserves[pair]
+        self._emit(pair, SyncPayload(
+            balance0=reserve0, balance1=reserve1, reserve0=reserve0, reserve1=reserve1,
+            price_0_cumulative_last=0, price_1_cumulative_last=0, factory_address=self.factory,
+            block_timestamp=self.timestamp,
+        ))
+
+    def _mint(self, pair: int | None = None) -> None:
+        pair, user = pair or self._pairs.pick(), self._users.pick()
+        reserves, supply = self._reserves[pair], self._supply[pair]
+        amount0 = self._amount()
+        if supply:
+            amount1 = amount0 * reserves[1] // reserves[0] + 1
+            liquidity = amount0 * supply // reserves[0]
+        else:
+            amount1 = self._amount()
+            liquidity = math.isqrt(amount0 * amount1)
+        reserves[0] += amount0
+        reserves[1] += amount1
+        self._supply[pair] = supply = supply + liquidity
+        self._liquidity[pair, user] += liquidity
+        self._sync(pair)
+        self._emit(pair, MintPayload(
+            sender=user, amount0=amount0, amount1=amount1, balance0=reserves[0], balance1=reserves[1],
+            reserve0=reserves[0], reserve1=reserves[1], user_liquidity=self._liquidity[pair, user],
+            total_liquidity=supply, total_supply=supply, factory_address=self.factory,
+            block_timestamp=self.timestamp,
+        ))
+
+    def _burn(self) -> None:
+        pair, user = self._pairs.pick(), self._users.pick()
+        if not self._liquidity[pair, user]:
+            self._mint(pair)
+            return
+        reserves, supply = self._reserves[pair], self._supply[pair]
+        liquidity = self._liquidity[pair, user] * self._rng.randint(1, 100) // 100
+        amount0, amount1 = liquidity * reserves[0] // supply, liquidity * reserves[1] // supply
+        reserves[0] -= amount0
+        reserves[1] -= amount1
+        self._supply[pair] = supply = supply - liquidity
+        self._liquidity[pair, user] -= liquidity
+        self._sync(pair)
+        self._emit(pair, BurnPayload(
+            sender=user, amount0=amount0, amount1=amount1, balance0=reserves[0], balance1=reserves[1],
+            reserve0=reserves[0], reserve1=reserves[1], user_liquidity=self._liquidity[pair, user],
+            total_liquidity=supply, total_supply=supply, factory_address=self.factory,
+            block_timestamp=self.timestamp,
+        ))
+
+    def _swap(self) -> None:
+        pair, user = self._pairs.pick(), self._users.pick()
+        reserves = self._reserves[pair]
+        if not reserves[0]:
+            self._mint(pair)
+            return
+        i = self._rng.randint(0, 1)
+        amount_in = reserves[i] * self._rng.randint(1, 20) // 1000 + 1
+        amount_out = amount_in * SWAP_FEE * reserves[1 - i] // (reserves[i] * 1000 + amount_in * SWAP_FEE)
+        reserves[i] += amount_in
+        reserves[1 - i] -= amount_out
+        amounts_in, amounts_out = [0, 0], [0, 0]
+        amounts_in[i], amounts_out[1 - i] = amount_in, amount_out
+        self._sync(pair)
+        self._emit(pair, SwapPayload(
+            sender=user, amount0_in=amounts_in[0], amount1_in=amounts_in[1], amount0_out=amounts_out[0],
+            amount1_out=amounts_out[1], balance0=reserves[0], balance1=reserves[1], reserve0=reserves[0],
+            reserve1=reserves[1], factory_address=self.factory, block_timestamp=self.timestamp,
+        ))
+
+    def _deposit(self, reactor: int | None = None, user: int | None = None) -> None:
+        reactor, user = reactor or self._reactors.pick(), user or self._users.pick()
+        amount = self._amount()
+        self._staked[reactor, user] += amount
+        self._total_staked[reactor] += amount
+        self._emit(reactor, DepositPayload(
+            user_address=user, staked_amount=amount, total_staked=self._total_staked[reactor],
+            user_staked=self._staked[reactor, user], multiplier=100, penalty_end_time=self.timestamp + 86400,
+            block_timestamp=self.timestamp,
+        ))
+
+    def _withdraw(self) -> None:
+        reactor, user = self._reactors.pick(), self._users.pick()
+        if not self._staked[reactor, user]:
+            self._deposit(reactor, user)
+            return
+        amount = self._staked[reactor, user] * self._rng.randint(1, 100) // 100
+        self._staked[reactor, user] -= amount
+        self._total_staked[reactor] -= amount
+        self._emit(reactor, WithdrawPayload(
+            user_address=user, staked_amount=amount, penalty_amount=amount * 5 // 100,
+            total_staked=self._total_staked[reactor], user_staked=self._staked[reactor, user],
+            penalty_end_time=self.timestamp, block_timestamp=self.timestamp,
+        ))
+
+    def _harvest(self) -> None:
+        reactor, user = self._reactors.pick(), self._users.pick()
+        if not self._rewards[reactor]:
+            self._reward_added(reactor)
+            return
+        if not self._staked[reactor, user]:
+            self._deposit(reactor, user)
+            return
+        self._reward_per_token[reactor] += self._amount()
+        self._emit(reactor, HarvestPayload(
+            user_address=user, reward_token=self._rng.choice(self._rewards[reactor]), reward_amount=self._amount(),
+            total_staked=self._total_staked[reactor], user_staked=self._staked[reactor, user],
+            reward_per_token_stored=self._reward_per_token[reactor], block_timestamp=self.timestamp,
+        ))
+
+    def _reward_added(self, reactor: int | None = None) -> None:
+        reactor = reactor or self._reactors.pick()
+        token = self._rng.choice(REWARD_TOKENS)
+        if token not in self._rewards[reactor]:
+            self._rewards[reactor].append(token)
+        amount = self._amount()
+        self._emit(reactor, RewardAddedPayload(
+            reward_token=token, reward_amount=amount, reward_rate=amount // REWARD_DURATION,
+            reward_duration=REWARD_DURATION, period_finish=self.timestamp + REWARD_DURATION,
+            reward_per_token_stored=self._reward_per_token[reactor], unallocated_rewards=0,
+            block_timestamp=self.timestamp, rewarder=0x6,
+        ))
+
+
+class StatementCounter(logging.Handler):
+    """Counts statements sent by Tortoise; every client logs each query once at DEBUG."""
+
+    def __init__(self) -> None:
+        super().__init__(logging.DEBUG)
+        self.count = 0
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.count += 1
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+def load_config(workdir: Path, database: str, args: argparse.Namespace) -> Path:
+    """Write the project config without Hasura plus a database override; return the override."""
+    env_file = 'sqlite.env.default' if database == 'sqlite' else '.env.default'
+    for line in (PACKAGE / 'deploy' / env_file).read_text().splitlines():
+        if line and not line.startswith('#'):
+            key, _, value = line.partition('=')
+            os.environ.setdefault(key, value)
+    os.environ.update(
+        CONTRACT_INDEXES_MODE=args.mode,
+        NODE_URL='http://127.0.0.1:1',
+        # NOTE: Keep metrics hooks out of the measurement
+        METRICS_WINDOW=str(86400),
+    )
+    # NOTE: Hasura doesn't support SQLite and isn't used here anyway
+    config = re.sub(r'^hasura:\n(?:  .*\n)+', '', (PACKAGE / 'dipdup.yaml').read_text(), flags=re.MULTILINE)
+    (workdir / 'dipdup.yaml').write_text(config)
+
+    if database == 'sqlite':
+        database_config = f'database:\n  kind: sqlite\n  path: {workdir / "bench.sqlite"}\n'
+    else:
+        dsn = urlsplit(args.postgres)
+        database_config = (
+            'database:\n  kind: postgres\n'
+            f'  host: {dsn.hostname or "127.0.0.1"}\n  port: {dsn.port or 5432}\n'
+            f'  user: {dsn.username or "postgres"}\n  password: "{dsn.password or ""}"\n'
+            f'  database: {dsn.path.lstrip("/") or "postgres"}\n  schema_name: {SCHEMA}\n'
+        )
+    (workdir / 'database.yaml').write_text(database_config)
+    return workdir / 'database.yaml'
+
+
+async def drop_schema(args: argparse.Namespace) -> None:
+    import asyncpg
+
+    connection = await asyncpg.connect(args.postgres)
+    try:
+        await connection.execute(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE')
+    finally:
+        await connection.close()
+
+
+async def run(database: str, args: argparse.Namespace) -> dict[str, Any]:
+    from dipdup.config import DipDupConfig
+    from dipdup.context import DipDupContext
+    from dipdup.models.starknet import StarknetEventData
+    from dipdup.test import create_dummy_dipdup
+
+    logging.basicConfig(level=logging.WARNING)
+    latencies: dict[str, list[float]] = defaultdict(list)
+    fire_matched_handler = DipDupContext.fire_matched_handler
+
+    async def _fire_matched_handler(self: DipDupContext, handler: Any) -> None:
+        started_at = time.perf_counter()
+        await fire_matched_handler(self, handler)
+        latencies[handler.config.callback].append(time.perf_counter() - started_at)
+
+    DipDupContext.fire_matched_handler = _fire_matched_handler  # type: ignore[method-assign]
+
+    with tempfile.TemporaryDirectory(prefix='bench_handlers_') as tmp:
+        workdir = Path(tmp)
+        override = load_config(workdir, database, args)
+        if database == 'postgres':
+            await drop_schema(args)
+        config = DipDupConfig.load([workdir / 'dipdup.yaml', override], unsafe=True)
+
+        async with AsyncExitStack() as stack:
+            dipdup = await create_dummy_dipdup(config, stack)
+            ctx = dipdup._ctx
+            factory = int(config.get_starknet_contract('amm_factory').address, 16)
+            powerplant = int(config.get_starknet_contract('farming_factory').address, 16)
+            stream = Stream(factory, powerplant, args)
+
+            # NOTE: Encoded up front; the matcher decodes them back into the same payload types
+            ctx.package.load_abis()
+            abis = ctx.package._cairo_abis
+            encoded = []
+            for level, events in stream.levels:
+                level_events = []
+                for i, (address, payload) in enumerate(events):
+                    typename, name = EVENTS[type(payload)]
+                    abi = abis.get_event_abi(typename=typename, name=name)
+                    data = abi['serializer'].serialize(payload.model_dump())
+                    level_events.append((
+                        typename,
+                        StarknetEventData(
+                            level=level,
+                            block_hash=hex(level),
+                            transaction_index=i,
+                            transaction_hash=hex(level * 10_000 + i),
+                            timestamp=FIRST_TIMESTAMP + (level - FIRST_LEVEL) * BLOCK_TIME,
+                            from_address=hex(address),
+                            keys=(abi['event_identifier'],),
+                            data=tuple(hex(value) for value in data),
+                        ),
+                    ))
+                encoded.append((level, level_events))
+
+            indexes: dict[str, Any] = {}
+            by_template: dict[str, Any] = {}
+
+            def take_pending() -> None:
+                while not ctx._pending_indexes.empty():
+                    index = ctx._pending_indexes.get_nowait()
+                    contract = index._config.handlers[0].contract
+                    if contract.address:
+                        indexes[contract.address] = index
+                    else:
+                        by_template[contract.module_name] = index
+
+            for name in tuple(config.indexes):
+                await ctx._spawn_index(name)
+            take_pending()
+
+            counter = StatementCounter()
+            db_logger = logging.getLogger('tortoise.db_client')
+            db_logger.setLevel(logging.DEBUG)
+            db_logger.propagate = False
+            db_logger.addHandler(counter)
+
+            sync_level = encoded[-1][0]
+            level_latencies = []
+            started_at = time.perf_counter()
+            for _level, level_events in encoded:
+                grouped: dict[Any, list[Any]] = defaultdict(list)
+                for typename, event in level_events:
+                    index = indexes.get(event.from_address) or by_template[typename]
+                    grouped[index].append(event)
+                for index, index_events in grouped.items():
+                    index_started_at = time.perf_counter()
+                    await index._process_level_data(tuple(index_events), sync_level)
+                    level_latencies.append(time.perf_counter() - index_started_at)
+                take_pending()
+            seconds = time.perf_counter() - started_at
+            db_logger.removeHandler(counter)
+
+    handled = sum(len(values) for values in latencies.values())
+    return {
+        'database': database,
+        'mode': args.mode,
+        'events': stream.count,
+        'handled': handled,
+        'seconds': round(seconds, 2),
+        'events_per_second': round(stream.count / seconds, 1),
+        'level_p50_ms': round(percentile(level_latencies, 0.5) * 1000, 2),
+        'level_p99_ms': round(percentile(level_latencies, 0.99) * 1000, 2),
+        'statements_per_event': round(counter.count / stream.count, 2),
+        'handlers': {
+            callback: {
+                'count': len(values),
+                'p50_ms': round(percentile(values, 0.5) * 1000, 2),
+                'p99_ms': round(percentile(values, 0.99) * 1000, 2),
+            }
+            for callback, values in sorted(latencies.items())
+        },
+    }
+
+
+def report(result: dict[str, Any]) -> None:
+    print(
+        f"\n{result['database']} ({result['mode']}): {result['events']} events in {result['seconds']}s, "
+        f"{result['events_per_second']} events/s, {result['statements_per_event']} statements/event, "
+        f"index level p50 {result['level_p50_ms']} ms / p99 {result['level_p99_ms']} ms"
+    )
+    if result['handled'] != result['events']:
+        print(f"  only {result['handled']} events matched a handler")
+    print(f"  {'handler':<24}{'count':>8}{'p50 ms':>10}{'p99 ms':>10}")
+    for callback, stats in result['handlers'].items():
+        print(f"  {callback:<24}{stats['count']:>8}{stats['p50_ms']:>10}{stats['p99_ms']:>10}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--pairs', type=int, default=50)
+    parser.add_argument('--reactors', type=int, default=25, help='one per pair at most, staking its LP token')
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--levels', type=int, default=500)
+    parser.add_argument('--events-per-level', type=int, default=20)
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX), help=f'default: {DEFAULT_MIX}')
+    parser.add_argument('--mode', choices=('dynamic', 'multi'), default='dynamic', help='CONTRACT_INDEXES_MODE')
+    parser.add_argument('--postgres', help='DSN of a PostgreSQL database to run against too')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', action='store_true', help='print results as JSON lines')
+    parser.add_argument('--database', choices=('sqlite', 'postgres'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.database:
+        print(json.dumps(asyncio.run(run(args.database, args))))
+        return
+
+    # NOTE: One process per database; caches and buffers of the package are module-level
+    for database in ('sqlite', 'postgres') if args.postgres else ('sqlite',):
+        output = subprocess.run(
+            [sys.executable, __file__, *sys.argv[1:], '--database', database],
+            check=True,
+            stdout=subprocess.PIPE,
+            text=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        if args.json:
+            print(json.dumps(result))
+        else:
+            report(result)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,303 @@
+"""
+Historical sync from the node alone vs. from Subsquid and then the node, against local stand-ins.
+
+Serves a synthetic chain (factory, `--pairs` pairs, `--syncs` Sync events per pair over
+`--blocks` blocks) both as a Starknet JSON-RPC node and as a Subsquid archive lagging
+`--archive-lag` blocks behind it. The chain is indexed into a fresh SQLite database twice
+with `dipdup run`, once with `subsquid` removed from every index and template and once
+as configured. A run ends when every index reaches the head. Node requests are throttled
+by the `node` datasource's `ratelimit_rate`, as in production.
+
+    python scripts/bench_hybrid_sync.py --pairs 100 --blocks 5000
+
+Compare `seconds` and request counts of both runs. Final pair reserves must match the
+chain in both, so a gap at the archive/node handoff fails the run.
+"""
+import argparse
+import asyncio
+import os
+import random
+import re
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import Counter
+from decimal import Decimal
+from pathlib import Path
+
+from aiohttp import web
+from starknet_py.hash.selector import get_selector_from_name
+
+ROOT = Path(__file__).resolve().parent.parent
+PACKAGE = ROOT / 'defi_space_indexer'
+FACTORY = 0x21A5BEA2DF843545653AB364EE8AF85A958CEB7202522E7656DE6C5EBA15416
+TOKEN0, TOKEN1 = 0x111, 0x222
+FIRST_LEVEL = 545030
+ARCHIVE_CHUNK = 10000  # Blocks scanned per archive query, like a Subsquid worker
+RUN_TIMEOUT = 900
+
+
+def u256(value: int) -> list[int]:
+    return [value & (2**128 - 1), value >> 128]
+
+
+def timestamp(level: int) -> int:
+    return 1_700_000_000 + (level - FIRST_LEVEL) * 6
+
+
+class Chain:
+    """Synthetic events as (level, transaction index, address, selector, data), in chain order."""
+
+    def __init__(self, pairs: int, syncs: int, blocks: int, seed: int) -> None:
+        rng = random.Random(seed)
+        self.head = FIRST_LEVEL + blocks
+        self.pairs = [0x10000 + i for i in range(pairs)]
+        self.reserves: dict[int, int] = {}
+        events = [(FIRST_LEVEL, 0, FACTORY, 'FactoryInitialized', [FACTORY, 0x1, 0x2, 0x3, timestamp(FIRST_LEVEL)])]
+        for i, pair in enumerate(self.pairs):
+            created = FIRST_LEVEL + 1 + i * (blocks // 2) // pairs
+            data = [TOKEN0, TOKEN1, pair, i + 1, 0x3, FACTORY, timestamp(created)]
+            events.append((created, 0, FACTORY, 'PairCreated', data))
+            levels = sorted(rng.randrange(created + 1, self.head + 1) for _ in range(syncs))
+            for n, level in enumerate(levels):
+                reserve0, reserve1 = (i + 1) * 1000 + n, 10**18
+                # NOTE: balance0, balance1, reserve0, reserve1, cumulative prices, factory, timestamp
+                balances = u256(reserve0) + u256(reserve1)
+                data = balances + balances + u256(0) + u256(0) + [FACTORY, timestamp(level)]
+                events.append((level, i + 1, pair, 'Sync', data))
+                self.reserves[pair] = reserve0
+        self.events = sorted(
+            (level, tx, address, get_selector_from_name(name), data) for level, tx, address, name, data in events
+        )
+
+    def select(self, first: int, last: int, addresses: set[int] | None, keys: set[int] | None) -> list[tuple]:
+        return [
+            event
+            for event in self.events
+            if first <= event[0] <= last
+            and (addresses is None or event[2] in addresses)
+            and (keys is None or event[3] in keys)
+        ]
+
+
+class StandIn:
+    """Starknet node (`/rpc`), Subsquid archive (`/archive`) and DexScreener (`/dexscreener`)."""
+
+    def __init__(self, chain: Chain, archive_lag: int) -> None:
+        self.chain = chain
+        self.archive_head = chain.head - archive_lag
+        self.calls: Counter[str] = Counter()
+        self.app = web.Application()
+        self.app.router.add_post('/rpc/{tail:.*}', self.rpc)
+        self.app.router.add_get('/archive/height', self.height)
+        self.app.router.add_get('/archive/{level}/worker', self.worker)
+        self.app.router.add_post('/archive/worker', self.query)
+        self.app.router.add_get('/dexscreener/{tail:.*}', self.dexscreener)
+
+    async def rpc(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        method, params = body['method'], body.get('params') or {}
+        self.calls[method] += 1
+        if method == 'starknet_blockNumber':
+            result: object = self.chain.head
+        elif method == 'starknet_getEvents':
+            result = self._get_events(params['filter'])
+        elif method == 'starknet_getBlockWithTxHashes':
+            result = self._get_block(int(params['block_id']['block_hash'], 16))
+        elif method == 'starknet_chainId':
+            result = '0x534e5f4d41494e'
+        else:
+            result = None
+        return web.json_response({'jsonrpc': '2.0', 'id': body.get('id'), 'result': result})
+
+    def _get_events(self, filter_: dict) -> dict:
+        address = {int(filter_['address'], 16)} if filter_.get('address') else None
+        keys = {int(key, 16) for key in filter_['keys'][0]} if filter_.get('keys') and filter_['keys'][0] else None
+        last = min(filter_['to_block']['block_number'], self.chain.head)
+        events = self.chain.select(filter_['from_block']['block_number'], last, address, keys)
+        start = int(filter_.get('continuation_token') or 0)
+        end = start + filter_['chunk_size']
+        return {
+            'events': [
+                {
+                    'from_address': hex(address),
+                    'keys': [hex(selector)],
+                    'data': [hex(value) for value in data],
+                    'block_hash': hex(level),
+                    'block_number': level,
+                    'transaction_hash': hex(level * 100000 + tx),
+                }
+                for level, tx, address, selector, data in events[start:end]
+            ],
+            'continuation_token': str(end) if end < len(events) else None,
+        }
+
+    def _get_block(self, level: int) -> dict:
+        return {
+            'status': 'ACCEPTED_ON_L2',
+            'block_hash': hex(level),
+            'parent_hash': hex(level - 1),
+            'block_number': level,
+            'new_root': '0x1',
+            'timestamp': timestamp(level),
+            'sequencer_address': '0x1',
+            'l1_gas_price': {'price_in_fri': '0x1', 'price_in_wei': '0x1'},
+            'l1_data_gas_price': {'price_in_fri': '0x1', 'price_in_wei': '0x1'},
+            'l1_da_mode': 'BLOB',
+            'starknet_version': '0.13.2',
+            'transactions': [hex(level * 100000 + tx) for tx in range(len(self.chain.pairs) + 1)],
+        }
+
+    async def height(self, request: web.Request) -> web.Response:
+        self.calls['archive_height'] += 1
+        return web.Response(text=str(self.archive_head))
+
+    async def worker(self, request: web.Request) -> web.Response:
+        return web.Response(text=f'{request.url.origin()}/archive/worker')
+
+    async def query(self, request: web.Request) -> web.Response:
+        self.calls['archive_query'] += 1
+        query = await request.json()
+        first = query['fromBlock']
+        last = min(query['toBlock'], self.archive_head, first + ARCHIVE_CHUNK - 1)
+        blocks: dict[int, dict] = {}
+        for request_ in query.get('events', []):
+            addresses = {int(address, 16) for address in request_['fromAddress']} if 'fromAddress' in request_ else None
+            keys = {int(key, 16) for key in request_['key0']} if 'key0' in request_ else None
+            for level, tx, address, selector, data in self.chain.select(first, last, addresses, keys):
+                block = blocks.setdefault(level, self._header(level))
+                block['events'].append(
+                    {
+                        'transactionIndex': tx,
+                        'fromAddress': hex(address),
+                        'keys': [hex(selector)],
+                        'data': [hex(value) for value in data],
+                    }
+                )
+                if not any(t['transactionIndex'] == tx for t in block['transactions']):
+                    block['transactions'].append({'transactionIndex': tx, 'transactionHash': hex(level * 100000 + tx)})
+        # NOTE: The last scanned block is always returned so that the client moves on
+        blocks.setdefault(last, self._header(last))
+        for block in blocks.values():
+            block['events'].sort(key=lambda event: event['transactionIndex'])
+            block['transactions'].sort(key=lambda transaction: transaction['transactionIndex'])
+        return web.json_response([blocks[level] for level in sorted(blocks)])
+
+    def _header(self, level: int) -> dict:
+        header = {'number': level, 'hash': hex(level), 'timestamp': timestamp(level)}
+        return {'header': header, 'events': [], 'transactions': []}
+
+    async def dexscreener(self, request: web.Request) -> web.Response:
+        return web.json_response([])
+
+
+async def run(name: str, config: Path, stand_in: StandIn, url: str, workdir: Path) -> dict[str, object]:
+    database = workdir / f'{name}.sqlite'
+    env = dict(os.environ)
+    for line in (PACKAGE / 'deploy' / 'sqlite.env.default').read_text().splitlines():
+        if line and not line.startswith('#'):
+            key, _, value = line.partition('=')
+            env.setdefault(key, value)
+    env.update(
+        NODE_URL=f'{url}/rpc',
+        NODE_API_KEY='key',
+        SUBSQUID_URL=f'{url}/archive',
+        DEXSCREENER_URL=f'{url}/dexscreener',
+        SQLITE_PATH=str(database),
+        PYTHONPATH=os.pathsep.join(filter(None, (str(ROOT), env.get('PYTHONPATH')))),
+    )
+    stand_in.calls.clear()
+    expected = len(stand_in.chain.pairs) + 2
+    started_at = time.monotonic()
+    with (workdir / f'{name}.log').open('w') as log:
+        process = await asyncio.create_subprocess_exec(
+            sys.executable,
+            '-m',
+            'dipdup',
+            '-c',
+            str(config),
+            '-c',
+            str(PACKAGE / 'configs' / 'dipdup.sqlite.yaml'),
+            'run',
+            cwd=workdir,
+            env=env,
+            stdout=log,
+            stderr=asyncio.subprocess.STDOUT,
+        )
+        synced = 0
+        try:
+            while synced < expected:
+                if process.returncode is not None:
+                    tail = ''.join(Path(log.name).read_text().splitlines(keepends=True)[-20:])
+                    raise RuntimeError(f'`{name}` run exited with {process.returncode}:\n{tail}')
+                if time.monotonic() - started_at > RUN_TIMEOUT:
+                    raise TimeoutError(f'`{name}` run did not reach the head in {RUN_TIMEOUT}s')
+                await asyncio.sleep(0.5)
+                synced = count_synced(database, stand_in.chain.head)
+        finally:
+            seconds = time.monotonic() - started_at
+            if process.returncode is None:
+                process.terminate()
+                await process.wait()
+
+    reserves = read_reserves(database)
+    wrong = sum(1 for pair, reserve in stand_in.chain.reserves.items() if reserves.get(pair) != reserve)
+    if wrong:
+        raise AssertionError(f'`{name}` run: {wrong} pairs have wrong reserves')
+    return {'run': name, 'seconds': round(seconds, 1), **dict(sorted(stand_in.calls.items()))}
+
+
+def count_synced(database: Path, head: int) -> int:
+    if not database.exists():
+        return 0
+    try:
+        with sqlite3.connect(f'file:{database}?mode=ro', uri=True) as connection:
+            return connection.execute('SELECT COUNT(*) FROM dipdup_index WHERE level >= ?', (head,)).fetchone()[0]
+    except sqlite3.OperationalError:
+        return 0
+
+
+def read_reserves(database: Path) -> dict[int, int]:
+    with sqlite3.connect(database) as connection:
+        rows = connection.execute('SELECT address, reserve0 FROM pair').fetchall()
+    return {int.from_bytes(address, 'big'): int(Decimal(str(reserve))) for address, reserve in rows}
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--pairs', type=int, default=100)
+    parser.add_argument('--syncs', type=int, default=5, help='Sync events per pair')
+    parser.add_argument('--blocks', type=int, default=5000)
+    parser.add_argument('--archive-lag', type=int, default=50, help='blocks the archive is behind the node')
+    parser.add_argument('--port', type=int, default=8650)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    stand_in = StandIn(Chain(args.pairs, args.syncs, args.blocks, args.seed), args.archive_lag)
+    runner = web.AppRunner(stand_in.app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, '127.0.0.1', args.port).start()
+    url = f'http://127.0.0.1:{args.port}'
+
+    with tempfile.TemporaryDirectory(prefix='bench_hybrid_sync_') as tmp:
+        workdir = Path(tmp)
+        # NOTE: Hasura doesn't support SQLite
+        config = re.sub(r'^hasura:\n(?:  .*\n)+', '', (PACKAGE / 'dipdup.yaml').read_text(), flags=re.MULTILINE)
+        hybrid = workdir / 'dipdup.hybrid.yaml'
+        hybrid.write_text(config)
+        node = workdir / 'dipdup.node.yaml'
+        node.write_text(re.sub(r'^\s+- subsquid\n', '', config, flags=re.MULTILINE))
+        print(
+            f'{args.pairs} pairs, {len(stand_in.chain.events)} events over {args.blocks} blocks, '
+            f'archive {args.archive_lag} blocks behind'
+        )
+        try:
+            for name, path in (('node', node), ('hybrid', hybrid)):
+                print(await run(name, path, stand_in, url, workdir))
+        finally:
+            await runner.cleanup()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,70 @@
+-- Lookup cost of hot handler/API queries before and after composite indexes.
+--
+-- Builds throwaway copies of `liquidity_position` and `swap_event` in a scratch schema,
+-- runs the lookups handlers and Hasura issue, adds the indexes declared in models and
+-- runs them again. Nothing outside of the scratch schema is touched. Addresses are
+-- 32-byte `BYTEA` felts, as stored since `migrations/002_felt_hex.sql`.
+--
+--   psql "$DATABASE_URL" -v rows=1000000 -f scripts/bench_lookup_indexes.sql
+--
+-- Compare `Execution Time` of the same query in both passes.
+\set ON_ERROR_STOP on
+\if :{?rows}
+\else
+\set rows 1000000
+\endif
+
+DROP SCHEMA IF EXISTS bench_lookup CASCADE;
+CREATE SCHEMA bench_lookup;
+SET search_path TO bench_lookup;
+
+\echo 'Generating' :rows 'positions and' :rows 'swaps over 1000 pairs...'
+CREATE TABLE liquidity_position AS
+SELECT
+    g AS id,
+    decode(lpad(to_hex(g % 1000), 64, '0'), 'hex') AS pair_address,
+    decode(lpad(to_hex(g / 1000), 64, '0'), 'hex') AS user_address,
+    (random() * 1e18)::NUMERIC(100, 0) AS liquidity
+FROM generate_series(1, :rows) AS g;
+
+CREATE TABLE swap_event AS
+SELECT
+    g AS id,
+    decode(lpad(to_hex(g % 1000), 64, '0'), 'hex') AS pair_id,
+    1700000000 + g AS created_at,
+    (random() * 1e18)::NUMERIC(100, 0) AS amount0_in
+FROM generate_series(1, :rows) AS g;
+
+ALTER TABLE liquidity_position ADD PRIMARY KEY (id);
+ALTER TABLE swap_event ADD PRIMARY KEY (id);
+ANALYZE liquidity_position;
+ANALYZE swap_event;
+
+\set pair '(decode(lpad(to_hex(42), 64, ''0''), ''hex''))'
+\set user '(decode(lpad(to_hex(500), 64, ''0''), ''hex''))'
+
+\echo
+\echo '=== Without indexes ==='
+\echo '--- position lookup by (pair_address, user_address) ---'
+EXPLAIN (ANALYZE, BUFFERS, COSTS OFF)
+SELECT * FROM liquidity_position WHERE pair_address = :pair AND user_address = :user;
+\echo '--- last day of swaps of a pair by (pair_id, created_at) ---'
+EXPLAIN (ANALYZE, BUFFERS, COSTS OFF)
+SELECT * FROM swap_event WHERE pair_id = :pair AND created_at >= 1700000000 + :rows - 86400 ORDER BY created_at;
+
+ALTER TABLE liquidity_position ADD CONSTRAINT uid_liquidity_position_pair_address_user_address UNIQUE (pair_address, user_address);
+CREATE INDEX idx_swap_event_pair_id_created_at ON swap_event (pair_id, created_at);
+ANALYZE liquidity_position;
+ANALYZE swap_event;
+
+\echo
+\echo '=== With indexes ==='
+\echo '--- position lookup by (pair_address, user_address) ---'
+EXPLAIN (ANALYZE, BUFFERS, COSTS OFF)
+SELECT * FROM liquidity_position WHERE pair_address = :pair AND user_address = :user;
+\echo '--- last day of swaps of a pair by (pair_id, created_at) ---'
+EXPLAIN (ANALYZE, BUFFERS, COSTS OFF)
+SELECT * FROM swap_event WHERE pair_id = :pair AND created_at >= 1700000000 + :rows - 86400 ORDER BY created_at;
+
+RESET search_path;
+DROP SCHEMA bench_lookup CASCADE;
@@ -0,0 +1,198 @@
+import asyncio
+from collections import defaultdict
+from collections import deque
+from types import SimpleNamespace
+from typing import Any
+from typing import NamedTuple
+
+import pytest
+from starknet_py.net.client_models import EmittedEvent
+from starknet_py.net.client_models import EventsChunk
+
+from defi_space_indexer.hooks import contract_indexes
+from defi_space_indexer.hooks.contract_indexes import CatchUp
+from defi_space_indexer.hooks.contract_indexes import CatchUpBatch
+from defi_space_indexer.hooks.contract_indexes import MultiContractEventFetcher
+from defi_space_indexer.hooks.contract_indexes import MultiContractEventFetcherChannel
+
+KEY = 0x99
+TRACKED = 0xA
+UNTRACKED = 0xB
+
+
+class StubBlock(NamedTuple):
+    timestamp: int
+    transactions: list[int]
+
+
+class StubNode:
+    """Node datasource stand-in paging through a fixed list of events with integer continuation tokens."""
+
+    def __init__(self, events: list[EmittedEvent], page_size: int) -> None:
+        self.events = events
+        self.page_size = page_size
+        self.requests: list[dict[str, Any]] = []
+        self.blocks: list[int] = []
+
+    async def get_events(self, **kwargs: Any) -> EventsChunk:
+        self.requests.append(kwargs)
+        start = int(kwargs['continuation_token'] or 0)
+        end = start + self.page_size
+        levels = range(kwargs['first_level'], kwargs['last_level'] + 1)
+        events = [e for e in self.events if e.block_number in levels]
+        return EventsChunk(events[start:end], str(end) if end < len(events) else None)
+
+    async def get_block_with_tx_hashes(self, block_hash: int) -> StubBlock:
+        self.blocks.append(block_hash)
+        transactions = sorted({e.transaction_hash for e in self.events if e.block_hash == block_hash})
+        return StubBlock(block_hash * 10, transactions)
+
+
+def event(level: int, address: int, transaction: int = 0) -> EmittedEvent:
+    return EmittedEvent(
+        from_address=address,
+        keys=[KEY],
+        data=[level],
+        transaction_hash=level * 100 + transaction,
+        block_hash=level,
+        block_number=level,
+    )
+
+
+def make_channel(node: StubNode, buffer: defaultdict[int, deque[Any]]) -> MultiContractEventFetcherChannel:
+    return MultiContractEventFetcherChannel(
+        buffer=buffer,
+        filter={(None, (hex(KEY),))},
+        first_level=1,
+        last_level=10,
+        datasources=(node,),  # type: ignore[arg-type]
+        index='test',
+        addresses=frozenset({TRACKED}),
+    )
+
+
+async def test_untracked_events_are_dropped() -> None:
+    node = StubNode([event(1, TRACKED), event(2, UNTRACKED), event(3, TRACKED, 1), event(3, UNTRACKED)], page_size=10)
+    buffer: defaultdict[int, deque[Any]] = defaultdict(deque)
+    channel = make_channel(node, buffer)
+
+    await channel.fetch()
+
+    assert node.requests[0]['address'] is None
+    assert node.requests[0]['keys'] == [[hex(KEY)], [], []]
+    assert {level: [e.from_address for e in events] for level, events in buffer.items()} == {
+        1: [hex(TRACKED)],
+        3: [hex(TRACKED)],
+    }
+    # NOTE: Blocks are looked up for tracked events only
+    assert node.blocks == [1, 3]
+    assert buffer[3][0].transaction_index == 1
+    assert channel.fetched
+
+
+async def test_pages_keep_levels_whole() -> None:
+    node = StubNode([event(1, TRACKED), event(2, TRACKED), event(2, UNTRACKED, 1), event(2, TRACKED, 2)], page_size=2)
+    buffer: defaultdict[int, deque[Any]] = defaultdict(deque)
+    channel = make_channel(node, buffer)
+
+    # NOTE: The page ends within level 2, so only level 1 is complete
+    await channel.fetch()
+    assert channel.head == 1
+    assert node.requests[0]['continuation_token'] is None
+
+    await channel.fetch()
+    assert node.requests[1]['continuation_token'] == '2'
+    assert channel.fetched
+    assert len(buffer[2]) == 2
+
+
+async def test_fetcher_yields_levels_in_order() -> None:
+    node = StubNode(
+        [event(1, TRACKED), event(2, UNTRACKED), event(3, TRACKED, 1), event(3, TRACKED), event(4, UNTRACKED)],
+        page_size=1,
+    )
+    fetcher = MultiContractEventFetcher(
+        name='test',
+        datasources=(node,),  # type: ignore[arg-type]
+        first_level=1,
+        last_level=10,
+        key0s={hex(KEY)},
+        addresses=frozenset({TRACKED}),
+    )
+
+    levels = [(level, [e.transaction_index for e in events]) async for level, events in fetcher.fetch_by_level()]
+
+    assert levels == [(1, [0]), (3, [0, 1])]
+    assert len(node.requests) == 5
+
+
+class StubIndex:
+    """Dynamic index stand-in with what `CatchUp.join` looks at."""
+
+    def __init__(self, address: int, level: int = 0) -> None:
+        self.address = address
+        self.is_active = True
+        self.state = SimpleNamespace(level=level)
+
+
+class RecordingCatchUp(CatchUp):
+    """`CatchUp` recording its batches instead of fetching their events."""
+
+    def __init__(self) -> None:
+        super().__init__('pair_events')
+        self.archive_level = 10_000
+        self.batches: list[tuple[str, list[int]]] = []
+        self.error: Exception | None = None
+
+    async def _synchronize(self, batch: CatchUpBatch, source: str) -> None:
+        if self.error:
+            raise self.error
+        self.batches.append((source, sorted(batch.indexes)))
+
+
+@pytest.fixture
+def catch_up() -> RecordingCatchUp:
+    return RecordingCatchUp()
+
+
+async def join(catch_up: RecordingCatchUp, indexes: list[StubIndex], source: str) -> list[bool]:
+    catch_up.indexes = indexes  # type: ignore[assignment]
+    return await asyncio.gather(*(catch_up.join(index, source, 100) for index in indexes))  # type: ignore[arg-type]
+
+
+async def test_lagging_indexes_join_one_batch(catch_up: RecordingCatchUp) -> None:
+    indexes = [StubIndex(address) for address in (1, 2, 3)]
+
+    assert await join(catch_up, indexes, 'subsquid') == [True, True, True]
+    assert catch_up.batches == [('subsquid', [1, 2, 3])]
+    assert not catch_up._batches
+
+
+async def test_batch_starts_without_stragglers(catch_up: RecordingCatchUp, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(contract_indexes, 'CATCH_UP_WAIT', 0.05)
+    catch_up.indexes = [StubIndex(address) for address in (1, 2, 3)]  # type: ignore[assignment]
+
+    # NOTE: The third index is expected, but never joins
+    joined = catch_up.indexes[:2]
+    assert await asyncio.gather(*(catch_up.join(index, 'subsquid', 100) for index in joined)) == [True, True]
+    assert catch_up.batches == [('subsquid', [1, 2])]
+
+
+async def test_small_node_batches_sync_alone(catch_up: RecordingCatchUp) -> None:
+    catch_up.archive_level = 0
+    indexes = [StubIndex(address) for address in range(contract_indexes.CATCH_UP_MIN_INDEXES - 1)]
+
+    assert await join(catch_up, indexes, 'node') == [False] * len(indexes)
+    assert catch_up.batches == []
+
+
+async def test_batch_failure_reaches_every_index(catch_up: RecordingCatchUp) -> None:
+    catch_up.error = RuntimeError('Node is down')
+    catch_up.indexes = [StubIndex(address) for address in (1, 2)]  # type: ignore[assignment]
+
+    results = await asyncio.gather(
+        *(catch_up.join(index, 'subsquid', 100) for index in catch_up.indexes),  # type: ignore[arg-type]
+        return_exceptions=True,
+    )
+    assert [str(result) for result in results] == ['Node is down', 'Node is down']
+    assert not catch_up._batches
@@ -0,0 +1,153 @@
+import asyncio
+from collections.abc import AsyncIterator
+from decimal import Decimal
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from defi_space_indexer.hooks import dexscreener
+from defi_space_indexer.hooks.dexscreener import DexScreenerClient
+
+QUOTE_TOKEN = '0xfff'
+
+
+class StubDexScreener:
+    """DexScreener stand-in: token `0xN` is worth N USD, quoted against `QUOTE_TOKEN`."""
+
+    def __init__(self) -> None:
+        self.url = ''
+        self.requests: list[list[str]] = []
+        self.statuses: list[int] = []
+        self.unpriced: set[str] = set()
+        self.delay = 0.0
+
+    async def tokens(self, request: web.Request) -> web.Response:
+        tokens = request.match_info['tokens'].split(',')
+        self.requests.append(tokens)
+        await asyncio.sleep(self.delay)
+        if self.statuses:
+            return web.Response(status=self.statuses.pop(0), headers={'Retry-After': '0'})
+        return web.json_response([self._pair(token) for token in tokens if token not in self.unpriced])
+
+    async def token_pairs(self, request: web.Request) -> web.Response:
+        token = request.match_info['token']
+        self.requests.append([token])
+        return web.json_response([self._pair(token)])
+
+    @staticmethod
+    def _pair(token: str) -> dict[str, object]:
+        price = str(int(token, 16))
+        return {
+            'chainId': 'starknet',
+            'pairAddress': '0x1',
+            # NOTE: Addresses come back zero-padded
+            'baseToken': {'address': f'0x{int(token, 16):064x}', 'name': token, 'symbol': token},
+            'quoteToken': {'address': QUOTE_TOKEN, 'name': 'USD', 'symbol': 'USD'},
+            'priceUsd': price,
+            'priceNative': price,
+            'liquidity': {},
+            'volume': {},
+        }
+
+
+@pytest.fixture
+async def stub() -> AsyncIterator[StubDexScreener]:
+    stub = StubDexScreener()
+    app = web.Application()
+    app.router.add_get('/tokens/v1/{chain}/{tokens}', stub.tokens)
+    app.router.add_get('/token-pairs/v1/{chain}/{token}', stub.token_pairs)
+    async with TestServer(app) as server:
+        stub.url = str(server.make_url(''))
+        yield stub
+
+
+@pytest.fixture
+async def client(stub: StubDexScreener, monkeypatch: pytest.MonkeyPatch) -> AsyncIterator[DexScreenerClient]:
+    monkeypatch.setattr(dexscreener, 'RETRY_BASE_DELAY', 0.0)
+    client = DexScreenerClient(url=stub.url, retries=2)
+    yield client
+    await client.close()
+
+
+async def test_prices_are_cached(stub: StubDexScreener, client: DexScreenerClient) -> None:
+    assert await client.get_token_prices('starknet', ['0x1', '0x2']) == {'0x1': Decimal(1), '0x2': Decimal(2)}
+    assert await client.get_token_prices('starknet', ['0x02', '0x1']) == {'0x02': Decimal(2), '0x1': Decimal(1)}
+
+    assert stub.requests == [['0x1', '0x2']]
+    assert (client.hits, client.misses) == (2, 2)
+
+
+async def test_unpriced_tokens_are_cached(stub: StubDexScreener, client: DexScreenerClient) -> None:
+    stub.unpriced.add('0x3')
+
+    assert await client.get_token_prices('starknet', ['0x3']) == {}
+    assert await client.get_token_prices('starknet', ['0x3']) == {}
+    assert len(stub.requests) == 1
+
+
+async def test_cache_expires(stub: StubDexScreener) -> None:
+    client = DexScreenerClient(url=stub.url, ttl=0)
+    try:
+        await client.get_token_prices('starknet', ['0x1'])
+        await client.get_token_prices('starknet', ['0x1'])
+    finally:
+        await client.close()
+
+    assert len(stub.requests) == 2
+
+
+async def test_tokens_are_requested_in_chunks(stub: StubDexScreener, client: DexScreenerClient) -> None:
+    tokens = [hex(i) for i in range(1, 2 * dexscreener.TOKENS_CHUNK_SIZE + 2)]
+
+    prices = await client.get_token_prices('starknet', tokens)
+
+    assert prices == {token: Decimal(int(token, 16)) for token in tokens}
+    chunk_size = dexscreener.TOKENS_CHUNK_SIZE
+    assert sorted(len(chunk) for chunk in stub.requests) == [1, chunk_size, chunk_size]
+
+
+async def test_concurrent_lookups_share_requests(stub: StubDexScreener, client: DexScreenerClient) -> None:
+    stub.delay = 0.05
+
+    first, second = await asyncio.gather(
+        client.get_token_prices('starknet', ['0x1', '0x2']),
+        client.get_token_prices('starknet', ['0x2', '0x3']),
+    )
+
+    assert first == {'0x1': Decimal(1), '0x2': Decimal(2)}
+    assert second == {'0x2': Decimal(2), '0x3': Decimal(3)}
+    assert stub.requests == [['0x1', '0x2'], ['0x3']]
+    assert client.stats()['inflight'] == 0
+
+
+async def test_retries_on_rate_limit_and_server_errors(stub: StubDexScreener, client: DexScreenerClient) -> None:
+    stub.statuses = [429, 503]
+
+    assert await client.get_token_prices('starknet', ['0x1']) == {'0x1': Decimal(1)}
+    assert len(stub.requests) == 3
+
+
+async def test_failed_requests_are_not_cached(stub: StubDexScreener, client: DexScreenerClient) -> None:
+    stub.statuses = [500, 500, 500]
+
+    assert await client.get_token_prices('starknet', ['0x1']) == {}
+    assert len(stub.requests) == 3
+
+    assert await client.get_token_prices('starknet', ['0x1']) == {'0x1': Decimal(1)}
+    assert len(stub.requests) == 4
+
+
+async def test_client_errors_are_not_retried(stub: StubDexScreener, client: DexScreenerClient) -> None:
+    stub.statuses = [404]
+
+    assert await client.get_token_prices('starknet', ['0x1']) == {}
+    assert len(stub.requests) == 1
+
+
+async def test_token_pairs_are_cached(stub: StubDexScreener, client: DexScreenerClient) -> None:
+    pairs = await client.get_token_pairs('starknet', '0x1')
+
+    assert pairs[0]['priceUsd'] == '1'
+    assert await client.get_token_pairs('starknet', '0x1') == pairs
+    assert len(stub.requests) == 1
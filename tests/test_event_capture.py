@@ -0,0 +1,130 @@
+import gzip
+from pathlib import Path
+from typing import Any
+
+import orjson
+import pytest
+
+from defi_space_indexer.hooks.event_capture import EventStore
+
+KEY = 0x99
+PAIR = 0xA
+REACTOR = 0xB
+
+
+def node_event(level: int, address: int, transaction: int, data: int = 0) -> dict[str, Any]:
+    return {
+        'block_number': level,
+        'block_hash': hex(level * 1000),
+        'transaction_hash': hex(transaction),
+        'from_address': hex(address),
+        'keys': [hex(KEY)],
+        'data': [hex(data)],
+    }
+
+
+def block(level: int, *transactions: int) -> dict[str, Any]:
+    return {
+        'kind': 'block',
+        'data': {
+            'block_hash': hex(level * 1000),
+            'block_number': level,
+            'timestamp': level * 10,
+            'transactions': {hex(transaction): index for index, transaction in enumerate(transactions)},
+        },
+    }
+
+
+def write_capture(path: Path, *records: dict[str, Any]) -> EventStore:
+    with gzip.open(path, 'wb') as file:
+        for record in records:
+            file.write(orjson.dumps(record) + b'\n')
+    store = EventStore(path)
+    store.load()
+    return store
+
+
+@pytest.fixture
+def store(tmp_path: Path) -> EventStore:
+    return write_capture(
+        tmp_path / 'capture.jsonl.gz',
+        # NOTE: A per-pair index and a coalesced catch-up fetched the same events
+        {'kind': 'events', 'data': [node_event(1, PAIR, 0x11), node_event(2, PAIR, 0x21)]},
+        {'kind': 'events', 'data': [node_event(1, PAIR, 0x11), node_event(1, REACTOR, 0x12)]},
+        # NOTE: Two identical events of one transaction are both kept
+        {'kind': 'events', 'data': [node_event(3, REACTOR, 0x31, 7), node_event(3, REACTOR, 0x31, 7)]},
+        {'kind': 'events', 'data': [node_event(4, PAIR, 0x41)]},
+        block(1, 0x12, 0x11),
+        block(2, 0x21),
+        block(3, 0x31),
+        {
+            'kind': 'archive',
+            'data': [
+                {
+                    'header': {'number': 2, 'hash': hex(2000), 'timestamp': 20},
+                    'transactions': [{'transactionIndex': 0, 'transactionHash': hex(0x21)}],
+                    'events': [
+                        {'transactionIndex': 0, 'fromAddress': hex(PAIR), 'keys': [hex(KEY)], 'data': ['0x0']},
+                        {'transactionIndex': 0, 'fromAddress': hex(PAIR), 'keys': ['0x1'], 'data': []},
+                    ],
+                },
+            ],
+        },
+        {'kind': 'call', 'method': 'starknet_chainId', 'params': [], 'result': '0x534e'},
+        # NOTE: Level 4 has no recorded block; level 5 wasn't reached by every index
+        {'kind': 'events', 'data': [node_event(5, PAIR, 0x51)]},
+        block(5, 0x51),
+        {'kind': 'head', 'level': 4},
+    )
+
+
+def test_events_are_deduplicated(store: EventStore) -> None:
+    assert [(e.level, e.transaction_index, hex(e.transaction_hash), e.from_address) for e in store.events] == [
+        (1, 0, '0x12', REACTOR),
+        (1, 1, '0x11', PAIR),
+        (2, 0, '0x21', PAIR),
+        (2, 0, '0x21', PAIR),
+        (3, 0, '0x31', REACTOR),
+        (3, 0, '0x31', REACTOR),
+    ]
+    # NOTE: The archive event with another key is the second one of level 2
+    assert store.events[3].keys == (1,)
+    assert store.calls[orjson.dumps(['starknet_chainId', []])] == '0x534e'
+
+
+def test_select_filters_levels_addresses_and_keys(store: EventStore) -> None:
+    assert [e.level for e in store.select(0, 100, None, None)] == [1, 1, 2, 2, 3, 3]
+    assert [e.level for e in store.select(2, 3, None, None)] == [2, 2, 3, 3]
+    assert [e.level for e in store.select(0, 100, {PAIR}, {KEY})] == [1, 2]
+    assert [e.from_address for e in store.select(1, 1, {PAIR, REACTOR}, None)] == [REACTOR, PAIR]
+    assert store.select(0, 100, {0xC}, None) == []
+
+
+def test_events_are_paged(store: EventStore) -> None:
+    filter_ = {
+        'from_block': {'block_number': 0},
+        'to_block': {'block_number': 100},
+        'keys': [[hex(KEY)]],
+        'chunk_size': 2,
+    }
+    first = store.get_events(filter_)
+    second = store.get_events({**filter_, 'continuation_token': first['continuation_token']})
+
+    assert [e['block_number'] for e in first['events']] == [1, 1]
+    assert first['continuation_token'] == '2'
+    assert [e['block_number'] for e in second['events']] == [2, 3]
+    assert second['continuation_token'] == '4'
+
+
+def test_blocks_keep_transaction_order(store: EventStore) -> None:
+    replayed = store.get_block(1000)
+
+    assert replayed['transactions'] == ['0x12', '0x11']
+    assert replayed['timestamp'] == 10
+    with pytest.raises(ValueError):
+        store.get_block(4000)
+
+
+def test_incomplete_capture_is_rejected(tmp_path: Path) -> None:
+    with pytest.raises(ValueError, match='incomplete'):
+        write_capture(tmp_path / 'capture.jsonl.gz', {'kind': 'events', 'data': [node_event(1, PAIR, 0x11)]})
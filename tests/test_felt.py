@@ -0,0 +1,80 @@
+from collections.abc import AsyncIterator
+
+import pytest
+from dipdup.database import generate_schema
+from dipdup.database import get_connection
+from dipdup.database import tortoise_wrapper
+from dipdup.transactions import TransactionManager
+
+from defi_space_indexer.models import Factory
+from defi_space_indexer.models import Pair
+from defi_space_indexer.models.felt import felt
+from defi_space_indexer.models.felt import felt_bytes
+
+TIMESTAMPS = {'created_at': 0, 'updated_at': 0}
+
+
+@pytest.fixture
+async def database() -> AsyncIterator[None]:
+    async with tortoise_wrapper('sqlite://:memory:', 'defi_space_indexer.models'), TransactionManager().register():
+        await generate_schema(get_connection(), 'public')
+        factory = await Factory.create(
+            address='0x1',
+            num_of_pairs=1,
+            owner=2,
+            fee_to='0x02',
+            pair_contract_class_hash='0x3',
+            **TIMESTAMPS,
+        )
+        await Pair.create(
+            address='0xA',
+            factory=factory,
+            factory_address='0x1',
+            token0_address='0x10',
+            token1_address='0x0011',
+            reserve0=1,
+            reserve1=2,
+            total_supply=1,
+            klast=0,
+            price_0_cumulative_last=0,
+            price_1_cumulative_last=0,
+            block_timestamp_last=0,
+            **TIMESTAMPS,
+        )
+        yield
+
+
+def test_felt_is_canonical() -> None:
+    assert felt('0xA') == felt(10) == '0x' + '0' * 63 + 'a'
+    assert felt_bytes('0x0a') == bytes(31) + b'\n'
+    with pytest.raises(ValueError):
+        felt(2**256)
+
+
+async def test_get_returns_hex(database: None) -> None:
+    pair = await Pair.get(address='0x00a')
+
+    assert pair.address == felt(0xA)
+    assert pair.token1_address == felt(0x11)
+    assert pair.factory_id == felt(1)
+    assert (await pair.factory).owner == felt(2)
+
+
+async def test_values_return_hex(database: None) -> None:
+    assert await Pair.filter(token0_address=0x10).values('address', 'factory_id', 'factory__owner') == [
+        {'address': felt(0xA), 'factory_id': felt(1), 'factory__owner': felt(2)},
+    ]
+
+
+async def test_values_list_return_hex(database: None) -> None:
+    assert await Pair.all().values_list('address', 'token0_address') == [(felt(0xA), felt(0x10))]
+    assert await Pair.all().values_list('factory__fee_to', flat=True) == [felt(2)]
+
+
+async def test_saved_changes_round_trip(database: None) -> None:
+    pair = await Pair.get(address='0xa')
+    pair.token0_address = '0x0000012'
+    await pair.save()
+
+    assert (await Pair.get(token0_address=0x12)).token0_address == felt(0x12)
+    assert await Pair.filter(token0_address='0x10').count() == 0
@@ -0,0 +1,178 @@
+import asyncio
+import time
+from collections.abc import AsyncIterator
+from collections.abc import Callable
+from typing import Any
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from defi_space_indexer.hooks.node_pool import DEFAULT_MIN_RATE
+from defi_space_indexer.hooks.node_pool import Endpoint
+from defi_space_indexer.hooks.node_pool import NodePool
+
+RATE = 1_000_000.0  # High enough for rate limits not to decide between endpoints
+RETRY_SLEEP = 0.05
+
+
+class StubNode:
+    """JSON-RPC node stand-in answering every call with its own name."""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.url = ''
+        self.calls = 0
+        self.statuses: list[int] = []
+        self.headers: dict[str, str] = {}
+        self.delay = 0.0
+
+    async def rpc(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.statuses:
+            return web.Response(status=self.statuses.pop(0), headers=self.headers)
+        return web.json_response({'jsonrpc': '2.0', 'id': payload['id'], 'result': self.name})
+
+
+@pytest.fixture
+async def nodes() -> AsyncIterator[tuple[StubNode, StubNode]]:
+    stubs = (StubNode('a'), StubNode('b'))
+    servers = []
+    for stub in stubs:
+        app = web.Application()
+        app.router.add_post('/', stub.rpc)
+        server = TestServer(app)
+        await server.start_server()
+        servers.append(server)
+        stub.url = str(server.make_url('/'))
+    yield stubs
+    for server in servers:
+        await server.close()
+
+
+@pytest.fixture
+async def make_pool() -> AsyncIterator[Callable[..., NodePool]]:
+    pools: list[NodePool] = []
+
+    def make_pool(
+        *stubs: StubNode,
+        retries: int = 1,
+        hedge_after: float = 0.0,
+        slow_after: float = 2.0,
+    ) -> NodePool:
+        pool = NodePool()
+        pool._retries = retries
+        pool._retry_sleep = RETRY_SLEEP
+        pool._hedge_after = hedge_after
+        pool.endpoints = [Endpoint(stub.url, stub.name, RATE, DEFAULT_MIN_RATE, RATE, slow_after) for stub in stubs]
+        pools.append(pool)
+        return pool
+
+    yield make_pool
+    for pool in pools:
+        await pool.__aexit__(None, None, None)
+
+
+async def call(pool: NodePool) -> Any:
+    response = await pool.request('post', '', json={'jsonrpc': '2.0', 'id': 1, 'method': 'starknet_blockNumber'})
+    return response['result']
+
+
+async def test_failed_calls_fail_over(nodes: tuple[StubNode, StubNode], make_pool: Callable[..., NodePool]) -> None:
+    a, b = nodes
+    a.statuses = [500]
+    pool = make_pool(a, b)
+    await pool.__aenter__()
+
+    assert await call(pool) == 'b'
+    assert (a.calls, b.calls) == (1, 1)
+    assert pool.endpoints[0].failures == 1
+
+    # NOTE: `a` is cooling down
+    assert await call(pool) == 'b'
+    assert a.calls == 1
+
+
+async def test_calls_fail_after_retries(nodes: tuple[StubNode, StubNode], make_pool: Callable[..., NodePool]) -> None:
+    a, b = nodes
+    a.statuses = [500]
+    b.statuses = [502]
+    pool = make_pool(a, b)
+    await pool.__aenter__()
+
+    with pytest.raises(aiohttp.ClientResponseError):
+        await call(pool)
+    assert (a.calls, b.calls) == (1, 1)
+
+
+async def test_faster_endpoint_gets_calls(nodes: tuple[StubNode, StubNode], make_pool: Callable[..., NodePool]) -> None:
+    a, b = nodes
+    a.delay = 0.05
+    pool = make_pool(a, b)
+    await pool.__aenter__()
+
+    results = [await call(pool) for _ in range(5)]
+
+    # NOTE: `a` is tried first; once both latencies are known every call goes to `b`
+    assert results == ['a', 'b', 'b', 'b', 'b']
+    endpoint_a, endpoint_b = pool.endpoints
+    assert endpoint_a.latency is not None and endpoint_b.latency is not None
+    assert endpoint_b.latency < endpoint_a.latency
+
+
+async def test_slow_responses_lower_rate(nodes: tuple[StubNode, StubNode], make_pool: Callable[..., NodePool]) -> None:
+    a, _ = nodes
+    a.delay = 0.05
+    pool = make_pool(a, slow_after=0.01)
+    await pool.__aenter__()
+
+    await call(pool)
+
+    assert pool.endpoints[0].rate < RATE
+
+
+async def test_throttled_endpoint_is_banned(nodes: tuple[StubNode, StubNode], make_pool: Callable[..., NodePool]) -> None:
+    a, b = nodes
+    a.statuses = [429]
+    a.headers = {'Retry-After': '0.2'}
+    b.delay = 0.02
+    pool = make_pool(a, b)
+    await pool.__aenter__()
+
+    assert await call(pool) == 'b'
+    endpoint_a = pool.endpoints[0]
+    assert endpoint_a.rate == RATE / 2
+    assert endpoint_a.ready_at(time.monotonic()) > time.monotonic() + 0.1
+
+    assert await call(pool) == 'b'
+    await asyncio.sleep(0.2)
+    assert await call(pool) == 'a'
+
+
+async def test_failed_endpoint_recovers(nodes: tuple[StubNode, StubNode], make_pool: Callable[..., NodePool]) -> None:
+    a, b = nodes
+    a.statuses = [500]
+    b.delay = 0.02
+    pool = make_pool(a, b)
+    await pool.__aenter__()
+
+    assert await call(pool) == 'b'
+    await asyncio.sleep(RETRY_SLEEP)
+
+    assert await call(pool) == 'a'
+    assert pool.endpoints[0].failures == 0
+
+
+async def test_slow_calls_are_hedged(nodes: tuple[StubNode, StubNode], make_pool: Callable[..., NodePool]) -> None:
+    a, b = nodes
+    a.delay = 1.0
+    pool = make_pool(a, b, hedge_after=0.05)
+    await pool.__aenter__()
+
+    started_at = time.monotonic()
+    assert await call(pool) == 'b'
+    assert time.monotonic() - started_at < a.delay
+    assert (a.calls, b.calls) == (1, 1)
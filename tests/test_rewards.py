@@ -0,0 +1,132 @@
+from collections.abc import AsyncIterator
+from decimal import Decimal
+from typing import Any
+
+import pytest
+from dipdup.database import generate_schema
+from dipdup.database import get_connection
+from dipdup.database import tortoise_wrapper
+from dipdup.transactions import TransactionManager
+
+from defi_space_indexer.hooks import reward_engine
+from defi_space_indexer.hooks.reward_engine import PRECISION
+from defi_space_indexer.hooks.reward_engine import update_reward
+from defi_space_indexer.hooks.reward_engine import update_rewards
+from defi_space_indexer.models import Powerplant
+from defi_space_indexer.models import Reactor
+from defi_space_indexer.models import RewardSchedule
+from defi_space_indexer.models import UserRewardState
+from defi_space_indexer.models import UserStake
+from defi_space_indexer.models.felt import felt
+
+TIMESTAMPS = {'created_at': 0, 'updated_at': 0}
+REACTOR = felt(0x10)
+TOKEN = felt(0x20)
+RATE = 10**18  # Reward per second
+STARTED_AT = 1000
+
+
+async def get_prices(ctx: Any, tokens: set[str]) -> dict[str, Decimal]:
+    return dict.fromkeys(tokens, Decimal(1))
+
+
+@pytest.fixture
+async def reactor(monkeypatch: pytest.MonkeyPatch) -> AsyncIterator[Reactor]:
+    monkeypatch.setattr(reward_engine, 'get_prices', get_prices)
+    async with tortoise_wrapper('sqlite://:memory:', 'defi_space_indexer.models'), TransactionManager().register():
+        await generate_schema(get_connection(), 'public')
+        powerplant = await Powerplant.create(
+            address='0x1',
+            reactor_count=1,
+            owner='0x2',
+            reactor_class_hash='0x3',
+            **TIMESTAMPS,
+        )
+        reactor = await Reactor.create(
+            address=REACTOR,
+            powerplant=powerplant,
+            powerplant_address='0x1',
+            lp_token_address='0x11',
+            reactor_index=0,
+            owner='0x2',
+            total_staked=0,
+            multiplier=1,
+            locked=False,
+            penalty_duration=0,
+            withdraw_penalty=0,
+            penalty_receiver='0x2',
+            authorized_rewarders=[],
+            **TIMESTAMPS,
+        )
+        await RewardSchedule.create(
+            reactor=reactor,
+            reactor_address=REACTOR,
+            reward_token=TOKEN,
+            reward_rate=RATE,
+            reward_amount=0,
+            reward_duration=1000,
+            period_finish=STARTED_AT + 1000,
+            reward_per_token_stored=0,
+            last_update_time=STARTED_AT,
+            unallocated_rewards=0,
+            **TIMESTAMPS,
+        )
+        yield reactor
+
+
+async def stake(reactor: Reactor, user: str, amount: int, timestamp: int) -> None:
+    """Apply a deposit (or a withdrawal, with a negative amount) the way the stake handlers do."""
+    total_staked = int(reactor.total_staked)
+    current = await UserStake.get_or_none(reactor_address=REACTOR, user_address=user)
+    if current is None:
+        current = await UserStake.create(
+            reactor=reactor,
+            reactor_address=REACTOR,
+            user_address=user,
+            staked_amount=0,
+            penalty_end_time=0,
+            **TIMESTAMPS,
+        )
+    staked_amount = int(current.staked_amount)
+
+    reactor.total_staked = Decimal(total_staked + amount)
+    await reactor.save()
+    current.staked_amount = Decimal(staked_amount + amount)
+    await current.save()
+    await update_reward(REACTOR, current.id, user, staked_amount, total_staked, timestamp)
+
+
+async def get_state(user: str) -> UserRewardState:
+    return await UserRewardState.get(user_address=user, reward_token=TOKEN)
+
+
+async def test_stakers_earn_from_their_deposit(reactor: Reactor) -> None:
+    await stake(reactor, '0xa', 1 * PRECISION, STARTED_AT)
+    await stake(reactor, '0xb', 3 * PRECISION, STARTED_AT + 100)
+
+    # NOTE: `a` staked alone for 100 seconds; `b` starts at the reward per token of its deposit
+    schedule = await RewardSchedule.get(reactor_address=REACTOR)
+    assert schedule.reward_per_token_stored == 100 * PRECISION
+    assert schedule.last_update_time == STARTED_AT + 100
+    assert (await get_state('0xa')).reward_per_token_paid == 0
+    assert (await get_state('0xb')).reward_per_token_paid == 100 * PRECISION
+
+    # NOTE: For the next 100 seconds, they share rewards 1:3
+    assert await update_rewards(None, STARTED_AT + 200) == (2, 1)  # type: ignore[arg-type]
+    assert (await get_state('0xa')).earned == 125 * RATE
+    assert (await get_state('0xb')).earned == 75 * RATE
+
+
+async def test_withdrawal_settles_rewards(reactor: Reactor) -> None:
+    await stake(reactor, '0xa', 1 * PRECISION, STARTED_AT)
+    await stake(reactor, '0xb', 3 * PRECISION, STARTED_AT + 100)
+    await stake(reactor, '0xa', -1 * PRECISION, STARTED_AT + 200)
+
+    state = await get_state('0xa')
+    assert state.rewards == state.earned == 125 * RATE
+    assert state.reward_per_token_paid == 125 * PRECISION
+
+    # NOTE: Streams stop at `period_finish`; `a` has nothing staked, `b` gets the rest
+    await update_rewards(None, STARTED_AT + 2000)  # type: ignore[arg-type]
+    assert (await get_state('0xa')).earned == 125 * RATE
+    assert (await get_state('0xb')).earned == 875 * RATE